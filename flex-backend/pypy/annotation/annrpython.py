@@ -1,5 +1,6 @@
 from __future__ import generators
 
+import heapq
 from types import ClassType, FunctionType
 from pypy.tool.ansi_print import ansi_log, raise_nicer_exception
 from pypy.annotation import model as annmodel
@@ -34,6 +35,10 @@ class RPythonAnnotator(object):
             translator.annotator = self
         self.translator = translator
         self.pendingblocks = {}  # map {block: graph-containing-it}
+        self.pendingqueue = []   # heap of the pending blocks, see schedule()
+        self.pendingcount = 0    # number of blocks ever scheduled
+        self.graphdepths = {}    # map {graph: depth in the call graph}
+        self.blockorders = {}    # map {graph: {block: reverse postorder}}
         self.bindings = {}       # map Variables to SomeValues
         self.annotated = {}      # set of blocks already seen
         self.added_blocks = None # see processblock() below
@@ -41,6 +46,11 @@ class RPythonAnnotator(object):
         self.notify = {}        # {block: {positions-to-reflow-from-when-done}}
         self.fixed_graphs = {}  # set of graphs not to annotate again
         self.blocked_blocks = {} # set of {blocked_block: graph}
+        # --- statistics about the reflowing, shown by the graph viewer ---
+        self.reflowcounter = {}        # {block: times it was flown in}
+        self.graph_reflowcounter = {}  # {graph: times its blocks were reflown}
+        self.generalizations = {}      # {(graph, graph-reflown-because-of-it):
+                                       #  times its annotations were widened}
         # --- the following information is recorded for debugging only ---
         # --- and only if annotation.model.DEBUG is kept to True
         self.why_not_annotated = {} # {block: (exc_type, exc_value, traceback)}
@@ -54,7 +64,6 @@ class RPythonAnnotator(object):
         self.binding_cause_history = {} # map Variables to lists of positions
                 # history of binding_caused_by, kept in sync with
                 # bindingshistory
-        self.reflowcounter = {}
         self.return_bindings = {} # map return Variables to their graphs
         # --- end of debugging information ---
         self.frozen = False
@@ -69,7 +78,8 @@ class RPythonAnnotator(object):
 
     def __getstate__(self):
         attrs = """translator pendingblocks bindings annotated links_followed
-        notify bookkeeper frozen policy added_blocks""".split()
+        notify bookkeeper frozen policy added_blocks fixed_graphs
+        pendingqueue pendingcount graphdepths""".split()
         ret = self.__dict__.copy()
         for key, value in ret.items():
             if key not in attrs:
@@ -216,6 +226,7 @@ class RPythonAnnotator(object):
 
     def addpendinggraph(self, flowgraph, inputcells):
         self._register_returnvar(flowgraph)
+        self.graphdepths.setdefault(flowgraph, 0)
         self.addpendingblock(flowgraph, flowgraph.startblock, inputcells)
 
     def addpendingblock(self, graph, block, cells, called_from_graph=None):
@@ -237,13 +248,42 @@ class RPythonAnnotator(object):
             else:
                 self.mergeinputargs(graph, block, cells, called_from_graph)
             if not self.annotated[block]:
-                self.pendingblocks[block] = graph
+                self.schedule(graph, block)
+
+    def schedule(self, graph, block):
+        """Add block to the pending blocks.  They are processed callees
+        first, i.e. deepest graph of the call graph first, and in reverse
+        postorder inside a graph, so that most blocks are only flown in
+        once all their input links have been followed.
+        """
+        if block in self.pendingblocks:
+            return    # already in the queue
+        self.pendingblocks[block] = graph
+        try:
+            order = self.blockorders[graph][block]
+        except KeyError:
+            self.blockorders[graph] = reverse_postorder(graph)
+            order = self.blockorders[graph].get(block, 0)
+        priority = (-self.graphdepths.get(graph, 0), order, self.pendingcount)
+        self.pendingcount += 1
+        heapq.heappush(self.pendingqueue, (priority, block))
+
+    def nextpendingblock(self):
+        """Remove the pending block with the highest priority and return
+        (block, graph)."""
+        while True:
+            priority, block = heapq.heappop(self.pendingqueue)
+            try:
+                graph = self.pendingblocks.pop(block)
+            except KeyError:
+                continue    # removed from pendingblocks by someone else
+            return block, graph
 
     def complete(self):
         """Process pending blocks until none is left."""
         while True:
             while self.pendingblocks:
-                block, graph = self.pendingblocks.popitem()
+                block, graph = self.nextpendingblock()
                 if annmodel.DEBUG:
                     self.flowin_block = block # we need to keep track of block
                 self.processblock(graph, block)
@@ -371,6 +411,9 @@ class RPythonAnnotator(object):
             parent_graph, parent_block, parent_index = position_key = whence
             tag = parent_block, parent_index
             self.translator.update_call_graph(parent_graph, graph, tag)
+            if graph not in self.graphdepths:
+                self.graphdepths[graph] = (
+                    self.graphdepths.get(parent_graph, 0) + 1)
         else:
             position_key = None
         self._register_returnvar(graph)
@@ -465,9 +508,11 @@ class RPythonAnnotator(object):
         #      input variables).
 
         #print '* processblock', block, cells
-        if annmodel.DEBUG:
-            self.reflowcounter.setdefault(block, 0)
-            self.reflowcounter[block] += 1
+        count = self.reflowcounter.get(block, 0) + 1
+        self.reflowcounter[block] = count
+        if count > 1:
+            self.graph_reflowcounter[graph] = (
+                self.graph_reflowcounter.get(graph, 0) + 1)
         self.annotated[block] = graph
         if block in self.blocked_blocks:
             del self.blocked_blocks[block]
@@ -491,7 +536,7 @@ class RPythonAnnotator(object):
     def reflowpendingblock(self, graph, block):
         assert not self.frozen
         assert graph not in self.fixed_graphs
-        self.pendingblocks[block] = graph
+        self.schedule(graph, block)
         assert block in self.annotated
         self.annotated[block] = False  # must re-flow
         self.blocked_blocks[block] = graph
@@ -512,8 +557,15 @@ class RPythonAnnotator(object):
         unions = [annmodel.unionof(c1,c2) for c1, c2 in zip(oldcells,inputcells)]
         # if the merged cells changed, we must redo the analysis
         if unions != oldcells:
+            if called_from_graph is not None:
+                self.count_generalization(called_from_graph[0], graph)
             self.bindinputargs(graph, block, unions, called_from_graph)
 
+    def count_generalization(self, graph, reflown_graph):
+        if graph is not reflown_graph:
+            key = graph, reflown_graph
+            self.generalizations[key] = self.generalizations.get(key, 0) + 1
+
     def whereami(self, position_key):
         graph, block, i = position_key
         blk = ""
@@ -707,6 +759,8 @@ class RPythonAnnotator(object):
             # reflow from certain positions when this block is done
             for callback in self.notify[block]:
                 if isinstance(callback, tuple):
+                    if self.reflowcounter[block] > 1:
+                        self.count_generalization(graph, callback[0])
                     self.reflowfromposition(callback) # callback is a position
                 else:
                     callback()
@@ -789,6 +843,29 @@ def consider_op_%s(self, arg1, arg2, *args):
 RPythonAnnotator._registeroperations(annmodel)
 
 
+def reverse_postorder(graph):
+    """Return {block: index} numbering the blocks of graph in reverse
+    postorder, i.e. every block before the blocks it jumps to, loops
+    apart."""
+    postorder = []
+    seen = {graph.startblock: True}
+    stack = [(graph.startblock, iter(graph.startblock.exits))]
+    while stack:
+        block, exits = stack[-1]
+        for link in exits:
+            if link.target not in seen:
+                seen[link.target] = True
+                stack.append((link.target, iter(link.target.exits)))
+                break
+        else:
+            stack.pop()
+            postorder.append(block)
+    result = {}
+    for i in range(len(postorder)):
+        result[postorder[i]] = len(postorder) - 1 - i
+    return result
+
+
 class CannotSimplify(Exception):
     pass
 
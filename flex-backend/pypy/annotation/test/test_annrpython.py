@@ -2772,6 +2772,54 @@ class TestAnnotateTestCase:
         s = a.build_types(f, [int])
         assert isinstance(s, annmodel.SomeInteger)
 
+    def test_callees_annotated_first(self):
+        def g(n):
+            return n + 1
+        def f(n):
+            x = g(n)
+            while n > 0:
+                n -= 1
+            return x
+        a = self.RPythonAnnotator()
+        order = []
+        processblock = a.processblock
+        def recording_processblock(graph, block):
+            order.append((graph, block))
+            processblock(graph, block)
+        a.processblock = recording_processblock
+        a.build_types(f, [int])
+        fgraph = graphof(a, f)
+        ggraph = graphof(a, g)
+        assert order[0] == (fgraph, fgraph.startblock)
+        # all of g is done before the rest of f is looked at, and the
+        # start block of f is reflown first with the result of g
+        graphs = [graph for graph, block in order]
+        assert graphs[1:4] == [ggraph, ggraph, fgraph]
+        assert order[3] == (fgraph, fgraph.startblock)
+        assert ggraph not in graphs[4:]
+        assert a.reflowcounter[fgraph.startblock] == 2
+
+    def test_reflow_counters(self):
+        def g(x):
+            return x
+        def f(n):
+            a = g(n)
+            if n > 0:
+                a += g(n * 0.5)
+            return a
+        a = self.RPythonAnnotator()
+        s = a.build_types(f, [int])
+        assert isinstance(s, annmodel.SomeFloat)
+        fgraph = graphof(a, f)
+        ggraph = graphof(a, g)
+        assert a.reflowcounter[ggraph.startblock] == 2
+        assert a.reflowcounter[ggraph.returnblock] == 2
+        assert a.graph_reflowcounter[ggraph] == 2
+        # g was generalized by a call from f, and both calls in f by the
+        # result of g
+        assert a.generalizations[fgraph, ggraph] == 1
+        assert a.generalizations[ggraph, fgraph] == 2
+
 
 def g(n):
     return [0,1,2,n]
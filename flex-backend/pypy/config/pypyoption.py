@@ -169,6 +169,13 @@ pypy_optiondescription = OptionDescription("objspace", "Object Space Options", [
                    default=False,
                    requires=[("objspace.std.withmultidict", True)]),
 
+        BoolOption("withcompactdict",
+                   "use dictionaries whose entries are kept in insertion "
+                   "order, with a separate compact hash table of indexes",
+                   default=False,
+                   requires=[("objspace.std.withmultidict", True),
+                             ("objspace.std.withbucketdict", False)]),
+
         BoolOption("withsmalldicts",
                    "handle small dictionaries differently",
                    default=False,
@@ -203,6 +210,16 @@ pypy_optiondescription = OptionDescription("objspace", "Object Space Options", [
         IntOption("methodcachesizeexp",
                   " 2 ** methodcachesizeexp is the size of the of the method cache ",
                   default=11),
+        BoolOption("withglobalcache",
+                   "cache the lookups of LOAD_GLOBAL in the code objects",
+                   default=False,
+                   requires=[("objspace.std.withmultidict", True)]),
+        BoolOption("withattrcache",
+                   "cache where the attributes are in the instances "
+                   "with shared dictionaries",
+                   default=False,
+                   requires=[("objspace.std.withsharingdict", True),
+                             ("objspace.std.withtypeversion", True)]),
         BoolOption("withmultilist",
                    "use lists optimized for flexibility",
                    default=False,
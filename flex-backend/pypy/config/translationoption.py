@@ -7,6 +7,7 @@ DEFL_INLINE_THRESHOLD = 32.4    # just enough to inline add__Int_Int()
 # and just small enough to prevend inlining of some rlist functions.
 
 DEFL_PROF_BASED_INLINE_THRESHOLD = 32.4
+DEFL_PROF_BASED_INLINE_HOT_THRESHOLD = 162
 DEFL_CLEVER_MALLOC_REMOVAL_INLINE_THRESHOLD = 32.4
 
 translation_optiondescription = OptionDescription(
@@ -84,6 +85,17 @@ translation_optiondescription = OptionDescription(
                cmdline="--cflags"),
     StrOption("linkerflags", "Specify flags for the linker (C backend only)",
                cmdline="--ldflags"),
+    IntOption("source_shards", "Number of files the C functions of "
+              "stand-alone programs are split into (0: as many as needed "
+              "for files of about 65535 lines)",
+              default=0, cmdline="--source-shards"),
+    IntOption("source_processes", "Number of processes writing the C "
+              "functions", default=1, cmdline="--source-processes"),
+    StrOption("object_cache", "Directory of a cache of the compiled C "
+              "files, shared by the translations (C backend only)",
+              cmdline="--object-cache"),
+    IntOption("object_cache_size", "Size of the object cache in megabytes",
+              default=1024, cmdline="--object-cache-size"),
 
     # Flags of the TranslationContext:
     BoolOption("simplifying", "Simplify flow graphs", default=True),
@@ -98,11 +110,25 @@ translation_optiondescription = OptionDescription(
                "attempt to pre-allocate the list",
                default=False,
                cmdline=None),
+    StrOption("flowgraph_cache", "Directory of a cache of the flow graphs, "
+              "shared by the translations", cmdline="--flowgraph-cache"),
     ChoiceOption("fork_before",
                  "(UNIX) Create restartable checkpoint before step",
                  ["annotate", "rtype", "backendopt", "database", "source",
                   "hintannotate", "timeshift"],
                  default=None, cmdline="--fork-before"),
+    StrOption("checkpoint_dir",
+              "Save the state of the translation to this directory after "
+              "annotation and after rtyping",
+              cmdline="--checkpoint-dir"),
+    StrOption("resume",
+              "Go on from a checkpoint saved with --checkpoint-dir "
+              "(a file, or a directory to use the latest checkpoint in it)",
+              cmdline="--resume"),
+    StrOption("task_profile",
+              "Write the time and memory taken by every translation step "
+              "to the given file",
+              cmdline="--task-profile"),
 
     # options for ootype
     OptionDescription("ootype", "Object Oriented Typesystem options", [
@@ -150,6 +176,24 @@ translation_optiondescription = OptionDescription(
                   "for profile based inlining",
                 default="pypy.translator.backendopt.inline.inlining_heuristic",
                 cmdline="--prof-based-inline-heuristic"),
+        ChoiceOption("profile_based_inline_runner",
+                     "How to run the program to count the calls for "
+                     "profile based inlining",
+                     ["executable", "llinterp"], default="executable",
+                     cmdline="--prof-based-inline-runner"),
+        IntOption("profile_based_inline_min_count",
+                  "Minimal number of calls of a call site for profile "
+                  "based inlining",
+                  default=250, cmdline="--prof-based-inline-min-count"),
+        IntOption("profile_based_inline_hot_count",
+                  "Number of calls from which a call site is hot for "
+                  "profile based inlining",
+                  default=10000, cmdline="--prof-based-inline-hot-count"),
+        FloatOption("profile_based_inline_hot_threshold",
+                    "Threshold when to inline functions at hot call sites "
+                    "for profile based inlining",
+                  default=DEFL_PROF_BASED_INLINE_HOT_THRESHOLD,
+                  cmdline="--prof-based-inline-hot-threshold"),
         # control clever malloc removal
         BoolOption("clever_malloc_removal",
                    "Drives inlining to remove mallocs in a clever way",
@@ -176,6 +220,11 @@ translation_optiondescription = OptionDescription(
                    "stack based virtual machines (only for backends that support it)",
                    default=True),
 
+        IntOption("processes",
+                  "Number of processes running the optimizations that "
+                  "work on one graph at a time",
+                  default=1, cmdline="--backendopt-processes"),
+
         BoolOption("none",
                    "Do not run any backend optimizations",
                    requires=[('translation.backendopt.inline', False),
@@ -195,6 +244,40 @@ translation_optiondescription = OptionDescription(
         BoolOption("trace_calls", "Trace function calls", default=False,
                    cmdline="--cli-trace-calls")
     ]),
+
+    OptionDescription("flex", "GenFlex options", [
+        BoolOption("graph_cache",
+                   "Only rewrite the py/*.as files whose content changed "
+                   "since the previous run",
+                   default=True, cmdline="--flex-graph-cache"),
+        BoolOption("typed",
+                   "Declare arguments, locals and return values with their "
+                   "ActionScript 3 type when it is known",
+                   default=False, cmdline="--flex-typed"),
+        BoolOption("structured",
+                   "Render loops and branches as structured code instead "
+                   "of a dispatch loop (irreducible graphs still use it)",
+                   default=True, cmdline="--flex-structured"),
+        BoolOption("prune",
+                   "Leave the graphs, methods and prebuilt constants that "
+                   "the entry points cannot reach out of the output",
+                   default=True, cmdline="--flex-prune"),
+        BoolOption("prune_measure",
+                   "Also render the source without pruning, only to report "
+                   "how many bytes pruning saved",
+                   default=False, cmdline="--flex-prune-measure",
+                   requires=[("translation.flex.prune", True)]),
+        BoolOption("swf",
+                   "Compile the generated source into a SWF, building the "
+                   "py package as separate libraries",
+                   default=False, cmdline="--flex-swf"),
+        IntOption("build_jobs", "Number of compc processes to run at the "
+                  "same time", default=4, cmdline="--flex-build-jobs"),
+        StrOption("compc", "Command compiling the libraries",
+                  default="compc", cmdline="--flex-compc"),
+        StrOption("mxmlc", "Command linking the application",
+                  default="mxmlc", cmdline="--flex-mxmlc"),
+    ]),
 ])
 
 def get_combined_translation_config(other_optdescr=None,
@@ -79,6 +79,10 @@ class PyCode(eval.Code):
         self.magic = magic
         self._compute_fastcall()
         self._signature = cpython_code_signature(self)
+        if space.config.objspace.std.withglobalcache:
+            self._init_global_cache()
+        if space.config.objspace.std.withattrcache:
+            self._init_attr_cache()
         # Precompute what arguments need to be copied into cellvars
         self._args_as_cellvars = []
         
@@ -105,6 +109,25 @@ class PyCode(eval.Code):
                     except IndexError:
                         break   # all cell vars initialized this way
 
+    def _init_global_cache(self):
+        # the cache of LOAD_GLOBAL, for each name: the version tags of the
+        # globals and of the builtins (None if the name is in the globals)
+        # for which the value was looked up
+        n = len(self.co_names_w)
+        self.globalcache_globals_tags = [None] * n
+        self.globalcache_builtins_tags = [None] * n
+        self.globalcache_values_w = [None] * n
+
+    def _init_attr_cache(self):
+        # the caches of pypy.objspace.std.attrcache, for each name
+        n = len(self.co_names_w)
+        self.attrcache_version_tags = [None] * n
+        self.attrcache_structures = [None] * n
+        self.attrcache_indexes = [0] * n
+        self.callmethodcache_version_tags = [None] * n
+        self.callmethodcache_structures = [None] * n
+        self.callmethodcache_functions_w = [None] * n
+
     co_names = property(lambda self: [self.space.unwrap(w_name) for w_name in self.co_names_w]) # for trace
 
     def signature(self):
@@ -33,7 +33,6 @@ class Module(MixedModule):
         'raw_input'     : 'app_io.raw_input',
         'input'         : 'app_io.input',
 
-        'sum'           : 'app_functional.sum',
         'apply'         : 'app_functional.apply',
         'map'           : 'app_functional.map',
         'filter'        : 'app_functional.filter',
@@ -124,6 +123,7 @@ class Module(MixedModule):
         '__import__'    : 'importing.importhook',
 
         'range'         : 'functional.range_int',
+        'sum'           : 'functional.sum',
         'xrange'        : 'functional.W_XRange',
         'all'           : 'functional.all',
         'any'           : 'functional.any',
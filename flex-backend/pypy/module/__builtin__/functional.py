@@ -10,6 +10,7 @@ from pypy.interpreter.typedef import TypeDef
 from pypy.interpreter.baseobjspace import Wrappable
 from pypy.rlib.rarithmetic import r_uint, intmask
 from pypy.module.__builtin__.app_functional import range as app_range
+from pypy.module.__builtin__.app_functional import sum as app_sum
 from inspect import getsource, getfile
 
 """
@@ -95,6 +96,23 @@ del range # don't hide the builtin one
 range_fallback = applevel(getsource(app_range), getfile(app_range)
                           ).interphook('range')
 
+def sum(space, w_sequence, w_start=0):
+    """sum(sequence, start=0) -> value
+
+Returns the sum of a sequence of numbers (NOT strings) plus the value
+of parameter 'start'.  When the sequence is empty, returns start."""
+    if space.config.objspace.std.withmultilist:
+        # lists of ints or floats are summed without wrapping the items
+        from pypy.objspace.std.listmultiobject import sum_unboxed
+        w_result = sum_unboxed(space, w_sequence, w_start)
+        if w_result is not None:
+            return w_result
+    return sum_fallback(space, w_sequence, w_start)
+sum.unwrap_spec = [ObjSpace, W_Root, W_Root]
+
+sum_fallback = applevel(getsource(app_sum), getfile(app_sum)
+                        ).interphook('sum')
+
 def range_withspecialized_implementation(space, start, step, howmany):
     if space.config.objspace.std.withrangelist:
         from pypy.objspace.std.rangeobject import W_RangeListObject
@@ -19,4 +19,6 @@ class Module(MixedModule):
                                  'interp_magic.method_cache_counter')
             self.extra_interpdef('reset_method_cache_counter',
                                  'interp_magic.reset_method_cache_counter')
+            self.extra_interpdef('method_cache_stats',
+                                 'interp_magic.method_cache_stats')
 
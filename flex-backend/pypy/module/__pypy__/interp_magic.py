@@ -31,8 +31,55 @@ method_cache_counter.unwrap_spec = [ObjSpace, str]
 
 def reset_method_cache_counter(space):
     """Reset the method cache counter to zero for all method names."""
+    from pypy.objspace.std.typeobject import reset_method_cache_counter
+    assert space.config.objspace.std.withmethodcachecounter
+    reset_method_cache_counter(space.getexecutioncontext())
+
+def method_cache_stats(space):
+    """Return a dict with the statistics of the method cache since the last
+    reset: 'sizeexp' and 'size', the number of entries 'used', the total
+    'hits', 'misses' and 'collisions' (the misses that replaced another
+    entry), 'names' mapping every method name to its (hits, misses,
+    collisions), and 'simulated' mapping other sizeexps to the (hits,
+    misses) that a cache of that size would have had."""
     assert space.config.objspace.std.withmethodcachecounter
     ec = space.getexecutioncontext()
-    ec.method_cache_misses = {}
-    ec.method_cache_hits = {}
+    sizeexp = space.config.objspace.std.methodcachesizeexp
+    used = 0
+    for version_tag in ec.method_cache_versions:
+        if version_tag is not None:
+            used += 1
+    names = {}
+    for name in ec.method_cache_hits.keys():
+        names[name] = None
+    for name in ec.method_cache_misses.keys():
+        names[name] = None
+    hits = misses = collisions = 0
+    w_names = space.newdict()
+    for name in names.keys():
+        name_hits = ec.method_cache_hits.get(name, 0)
+        name_misses = ec.method_cache_misses.get(name, 0)
+        name_collisions = ec.method_cache_collisions.get(name, 0)
+        hits += name_hits
+        misses += name_misses
+        collisions += name_collisions
+        space.setitem(w_names, space.wrap(name),
+                      space.newtuple([space.wrap(name_hits),
+                                      space.wrap(name_misses),
+                                      space.wrap(name_collisions)]))
+    w_simulated = space.newdict()
+    for simulated in ec.method_cache_simulated:
+        space.setitem(w_simulated, space.wrap(simulated.sizeexp),
+                      space.newtuple([space.wrap(simulated.hits),
+                                      space.wrap(simulated.misses)]))
+    w_stats = space.newdict()
+    space.setitem(w_stats, space.wrap('sizeexp'), space.wrap(sizeexp))
+    space.setitem(w_stats, space.wrap('size'), space.wrap(1 << sizeexp))
+    space.setitem(w_stats, space.wrap('used'), space.wrap(used))
+    space.setitem(w_stats, space.wrap('hits'), space.wrap(hits))
+    space.setitem(w_stats, space.wrap('misses'), space.wrap(misses))
+    space.setitem(w_stats, space.wrap('collisions'), space.wrap(collisions))
+    space.setitem(w_stats, space.wrap('names'), w_names)
+    space.setitem(w_stats, space.wrap('simulated'), w_simulated)
+    return w_stats
 
@@ -26,6 +26,10 @@ from pypy.tool.sourcetools import PY_IDENTIFIER, nice_repr_for_func
     and dropping Variable.instancenames
     got annotation down to 109 MB.
     Probably an effect of less fragmentation.
+
+    The Constants of the flow space and the rtyper for atomic values
+    are shared, see interned_constant().  translator/goal/bench-memory.py
+    measures the peak memory of a translation up to rtyping.
 """
 
 __metaclass__ = type
@@ -330,13 +334,15 @@ class Variable(object):
 
 def _bv(_name, _nr, concretetype=None):
     v = Variable.__new__(Variable, object)
+    # use the string of namesdict, 'renamed' compares names with 'is'
+    nd = v.namesdict
+    _name, nextnr = nd.setdefault(_name, (_name, 0))
     v._name = _name
     v._nr = _nr
     if concretetype is not None:
         v.concretetype = concretetype
-    nd = v.namesdict
-    if _nr >= nd.get(_name, 0):
-        nd[_name] = _nr + 1
+    if _nr >= nextnr:
+        nd[_name] = (_name, _nr + 1)
     return v
 
 
@@ -348,12 +354,34 @@ class Constant(Hashable):
         if concretetype is not None:
             self.concretetype = concretetype
     def __reduce_ex__(self, *args):
+        if type(self.value) in INTERNED_TYPES:
+            return interned_constant, (self.value,
+                                       getattr(self, 'concretetype', None))
         if hasattr(self, 'concretetype'):
             return Constant, (self.value, self.concretetype)
         else:
             return Constant, (self.value,)
     __reduce__ = __reduce_ex__
 
+# the types of the values of the shared Constants; not float, because
+# 0.0 and -0.0 would be the same key
+INTERNED_TYPES = {type(None): True, bool: True, int: True, long: True,
+                  str: True}
+_interned_constants = {}
+
+def interned_constant(value, concretetype=None):
+    """Return a Constant for value, which is the same object as the other
+    Constants of the same value and concretetype if value is atomic.
+    The concretetype of such a Constant must not be changed."""
+    if type(value) not in INTERNED_TYPES:
+        return Constant(value, concretetype)
+    key = type(value), value, concretetype
+    try:
+        return _interned_constants[key]
+    except KeyError:
+        c = _interned_constants[key] = Constant(value, concretetype)
+        return c
+
 
 class SpaceOperation(object):
     __slots__ = "opname args result offset".split()
@@ -34,6 +34,9 @@ class FlowObjSpace(ObjSpace):
     
     full_exceptions = False
     do_imports_immediately = True
+    # if not None, a list of (operation name, args, result, exception
+    # class) for every constant-folded operation (see flowcache.py)
+    foldings = None
 
     def initialize(self):
         import __builtin__
@@ -113,7 +116,7 @@ class FlowObjSpace(ObjSpace):
         # to appear in a flow graph
         if type(obj) is type_with_bad_introspection:
             raise WrapException
-        return Constant(obj)
+        return interned_constant(obj)
 
     def int_w(self, w_obj):
         if isinstance(w_obj, Constant):
@@ -339,7 +342,10 @@ class FlowObjSpace(ObjSpace):
         except UnwrapException:
             pass
         else:
-            return bool(obj)
+            result = bool(obj)
+            if self.foldings is not None:
+                self.foldings.append(('is_true', (obj,), result, None))
+            return result
         w_truthvalue = self.do_operation('is_true', w_obj)
         context = self.getexecutioncontext()
         return context.guessbool(w_truthvalue)
@@ -622,11 +628,15 @@ def make_op(name, symbol, arity, specialnames):
                     result = op(*args)
                 except:
                     etype, evalue, etb = sys.exc_info()
+                    if self.foldings is not None:
+                        self.foldings.append((name, tuple(args), None, etype))
                     msg = "generated by a constant operation:  %s%r" % (
                         name, tuple(args))
                     raise flowcontext.OperationThatShouldNotBePropagatedError(
                         self.wrap(etype), self.wrap(msg))
                 else:
+                    if self.foldings is not None:
+                        self.foldings.append((name, tuple(args), result, None))
                     # don't try to constant-fold operations giving a 'long'
                     # result.  The result is probably meant to be sent to
                     # an intmask(), but the 'long' constant confuses the
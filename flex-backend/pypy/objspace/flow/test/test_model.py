@@ -132,3 +132,47 @@ def test_variable():
     assert v2.renamed
     assert v2.name.startswith("foobar_") and v2.name != v.name
     assert v2.name.split('_', 1)[1].isdigit()
+
+def test_unpickled_variable():
+    import pickle
+    nd = Variable.namesdict
+    saved = nd.copy()
+    try:
+        v = Variable()
+        v.name
+        v2 = Variable("unpickled")
+        v2.name
+        v3 = Variable()
+        del nd["unpickled_"]
+        nd["v"] = ("v", v._nr)
+        v = pickle.loads(pickle.dumps(v))
+        assert not v.renamed
+        v2 = pickle.loads(pickle.dumps(v2))
+        assert v2.renamed
+        v3 = pickle.loads(pickle.dumps(v3))
+        # the numbers of the new Variables don't clash with the unpickled
+        # ones
+        assert Variable().name != v.name
+        assert Variable("unpickled").name != v2.name
+        v3.name
+    finally:
+        # the numbering is global: don't let the other tests see the
+        # counters rewound above
+        nd.clear()
+        nd.update(saved)
+
+def test_interned_constant():
+    import pickle
+    c = interned_constant(42)
+    assert interned_constant(42) is c
+    assert not hasattr(c, 'concretetype')
+    assert interned_constant(42, 'Signed') is not c
+    assert interned_constant(42, 'Signed').concretetype == 'Signed'
+    assert interned_constant(True) is not interned_constant(1)
+    assert interned_constant(0.0) is not interned_constant(-0.0)
+    lst = []
+    assert interned_constant(lst).value is lst
+    assert pickle.loads(pickle.dumps(c)) is c
+    assert pickle.loads(pickle.dumps(Constant(42))) is c
+    c1 = Constant(lst)
+    assert pickle.loads(pickle.dumps(c1)) is not c1
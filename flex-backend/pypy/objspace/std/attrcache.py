@@ -0,0 +1,149 @@
+"""
+Inline caches for LOAD_ATTR, STORE_ATTR and LOOKUP_METHOD, used by the
+frames of the standard object space with the withattrcache option.
+
+The instance dictionaries of withsharingdict that have the same
+SharedStructure keep each attribute at the same index of their
+'entries'.  For every name of a code object, the cache remembers the
+version tag of the type and the structure of the instance for which the
+attribute was found directly in the instance dictionary, and at which
+index; or, for LOOKUP_METHOD, that the name is a function of the type
+that the instance does not shadow.  As long as the type of an instance
+has that version tag and its dictionary that structure, the attribute
+is found without hashing its name.
+"""
+
+from pypy.interpreter import pyframe
+from pypy.interpreter.function import Function
+from pypy.interpreter.callmethod import object_getattribute
+from pypy.objspace.std.typeobject import W_TypeObject
+from pypy.objspace.std.dictmultiobject import W_DictMultiObject
+from pypy.objspace.std.dictmultiobject import SharedDictImplementation
+
+
+def object_setattr(space):
+    w_src, w_setattr = space.lookup_in_type_where(space.w_object,
+                                                  '__setattr__')
+    return w_setattr
+object_setattr._annspecialcase_ = 'specialize:memo'
+
+def get_shared_implementation(w_obj):
+    w_dict = w_obj.getdict()
+    if isinstance(w_dict, W_DictMultiObject):
+        impl = w_dict.implementation
+        if isinstance(impl, SharedDictImplementation):
+            return impl
+    return None
+
+def get_type(space, w_obj):
+    w_type = space.type(w_obj)
+    assert isinstance(w_type, W_TypeObject)
+    return w_type
+
+def is_plain_class_attribute(space, w_descr):
+    """ Is w_descr, found in a type, overridden by the instance dictionary,
+    also after any change that does not change the version of that type? """
+    if w_descr is None:
+        return True
+    w_descrtype = get_type(space, w_descr)
+    # the type of the descriptor could get a __set__ later
+    return (not w_descrtype.is_heaptype() and
+            w_descrtype.lookup('__set__') is None)
+
+def fill_attrcache(space, code, nameindex, w_obj):
+    """ Remember where the attribute of w_obj is, if reading and writing
+    it just reads and writes the instance dictionary """
+    impl = get_shared_implementation(w_obj)
+    if impl is None:
+        return
+    w_type = get_type(space, w_obj)
+    version_tag = w_type.version_tag
+    if version_tag is None:
+        return
+    if (w_type.lookup('__getattribute__') is not object_getattribute(space)
+        or w_type.lookup('__setattr__') is not object_setattr(space)):
+        return
+    name = space.str_w(code.co_names_w[nameindex])
+    if not is_plain_class_attribute(space, w_type.lookup(name)):
+        return
+    index = impl.structure.keys.get(name, -1)
+    if index < 0:
+        return
+    code.attrcache_version_tags[nameindex] = version_tag
+    code.attrcache_structures[nameindex] = impl.structure
+    code.attrcache_indexes[nameindex] = index
+
+def find_cached_attribute(space, code, nameindex, w_obj):
+    """ The dictionary implementation of w_obj if the cache tells where
+    the attribute is in it, else None """
+    impl = get_shared_implementation(w_obj)
+    if impl is None:
+        return None
+    # the cache is only filled with the version tags that are not None
+    if (code.attrcache_structures[nameindex] is impl.structure and
+        code.attrcache_version_tags[nameindex] is
+            get_type(space, w_obj).version_tag):
+        return impl
+    return None
+
+def LOAD_ATTR(f, nameindex, *ignored):
+    "obj.attributename"
+    space = f.space
+    code = f.pycode
+    w_obj = f.peekvalue()
+    impl = find_cached_attribute(space, code, nameindex, w_obj)
+    if impl is not None:
+        f.settopvalue(impl.entries[code.attrcache_indexes[nameindex]])
+        return
+    pyframe.PyFrame.LOAD_ATTR(f, nameindex)
+    fill_attrcache(space, code, nameindex, w_obj)
+
+def STORE_ATTR(f, nameindex, *ignored):
+    "obj.attributename = newvalue"
+    space = f.space
+    code = f.pycode
+    w_obj = f.peekvalue()
+    impl = find_cached_attribute(space, code, nameindex, w_obj)
+    if impl is not None:
+        f.popvalue()
+        impl.entries[code.attrcache_indexes[nameindex]] = f.popvalue()
+        return
+    pyframe.PyFrame.STORE_ATTR(f, nameindex)
+    fill_attrcache(space, code, nameindex, w_obj)
+
+def fill_callmethodcache(space, code, nameindex, w_obj):
+    """ Remember that the method of w_obj is a function of its type, if
+    the instance dictionary does not shadow it """
+    impl = get_shared_implementation(w_obj)
+    if impl is None:
+        return
+    w_type = get_type(space, w_obj)
+    version_tag = w_type.version_tag
+    if version_tag is None:
+        return
+    if w_type.lookup('__getattribute__') is not object_getattribute(space):
+        return
+    name = space.str_w(code.co_names_w[nameindex])
+    w_descr = w_type.lookup(name)
+    if type(w_descr) is not Function:
+        return
+    if impl.structure.keys.get(name, -1) >= 0:
+        return
+    code.callmethodcache_version_tags[nameindex] = version_tag
+    code.callmethodcache_structures[nameindex] = impl.structure
+    code.callmethodcache_functions_w[nameindex] = w_descr
+
+def LOOKUP_METHOD(f, nameindex, *ignored):
+    space = f.space
+    code = f.pycode
+    w_obj = f.peekvalue()
+    impl = get_shared_implementation(w_obj)
+    if (impl is not None and
+        code.callmethodcache_structures[nameindex] is impl.structure and
+        code.callmethodcache_version_tags[nameindex] is
+            get_type(space, w_obj).version_tag):
+        f.settopvalue(code.callmethodcache_functions_w[nameindex])
+        f.pushvalue(w_obj)
+        return
+    pyframe.PyFrame.LOOKUP_METHOD(f, nameindex)
+    fill_callmethodcache(space, code, nameindex, w_obj)
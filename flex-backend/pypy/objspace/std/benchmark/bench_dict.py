@@ -43,10 +43,31 @@ def bench_simple_dict(SIZE = 10000):
     
     count_operation("Random key access", lambda : rand_keys(random_keys))
     count_operation("Existing key access", lambda : rand_keys(lookup_keys))
+
+    def iterate(d):
+        for i in xrange(10):
+            for key, value in d.iteritems():
+                pass
+
+    def delete(d):
+        for key in keys[::2]:
+            try:
+                del d[key]
+            except KeyError:
+                pass
+        for key in keys[::2]:
+            d[key] = None
+
+    count_operation("Iteration", lambda : iterate(test_d))
+    count_operation("Deletion and reinsertion", lambda : delete(test_d))
     return test_d
 
 if __name__ == '__main__':
     test_d = bench_simple_dict()
-    import __pypy__
-    print __pypy__.internal_repr(test_d)
-    print __pypy__.internal_repr(test_d.iterkeys())
+    try:
+        import __pypy__
+    except ImportError:
+        pass
+    else:
+        print __pypy__.internal_repr(test_d)
+        print __pypy__.internal_repr(test_d.iterkeys())
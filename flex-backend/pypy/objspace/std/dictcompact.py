@@ -0,0 +1,219 @@
+from pypy.objspace.std.dictmultiobject import DictImplementation
+from pypy.objspace.std.dictmultiobject import IteratorImplementation
+from pypy.rlib.rarithmetic import r_uint, intmask
+
+# The entries are kept in insertion order in the dense lists 'hashes',
+# 'keys_w' and 'values_w'; a deleted entry has None as its key until the
+# next resize squeezes it out.  The hash table itself only contains the
+# indexes of the entries, or FREE or DUMMY.  As long as it has at most
+# SMALL_TABLE_SIZE slots, it is the list of chars 'smallindexes' storing
+# 'index + 2', one byte per slot; bigger tables are the list of ints
+# 'indexes'.  The table is resized when the entries (including the
+# deleted ones) fill 2/3 of it, so that the indexes of a small table
+# fit in a char and there is always a FREE slot.
+
+FREE = -1
+DUMMY = -2
+PERTURB_SHIFT = 5
+MIN_TABLE_SIZE = 8
+SMALL_TABLE_SIZE = 256
+
+
+class CompactDictImplementation(DictImplementation):
+
+    def __init__(self, space):
+        self.space = space
+        self.len = 0
+        self.hashes = []
+        self.keys_w = []
+        self.values_w = []
+        self._alloc_table(MIN_TABLE_SIZE)
+
+    def __repr__(self):
+        return "%s<%d entries, %d slots>" % (self.__class__.__name__,
+                                             self.len, self.mask + 1)
+
+    def _alloc_table(self, size):
+        self.mask = size - 1
+        if size <= SMALL_TABLE_SIZE:
+            self.smallindexes = [chr(FREE + 2)] * size
+            self.indexes = None
+        else:
+            self.smallindexes = None
+            self.indexes = [FREE] * size
+
+    def _getslot(self, i):
+        if self.smallindexes is not None:
+            return ord(self.smallindexes[i]) - 2
+        return self.indexes[i]
+
+    def _setslot(self, i, index):
+        if self.smallindexes is not None:
+            self.smallindexes[i] = chr(index + 2)
+        else:
+            self.indexes[i] = index
+
+    def _lookup(self, w_key, hash):
+        """ The index of the entry of w_key, or -1 """
+        space = self.space
+        keys_w = self.keys_w
+        i = hash & self.mask
+        perturb = r_uint(hash)
+        while 1:
+            index = self._getslot(i)
+            if index == FREE:
+                return -1
+            if index != DUMMY and self.hashes[index] == hash:
+                w_other = keys_w[index]
+                if w_other is w_key:
+                    return index
+                if w_other is not None:
+                    found = space.eq_w(w_key, w_other)
+                    # if eq_w() changed the dict, look up the key again,
+                    # whatever it returned: the table may have been rebuilt
+                    if (self.keys_w is not keys_w or
+                        keys_w[index] is not w_other):
+                        return self._lookup(w_key, hash)
+                    if found:
+                        return index
+            i = intmask(r_uint(i) * 5 + perturb + 1) & self.mask
+            perturb >>= PERTURB_SHIFT
+
+    def _insert_slot(self, hash, index):
+        """ Put index into the first slot of the table that is free for
+        hash, which must not be in the table yet """
+        i = hash & self.mask
+        perturb = r_uint(hash)
+        while 1:
+            slot = self._getslot(i)
+            if slot == FREE or slot == DUMMY:
+                break
+            i = intmask(r_uint(i) * 5 + perturb + 1) & self.mask
+            perturb >>= PERTURB_SHIFT
+        self._setslot(i, index)
+
+    def get(self, w_key):
+        index = self._lookup(w_key, self.space.hash_w(w_key))
+        if index < 0:
+            return None
+        return self.values_w[index]
+
+    def setitem(self, w_key, w_value):
+        hash = self.space.hash_w(w_key)
+        index = self._lookup(w_key, hash)
+        if index >= 0:
+            self.values_w[index] = w_value
+            return self
+        if len(self.keys_w) * 3 >= (self.mask + 1) * 2:
+            self._resize(self.len + 1)
+        self._insert_slot(hash, len(self.keys_w))
+        self.hashes.append(hash)
+        self.keys_w.append(w_key)
+        self.values_w.append(w_value)
+        self.len += 1
+        return self
+
+    def setitem_str(self, w_key, w_value, shadows_type=True):
+        return self.setitem(w_key, w_value)
+
+    def delitem(self, w_key):
+        hash = self.space.hash_w(w_key)
+        index = self._lookup(w_key, hash)
+        if index < 0:
+            raise KeyError
+        self.len -= 1
+        if self.len == 0:
+            return self.space.emptydictimpl
+        i = hash & self.mask
+        perturb = r_uint(hash)
+        while self._getslot(i) != index:
+            i = intmask(r_uint(i) * 5 + perturb + 1) & self.mask
+            perturb >>= PERTURB_SHIFT
+        self._setslot(i, DUMMY)
+        self.keys_w[index] = None
+        self.values_w[index] = None
+        if self.len * 8 < len(self.keys_w):
+            self._resize(self.len)
+        return self
+
+    def length(self):
+        return self.len
+
+    def _resize(self, minused):
+        """ Squeeze out the deleted entries and rebuild the table, big
+        enough for minused entries """
+        newsize = MIN_TABLE_SIZE
+        while newsize * 2 <= minused * 3:
+            newsize *= 2
+        hashes = [0] * self.len
+        keys_w = [None] * self.len
+        values_w = [None] * self.len
+        self._alloc_table(newsize)
+        j = 0
+        for index in range(len(self.keys_w)):
+            w_key = self.keys_w[index]
+            if w_key is not None:
+                hashes[j] = self.hashes[index]
+                keys_w[j] = w_key
+                values_w[j] = self.values_w[index]
+                self._insert_slot(hashes[j], j)
+                j += 1
+        self.hashes = hashes
+        self.keys_w = keys_w
+        self.values_w = values_w
+
+    def iteritems(self):
+        return CompactDictItemIteratorImplementation(self.space, self)
+    def iterkeys(self):
+        return CompactDictKeyIteratorImplementation(self.space, self)
+    def itervalues(self):
+        return CompactDictValueIteratorImplementation(self.space, self)
+
+    def keys(self):
+        return [w_key for w_key in self.keys_w if w_key is not None]
+
+    def values(self):
+        result_w = []
+        for index in range(len(self.keys_w)):
+            if self.keys_w[index] is not None:
+                result_w.append(self.values_w[index])
+        return result_w
+
+    def items(self):
+        space = self.space
+        result_w = []
+        for index in range(len(self.keys_w)):
+            w_key = self.keys_w[index]
+            if w_key is not None:
+                w_item = space.newtuple([w_key, self.values_w[index]])
+                result_w.append(w_item)
+        return result_w
+
+
+class CompactDictIteratorImplementation(IteratorImplementation):
+    def __init__(self, space, dictimplementation):
+        IteratorImplementation.__init__(self, space, dictimplementation)
+        self.index = 0
+
+    def next_entry(self):
+        keys_w = self.dictimplementation.keys_w
+        while self.index < len(keys_w):
+            index = self.index
+            self.index += 1
+            if keys_w[index] is not None:
+                return self.get_result(index)
+        return None
+
+
+class CompactDictKeyIteratorImplementation(CompactDictIteratorImplementation):
+    def get_result(self, index):
+        return self.dictimplementation.keys_w[index]
+
+class CompactDictValueIteratorImplementation(CompactDictIteratorImplementation):
+    def get_result(self, index):
+        return self.dictimplementation.values_w[index]
+
+class CompactDictItemIteratorImplementation(CompactDictIteratorImplementation):
+    def get_result(self, index):
+        impl = self.dictimplementation
+        return self.space.newtuple([impl.keys_w[index], impl.values_w[index]])
@@ -2,6 +2,7 @@ import py
 from pypy.objspace.std.objspace import *
 from pypy.interpreter import gateway
 from pypy.module.__builtin__.__init__ import BUILTIN_TO_INDEX, OPTIMIZED_BUILTINS
+from pypy.objspace.std.typeobject import VersionTag
 
 from pypy.rlib.objectmodel import r_dict, we_are_translated
 
@@ -38,7 +39,10 @@ def _is_sane_hash(space, w_lookup_type):
 # (in addition, any dictionary can go back to EmptyDictImplementation)
 
 class DictImplementation(object):
-    
+    # replaced by a new VersionTag whenever the content of a module
+    # dictionary changes, see ModuleDictImplementation
+    version_tag = None
+
     def get(self, w_lookup):
         #return w_value or None
         raise NotImplementedError("abstract base class")
@@ -562,9 +566,42 @@ class ShadowDetectingDictImplementation(StrDictImplementation):
     def set_shadows_anything(self):
         self._shadows_anything = True
 
-class WaryDictImplementation(StrDictImplementation):
+class ModuleDictImplementation(StrDictImplementation):
+    """ The dictionary of a module.  With withglobalcache its version_tag
+    is replaced whenever a key is added, changed or removed, which lets
+    the frames cache the results of LOAD_GLOBAL. """
+
     def __init__(self, space):
         StrDictImplementation.__init__(self, space)
+        if space.config.objspace.std.withglobalcache:
+            self.version_tag = VersionTag()
+
+    def changed(self):
+        if self.space.config.objspace.std.withglobalcache:
+            self.version_tag = VersionTag()
+
+    def setitem_str(self, w_key, w_value, shadows_type=True):
+        key = self.space.str_w(w_key)
+        if self.content.get(key, None) is not w_value:
+            self.content[key] = w_value
+            self.changed()
+        return self
+
+    def delitem(self, w_key):
+        space = self.space
+        w_key_type = space.type(w_key)
+        if space.is_w(w_key_type, space.w_str):
+            del self.content[space.str_w(w_key)]
+            self.changed()
+            return self
+        elif _is_sane_hash(space, w_key_type):
+            raise KeyError
+        else:
+            return self._as_rdict().delitem(w_key)
+
+class WaryDictImplementation(ModuleDictImplementation):
+    def __init__(self, space):
+        ModuleDictImplementation.__init__(self, space)
         self.shadowed = [None] * len(BUILTIN_TO_INDEX)
 
     def setitem_str(self, w_key, w_value, shadows_type=True):
@@ -572,8 +609,8 @@ class WaryDictImplementation(StrDictImplementation):
         i = BUILTIN_TO_INDEX.get(key, -1)
         if i != -1:
             self.shadowed[i] = w_value
-        self.content[key] = w_value
-        return self
+        return ModuleDictImplementation.setitem_str(self, w_key, w_value,
+                                                    shadows_type)
 
     def delitem(self, w_key):
         space = self.space
@@ -581,6 +618,7 @@ class WaryDictImplementation(StrDictImplementation):
         if space.is_w(w_key_type, space.w_str):
             key = space.str_w(w_key)
             del self.content[key]
+            self.changed()
             i = BUILTIN_TO_INDEX.get(key, -1)
             if i != -1:
                 self.shadowed[i] = None
@@ -1025,9 +1063,11 @@ def report():
 class W_DictMultiObject(W_Object):
     from pypy.objspace.std.dicttype import dict_typedef as typedef
 
-    def __init__(w_self, space, wary=False, sharing=False):
+    def __init__(w_self, space, wary=False, sharing=False, module=False):
         if space.config.objspace.opcodes.CALL_LIKELY_BUILTIN and wary:
             w_self.implementation = WaryDictImplementation(space)
+        elif space.config.objspace.std.withglobalcache and module:
+            w_self.implementation = ModuleDictImplementation(space)
         elif space.config.objspace.std.withdictmeasurement:
             w_self.implementation = MeasuringDictImplementation(space)
         elif space.config.objspace.std.withsharingdict and sharing:
@@ -5,7 +5,8 @@ from pypy.objspace.std.sliceobject import W_SliceObject
 
 from pypy.objspace.std import slicetype
 from pypy.interpreter import gateway, baseobjspace
-from pypy.rlib.listsort import TimSort
+from pypy.rlib.listsort import TimSort, make_timsort_class
+from pypy.rlib.rarithmetic import ovfcheck
 
 
 # ListImplementations
@@ -14,6 +15,8 @@ from pypy.rlib.listsort import TimSort
 #
 # RDictImplementation -- standard implementation
 # StrListImplementation -- lists consisting only of strings
+# IntListImplementation -- lists consisting only of ints, unboxed
+# FloatListImplementation -- lists consisting only of floats, unboxed
 # ChunkedListImplementation -- when having set the withchunklist option
 # SmartResizableListImplementation -- when having set the
 #                                     withsmartresizablelist option
@@ -405,6 +408,10 @@ class EmptyListImplementation(ListImplementation):
         if space.is_w(w_type, space.w_str):
             strlist = [space.str_w(w_item)]
             return StrListImplementation(space, strlist)
+        if space.is_w(w_type, space.w_int):
+            return IntListImplementation(space, [space.int_w(w_item)])
+        if _is_float(space, w_item):
+            return FloatListImplementation(space, [space.float_w(w_item)])
         return RListImplementation(space, [w_item])
 
     def length(self):
@@ -540,6 +547,140 @@ class StrListImplementation(ListImplementation):
         return "StrListImplementation(%s)" % (self.strlist, )
 
 
+def make_unboxed_list_implementation(name, is_item, unwrap_item, wrap_item,
+                                     zero, from_range=False):
+    """ A class of list implementations keeping items of a single type
+    unwrapped in an RPython list, 'items'.  With from_range, the lists
+    can also be extended with RangeImplementations without wrapping. """
+
+    class UnboxedListImplementation(ListImplementation):
+        def __init__(self, space, items):
+            self.items = items
+            ListImplementation.__init__(self, space)
+
+        def length(self):
+            return len(self.items)
+
+        def getitem(self, i):
+            assert 0 <= i < len(self.items)
+            return wrap_item(self.space, self.items[i])
+
+        def getitem_slice(self, start, stop):
+            assert 0 <= start < len(self.items)
+            assert 0 <= stop <= len(self.items)
+            return UnboxedListImplementation(self.space,
+                                             self.items[start:stop])
+
+        def getitem_slice_step(self, start, stop, step, slicelength):
+            assert 0 <= start < len(self.items)
+            # stop is -1 e.g. for [2::-1]
+            assert -1 <= stop <= len(self.items)
+            assert slicelength > 0
+            res = [zero] * slicelength
+            for i in range(slicelength):
+                res[i] = self.items[start]
+                start += step
+            return UnboxedListImplementation(self.space, res)
+
+        def delitem(self, i):
+            assert 0 <= i < len(self.items)
+            if len(self.items) == 1:
+                return self.space.fromcache(State).empty_impl
+            del self.items[i]
+            return self
+
+        def delitem_slice(self, start, stop):
+            assert 0 <= start < len(self.items)
+            assert 0 <= stop <= len(self.items)
+            if len(self.items) == stop and start == 0:
+                return self.space.fromcache(State).empty_impl
+            del self.items[start:stop]
+            return self
+
+        def setitem(self, i, w_item):
+            assert 0 <= i < len(self.items)
+            if is_item(self.space, w_item):
+                self.items[i] = unwrap_item(self.space, w_item)
+                return self
+            return None
+
+        def insert(self, i, w_item):
+            assert 0 <= i <= len(self.items)
+            if is_item(self.space, w_item):
+                self.items.insert(i, unwrap_item(self.space, w_item))
+                return self
+            return None
+
+        def append(self, w_item):
+            if is_item(self.space, w_item):
+                self.items.append(unwrap_item(self.space, w_item))
+                return self
+            return None
+
+        def unboxed_items(self, other):
+            if isinstance(other, UnboxedListImplementation):
+                return other.items
+            if from_range and isinstance(other, RangeImplementation):
+                return other.get_int_list()
+            return None
+
+        def add(self, other):
+            items = self.unboxed_items(other)
+            if items is not None:
+                return UnboxedListImplementation(self.space,
+                                                 self.items + items)
+            return None
+
+        def extend(self, other):
+            items = self.unboxed_items(other)
+            if items is not None:
+                self.items.extend(items)
+                return self
+            return None
+
+        def reverse(self):
+            self.items.reverse()
+            return self
+
+        def mul(self, times):
+            return UnboxedListImplementation(self.space, self.items * times)
+
+        def get_list_w(self):
+            space = self.space
+            return [wrap_item(space, item) for item in self.items]
+
+        def __repr__(self):
+            return "%s(%s)" % (name, self.items)
+
+    UnboxedListImplementation.__name__ = name
+    return UnboxedListImplementation
+
+def _is_int(space, w_item):
+    return space.is_w(space.type(w_item), space.w_int)
+
+def _int_w(space, w_item):
+    return space.int_w(w_item)
+
+def _is_float(space, w_item):
+    # a NaN stays boxed: it is only equal to itself by identity, which
+    # 'in', index(), remove(), count() and == rely on
+    if not space.is_w(space.type(w_item), space.w_float):
+        return False
+    x = space.float_w(w_item)
+    return x == x
+
+def _float_w(space, w_item):
+    return space.float_w(w_item)
+
+def _wrap_float(space, item):
+    return space.wrap(item)
+
+IntListImplementation = make_unboxed_list_implementation(
+    "IntListImplementation", _is_int, _int_w, wrapint, 0, from_range=True)
+FloatListImplementation = make_unboxed_list_implementation(
+    "FloatListImplementation", _is_float, _float_w, _wrap_float, 0.0)
+
+
 class RangeImplementation(ListImplementation):
     def __init__(self, space, start, step, length):
         ListImplementation.__init__(self, space)
@@ -595,6 +736,58 @@ class RangeImplementation(ListImplementation):
         self.step = -self.step
         return self
 
+    # the changes that keep only ints make an IntListImplementation; the
+    # others return None before building the int list
+
+    def setitem(self, i, w_item):
+        if not _is_int(self.space, w_item):
+            return None
+        return self.to_intlist().setitem(i, w_item)
+
+    def insert(self, i, w_item):
+        if not _is_int(self.space, w_item):
+            return None
+        return self.to_intlist().insert(i, w_item)
+
+    def append(self, w_item):
+        if not _is_int(self.space, w_item):
+            return None
+        return self.to_intlist().append(w_item)
+
+    def int_items(self, other):
+        if isinstance(other, IntListImplementation):
+            return other.items
+        if isinstance(other, RangeImplementation):
+            return other.get_int_list()
+        return None
+
+    def extend(self, other):
+        items = self.int_items(other)
+        if items is None:
+            return None
+        return IntListImplementation(self.space,
+                                     self.get_int_list() + items)
+
+    def add(self, other):
+        items = self.int_items(other)
+        if items is None:
+            return None
+        return IntListImplementation(self.space,
+                                     self.get_int_list() + items)
+
+    def to_intlist(self):
+        return IntListImplementation(self.space, self.get_int_list())
+
+    def get_int_list(self):
+        items = [0] * self.len
+        i = self.start
+        n = 0
+        while n < self.len:
+            items[n] = i
+            i += self.step
+            n += 1
+        return items
+
     def get_list_w(self):
         start = self.start
         step = self.step
@@ -831,6 +1024,17 @@ def make_implementation(space, list_w):
             is_homogeneous(space, list_w, w_type)):
             strlist = [space.str_w(w_i) for w_i in list_w]
             return StrListImplementation(space, strlist)
+        elif (space.is_w(w_type, space.w_int) and
+              is_homogeneous(space, list_w, w_type)):
+            intlist = [space.int_w(w_i) for w_i in list_w]
+            return IntListImplementation(space, intlist)
+        elif (space.is_w(w_type, space.w_float) and
+              is_homogeneous(space, list_w, w_type)):
+            floatlist = [space.float_w(w_i) for w_i in list_w]
+            for x in floatlist:
+                if x != x:
+                    return RListImplementation(space, list_w)
+            return FloatListImplementation(space, floatlist)
         else:
             return RListImplementation(space, list_w)
 
@@ -884,7 +1088,7 @@ def init__ListMulti(space, w_list, __args__):
     if w_iterable is not EMPTY_LIST:
         list_w = space.unpackiterable(w_iterable)
         if list_w:
-            w_list.implementation = RListImplementation(space, list_w)
+            w_list.implementation = make_implementation(space, list_w)
             return
     w_list.implementation = space.fromcache(State).empty_impl
 
@@ -914,15 +1118,50 @@ def getitem__ListMulti_Slice(space, w_list, w_slice):
             start, stop, step, slicelength))
 
 def contains__ListMulti_ANY(space, w_list, w_obj):
+    impl = w_list.implementation
+    w_type = space.type(w_obj)
+    if (isinstance(impl, IntListImplementation) and
+        space.is_w(w_type, space.w_int)):
+        return space.newbool(space.int_w(w_obj) in impl.items)
+    if (isinstance(impl, FloatListImplementation) and
+        space.is_w(w_type, space.w_float)):
+        return space.newbool(space.float_w(w_obj) in impl.items)
     # needs to be safe against eq_w() mutating the w_list behind our back
     i = 0
-    impl = w_list.implementation
     while i < impl.length(): # intentionally always calling len!
         if space.eq_w(impl.getitem(i), w_obj):
             return space.w_True
         i += 1
     return space.w_False
 
+def sum_unboxed(space, w_sequence, w_start):
+    """ The sum of a list of unboxed ints or floats and w_start, or None
+    if it is not such a list or the ints overflow """
+    if not space.is_w(space.type(w_sequence), space.w_list):
+        return None
+    assert isinstance(w_sequence, W_ListMultiObject)
+    impl = w_sequence.implementation
+    w_starttype = space.type(w_start)
+    if isinstance(impl, IntListImplementation):
+        if not space.is_w(w_starttype, space.w_int):
+            return None
+        total = space.int_w(w_start)
+        try:
+            for item in impl.items:
+                total = ovfcheck(total + item)
+        except OverflowError:
+            return None
+        return wrapint(space, total)
+    if isinstance(impl, FloatListImplementation):
+        if not (space.is_w(w_starttype, space.w_float) or
+                space.is_w(w_starttype, space.w_int)):
+            return None
+        ftotal = space.float_w(space.float(w_start))
+        for fitem in impl.items:
+            ftotal += fitem
+        return space.wrap(ftotal)
+    return None
+
 def iter__ListMulti(space, w_list):
     from pypy.objspace.std import iterobject
     return iterobject.W_SeqIterObject(w_list)
@@ -1288,11 +1527,39 @@ class CustomKeyCompareSort(CustomCompareSort):
         assert isinstance(b, KeyContainer)
         return CustomCompareSort.lt(self, a.w_key, b.w_key)
 
+# the unboxed lists are sorted without wrapping their items, with
+# separate TimSort classes (see rlib/listsort.py)
+IntSort = make_timsort_class()
+FloatSort = make_timsort_class()
+
+def sort_unboxed(impl, has_reverse):
+    # the same steps as below, to get the same order of the equal floats
+    if has_reverse:
+        impl.items.reverse()
+    if isinstance(impl, IntListImplementation):
+        IntSort(impl.items).sort()
+    else:
+        assert isinstance(impl, FloatListImplementation)
+        FloatSort(impl.items).sort()
+    if has_reverse:
+        impl.items.reverse()
+
 def list_sort__ListMulti_ANY_ANY_ANY(space, w_list, w_cmp, w_keyfunc, w_reverse):
     has_cmp = not space.is_w(w_cmp, space.w_None)
     has_key = not space.is_w(w_keyfunc, space.w_None)
     has_reverse = space.is_true(w_reverse)
 
+    impl = w_list.implementation
+    if not has_cmp and not has_key:
+        if isinstance(impl, RangeImplementation):
+            impl = impl.to_intlist()
+            w_list.implementation = impl
+        if (isinstance(impl, IntListImplementation) or
+            isinstance(impl, FloatListImplementation)):
+            # the comparisons cannot run app-level code, nor change the list
+            sort_unboxed(impl, has_reverse)
+            return space.w_None
+
     # create and setup a TimSort instance
     if has_cmp: 
         if has_key: 
@@ -135,6 +135,53 @@ class StdObjSpace(ObjSpace, DescrOperation):
                         f.dropvalues(nargs)
                     f.pushvalue(w_result)
 
+            if self.config.objspace.std.withglobalcache:
+                def LOAD_GLOBAL(f, nameindex, *ignored):
+                    from pypy.objspace.std.dictmultiobject import W_DictMultiObject
+                    from pypy.interpreter.module import Module
+                    w_globals = f.w_globals
+                    globals_tag = None
+                    if isinstance(w_globals, W_DictMultiObject):
+                        globals_tag = w_globals.implementation.version_tag
+                    if globals_tag is None:
+                        # not a module dictionary, nothing can be cached
+                        f.pushvalue(f._load_global(f.getname_w(nameindex)))
+                        return
+                    code = f.pycode
+                    builtins = f.get_builtin()
+                    assert isinstance(builtins, Module)
+                    w_builtin_dict = builtins.w_dict
+                    assert isinstance(w_builtin_dict, W_DictMultiObject)
+                    if code.globalcache_globals_tags[nameindex] is globals_tag:
+                        builtins_tag = code.globalcache_builtins_tags[nameindex]
+                        if (builtins_tag is None or builtins_tag is
+                                w_builtin_dict.implementation.version_tag):
+                            f.pushvalue(code.globalcache_values_w[nameindex])
+                            return
+                    w_varname = f.getname_w(nameindex)
+                    w_value = f.space.finditem(w_globals, w_varname)
+                    builtins_tag = None
+                    if w_value is None:
+                        w_value = builtins.getdictvalue(f.space, w_varname)
+                        if w_value is None:
+                            f._load_global(w_varname)   # raises NameError
+                        # read after the lookup, which can load a lazy builtin
+                        builtins_tag = w_builtin_dict.implementation.version_tag
+                        if builtins_tag is None:
+                            f.pushvalue(w_value)
+                            return
+                    code.globalcache_globals_tags[nameindex] = globals_tag
+                    code.globalcache_builtins_tags[nameindex] = builtins_tag
+                    code.globalcache_values_w[nameindex] = w_value
+                    f.pushvalue(w_value)
+
+            if self.config.objspace.std.withattrcache:
+                from pypy.objspace.std import attrcache
+                LOAD_ATTR = attrcache.LOAD_ATTR
+                STORE_ATTR = attrcache.STORE_ATTR
+                if self.config.objspace.opcodes.CALL_METHOD:
+                    LOOKUP_METHOD = attrcache.LOOKUP_METHOD
+
             if self.config.objspace.std.logspaceoptypes:
                 _space_op_types = []
                 for name, func in pyframe.PyFrame.__dict__.iteritems():
@@ -180,6 +227,9 @@ class StdObjSpace(ObjSpace, DescrOperation):
             if self.config.objspace.std.withbucketdict:
                 from pypy.objspace.std import dictbucket
                 self.DefaultDictImpl = dictbucket.BucketDictImplementation
+            elif self.config.objspace.std.withcompactdict:
+                from pypy.objspace.std import dictcompact
+                self.DefaultDictImpl = dictcompact.CompactDictImplementation
             else:
                 self.DefaultDictImpl = dictmultiobject.RDictImplementation
         else:
@@ -357,8 +407,9 @@ class StdObjSpace(ObjSpace, DescrOperation):
             ec.method_cache_names = [None] * SIZE
             ec.method_cache_lookup_where = [(None, None)] * SIZE
             if self.config.objspace.std.withmethodcachecounter:
-                ec.method_cache_hits = {}
-                ec.method_cache_misses = {}
+                from pypy.objspace.std.typeobject import \
+                     reset_method_cache_counter
+                reset_method_cache_counter(ec)
         return ec
 
     def createframe(self, code, w_globals, closure=None):
@@ -520,6 +571,9 @@ class StdObjSpace(ObjSpace, DescrOperation):
         if self.config.objspace.opcodes.CALL_LIKELY_BUILTIN and track_builtin_shadowing:
             from pypy.objspace.std.dictmultiobject import W_DictMultiObject
             return W_DictMultiObject(self, wary=True)
+        if self.config.objspace.std.withglobalcache and track_builtin_shadowing:
+            from pypy.objspace.std.dictmultiobject import W_DictMultiObject
+            return W_DictMultiObject(self, module=True)
         return self.DictObjectCls(self)
 
     def newslice(self, w_start, w_end, w_step):
@@ -0,0 +1,145 @@
+from pypy.conftest import gettestobjspace
+
+class TestAttrCache(object):
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.std.withattrcache": True,
+                                       "objspace.opcodes.CALL_METHOD": True})
+
+    def test_cache_filled(self):
+        space = self.space
+        w_f = space.appexec([], """():
+            class A(object):
+                def __init__(self, x):
+                    self.x = x
+                def m(self):
+                    return 1
+            def f(a):
+                a.x = a.x + a.m()
+                return a
+            f(A(5))
+            return f
+        """)
+        w_code = space.getattr(w_f, space.wrap("func_code"))
+        code = space.interpclass_w(w_code)
+        names = [space.str_w(w_name) for w_name in code.co_names_w]
+        x = names.index('x')
+        m = names.index('m')
+        assert code.attrcache_structures[x] is not None
+        assert code.attrcache_indexes[x] == 0
+        assert code.attrcache_structures[m] is None
+        assert code.callmethodcache_structures[m] is not None
+        assert code.callmethodcache_structures[x] is None
+
+class AppTestAttrCache(object):
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.std.withattrcache": True,
+                                       "objspace.opcodes.CALL_METHOD": True})
+
+    def test_load_store(self):
+        class A(object):
+            pass
+        def get(a):
+            return a.x
+        def put(a, value):
+            a.x = value
+        a = A()
+        a.x = 1
+        b = A()
+        b.y = 2
+        b.x = 3
+        assert get(a) == 1
+        assert get(b) == 3
+        assert get(a) == 1
+        put(a, 4)
+        put(a, 5)
+        assert a.x == 5
+        assert a.__dict__ == {'x': 5}
+        put(b, 6)
+        assert b.__dict__ == {'y': 2, 'x': 6}
+
+    def test_class_changed(self):
+        class A(object):
+            pass
+        def get(a):
+            return a.x
+        def put(a, value):
+            a.x = value
+        a = A()
+        put(a, 1)
+        put(a, 2)
+        assert get(a) == 2
+        A.x = property(lambda self: 42, lambda self, value: None)
+        assert get(a) == 42
+        put(a, 3)
+        assert get(a) == 42
+        del A.x
+        assert get(a) == 2
+
+    def test_class_attribute(self):
+        class A(object):
+            x = 0
+        def get(a):
+            return a.x
+        a = A()
+        assert get(a) == 0
+        a.x = 1
+        assert get(a) == 1
+        assert get(a) == 1
+        del a.x
+        assert get(a) == 0
+
+    def test_descriptor_gets_set(self):
+        class D(object):
+            pass
+        class A(object):
+            x = D()
+        def get(a):
+            return a.x
+        a = A()
+        a.__dict__['x'] = 1
+        assert get(a) == 1
+        assert get(a) == 1
+        D.__get__ = lambda self, obj, type: 42
+        D.__set__ = lambda self, obj, value: None
+        assert get(a) == 42
+
+    def test_getattribute_setattr(self):
+        class A(object):
+            pass
+        def get(a):
+            return a.x
+        def put(a, value):
+            a.x = value
+        a = A()
+        put(a, 1)
+        put(a, 2)
+        assert get(a) == 2
+        A.__getattribute__ = lambda self, name: 42
+        assert get(a) == 42
+        del A.__getattribute__
+        seen = []
+        A.__setattr__ = lambda self, name, value: seen.append(value)
+        put(a, 3)
+        assert seen == [3]
+        assert get(a) == 2
+
+    def test_method(self):
+        class A(object):
+            def m(self):
+                return 1
+        def call(a):
+            return a.m()
+        a = A()
+        assert call(a) == 1
+        assert call(a) == 1
+        a.m = lambda: 2
+        assert call(a) == 2
+        del a.m
+        assert call(a) == 1
+        A.m = lambda self: 3
+        assert call(a) == 3
+        class B(A):
+            def m(self):
+                return 4
+        assert call(B()) == 4
+        assert call(a) == 3
@@ -0,0 +1,71 @@
+from pypy.objspace.std.dictcompact import CompactDictImplementation
+from pypy.objspace.std.test import test_dictmultiobject
+
+
+Base = test_dictmultiobject.TestRDictImplementation
+
+class TestCompactDictImplementation(Base):
+    ImplementionClass = CompactDictImplementation
+    DevolvedClass     = CompactDictImplementation
+    DefaultDictImpl   = CompactDictImplementation
+
+    def test_stress(self):
+        from random import randint
+        N = 2000
+        impl = self.impl
+        pydict = {}
+        for i in range(10 * N):
+            x = randint(-N, N)
+            if x in pydict and randint(0, 2) == 0:
+                impl = impl.delitem(x)
+                del pydict[x]
+            else:
+                impl = impl.setitem(x, i)
+                pydict[x] = i
+            assert impl.length() == len(pydict)
+        for x in range(-N, N + 1):
+            assert impl.get(x) == pydict.get(x)
+        items = impl.items()
+        items.sort()
+        assert items == sorted(pydict.items())
+
+    def test_insertion_order(self):
+        impl = self.impl
+        keys = range(600, 0, -3)
+        for key in keys:
+            impl = impl.setitem(key, str(key))
+        assert impl.smallindexes is None
+        impl = impl.delitem(600)
+        impl = impl.setitem(600, "x")
+        assert impl.keys() == keys[1:] + [600]
+        assert impl.values() == [str(key) for key in keys[1:]] + ["x"]
+        for key in keys[1:]:
+            impl = impl.delitem(key)
+        assert impl.keys() == [600]
+        assert impl.smallindexes is not None
+
+    def test_eq_mutating_the_dict(self):
+        # a failed comparison that rebuilds the table must not make the
+        # lookup miss a key that is still in the dict
+        impl = self.impl
+        class Key(object):
+            def __init__(self, mutate):
+                self.mutate = mutate
+            def __hash__(self):
+                return 1
+            def __eq__(self, other):
+                if self.mutate:
+                    self.mutate = False
+                    impl.delitem(x)
+                    for i in range(100, 120):
+                        impl.setitem(i, i)
+                return False
+        x = Key(False)
+        y = Key(False)
+        impl = impl.setitem(x, "x")
+        impl = impl.setitem(y, "y")
+        y.mutate = True
+        assert impl.get(y) == "y"
+        assert not y.mutate
+        assert impl.get(x) is None
+        assert impl.length() == 21
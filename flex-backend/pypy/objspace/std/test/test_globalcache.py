@@ -0,0 +1,104 @@
+from pypy.conftest import gettestobjspace
+
+class TestGlobalCache(object):
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.std.withglobalcache": True})
+
+    def test_version_tag(self):
+        space = self.space
+        w_dict = space.newdict(track_builtin_shadowing=True)
+        tag1 = w_dict.implementation.version_tag
+        assert tag1 is not None
+        space.setitem(w_dict, space.wrap("a"), space.w_None)
+        tag2 = w_dict.implementation.version_tag
+        assert tag2 is not tag1
+        space.setitem(w_dict, space.wrap("a"), space.w_None)
+        assert w_dict.implementation.version_tag is tag2
+        space.setitem(w_dict, space.wrap("a"), space.w_True)
+        tag3 = w_dict.implementation.version_tag
+        assert tag3 is not tag2
+        space.delitem(w_dict, space.wrap("a"))
+        assert w_dict.implementation.version_tag is not tag3
+        space.setitem(w_dict, space.wrap(1), space.w_None)
+        assert w_dict.implementation.version_tag is None
+
+    def test_cache_filled(self):
+        space = self.space
+        w_f = space.appexec([], """():
+            x = 42
+            def f():
+                return x
+            return f
+        """)
+        w_code = space.getattr(w_f, space.wrap("func_code"))
+        code = space.interpclass_w(w_code)
+        # 'x' is a free variable, there are no globals
+        assert code.globalcache_values_w == []
+        w_mod = space.appexec([], """():
+            import sys
+            mod = type(sys)('m')
+            exec '''
+x = 42
+def f():
+    return x, len
+''' in mod.__dict__
+            mod.f()
+            return mod
+        """)
+        w_code = space.getattr(space.getattr(w_mod, space.wrap("f")),
+                               space.wrap("func_code"))
+        code = space.interpclass_w(w_code)
+        values_w = code.globalcache_values_w
+        assert space.eq_w(values_w[0], space.wrap(42))
+        assert code.globalcache_builtins_tags[0] is None
+        assert code.globalcache_builtins_tags[1] is not None
+
+class AppTestGlobalCache(object):
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.std.withglobalcache": True})
+
+    def test_change_global(self):
+        import sys
+        mod = type(sys)('m')
+        exec '''
+x = 1
+def f():
+    return x
+''' in mod.__dict__
+        assert mod.f() == 1
+        mod.x = 2
+        assert mod.f() == 2
+        mod.__dict__['x'] = 3
+        assert mod.f() == 3
+        del mod.x
+        raises(NameError, mod.f)
+        mod.x = 4
+        assert mod.f() == 4
+
+    def test_shadow_builtin(self):
+        import sys, __builtin__
+        mod = type(sys)('m')
+        exec '''
+def f():
+    return len
+''' in mod.__dict__
+        original_len = len
+        assert mod.f() is original_len
+        mod.len = 42
+        assert mod.f() == 42
+        del mod.len
+        assert mod.f() is original_len
+        __builtin__.len = 43
+        try:
+            assert mod.f() == 43
+        finally:
+            __builtin__.len = original_len
+        assert mod.f() is original_len
+
+    def test_other_globals(self):
+        def f():
+            return y
+        code = f.func_code
+        assert eval(code, {'y': 1}) == 1
+        assert eval(code, {'y': 2}) == 2
+        raises(NameError, eval, code, {})
@@ -36,6 +36,141 @@ class AppTest_ListMultiObject(test_listobject.AppTestW_ListObject):
         assert l == ["a", "b", "c", "d", "e", "f"]
         assert "StrListImplementation" in __pypy__.internal_repr(l)
 
+    def test_intlist(self):
+        import __pypy__
+        l = [3, 1, 2]
+        assert "IntListImplementation" in __pypy__.internal_repr(l)
+        l.append(5)
+        l.extend([4, 0])
+        l[1] = 7
+        l.insert(0, 6)
+        assert l == [6, 3, 7, 2, 5, 4, 0]
+        assert "IntListImplementation" in __pypy__.internal_repr(l)
+        assert "IntListImplementation" in __pypy__.internal_repr(l[1:5])
+        assert "IntListImplementation" in __pypy__.internal_repr(l[::2])
+        assert "IntListImplementation" in __pypy__.internal_repr(l * 2)
+        assert l[::-2] == [0, 5, 7, 6]
+        l.append(True)
+        assert "IntListImplementation" not in __pypy__.internal_repr(l)
+        assert l == [6, 3, 7, 2, 5, 4, 0, 1]
+        assert type(l[-1]) is bool
+
+    def test_intlist_from_range(self):
+        import __pypy__
+        l = range(3)
+        l.append(3)
+        assert l == [0, 1, 2, 3]
+        assert "IntListImplementation" in __pypy__.internal_repr(l)
+        l.extend(range(4, 6))
+        l += range(6, 8)
+        assert l == range(8)
+        assert "IntListImplementation" in __pypy__.internal_repr(l)
+        l = [5] + range(2)
+        assert "IntListImplementation" in __pypy__.internal_repr(l)
+        assert l == [5, 0, 1]
+        l = range(2)
+        l.append("x")
+        assert l == [0, 1, "x"]
+
+    def test_floatlist(self):
+        import __pypy__
+        l = []
+        l.append(1.5)
+        l.extend([0.5, -2.0])
+        assert "FloatListImplementation" in __pypy__.internal_repr(l)
+        assert l == [1.5, 0.5, -2.0]
+        l[0] = 3
+        assert "FloatListImplementation" not in __pypy__.internal_repr(l)
+        assert l == [3, 0.5, -2.0]
+        assert type(l[0]) is int
+        l = [1.0, 2.0]
+        del l[0]
+        del l[0]
+        assert l == []
+        assert "EmptyListImplementation" in __pypy__.internal_repr(l)
+
+    def test_unboxed_contains(self):
+        l = [1, 2, 3]
+        assert 2 in l
+        assert 4 not in l
+        assert 2.0 in l
+        assert True in l
+        l = [1.5, 2.0]
+        assert 1.5 in l
+        assert 2 in l
+        assert 3.0 not in l
+
+    def test_nan_is_kept_boxed(self):
+        import __pypy__
+        inf = 1e200 * 1e200
+        x = inf - inf
+        l3 = [1.5]
+        l3.append(x)
+        for l in [[x], [1.5, x], l3]:
+            assert "FloatListImplementation" not in __pypy__.internal_repr(l)
+            assert x in l
+            assert l.index(x) == len(l) - 1
+            assert l.count(x) == 1
+            assert l == l[:]
+            l.remove(x)
+            assert x not in l
+        l = [1.5, 2.5]
+        l[0] = x
+        assert l[0] is x
+        assert l.index(x) == 0
+
+    def test_range_with_other_items(self):
+        import __pypy__
+        l = range(5)
+        l.append("x")
+        assert l == [0, 1, 2, 3, 4, "x"]
+        l = range(3)
+        l.extend(["a", "b"])
+        assert l == [0, 1, 2, "a", "b"]
+        l = range(3)
+        l.extend(range(3, 5))
+        assert l == range(5)
+        assert "IntListImplementation" in __pypy__.internal_repr(l)
+        l = range(3) + [1.5]
+        assert l == [0, 1, 2, 1.5]
+        l = range(3)
+        l[1] = None
+        l.insert(0, "y")
+        assert l == ["y", 0, None, 2]
+
+    def test_unboxed_sort(self):
+        import __pypy__
+        l = [5, -1, 3, 3, 0, 7]
+        l.sort()
+        assert l == [-1, 0, 3, 3, 5, 7]
+        assert "IntListImplementation" in __pypy__.internal_repr(l)
+        l.sort(reverse=True)
+        assert l == [7, 5, 3, 3, 0, -1]
+        l.sort(key=lambda x: x % 3)
+        assert l == [3, 3, 0, 7, 5, -1]
+        l = [2.5, -0.0, 0.0, 1.0]
+        l.sort()
+        assert l == [-0.0, 0.0, 1.0, 2.5]
+        assert str(l[0]) == "-0.0" and str(l[1]) == "0.0"
+        l.sort(reverse=True)
+        assert l == [2.5, 1.0, -0.0, 0.0]
+        assert str(l[2]) == "-0.0" and str(l[3]) == "0.0"
+
+    def test_unboxed_sum(self):
+        import sys
+        assert sum([1, 2, 3]) == 6
+        assert sum([1, 2, 3], 10) == 16
+        assert sum([1.5, 2.5]) == 4.0
+        assert sum([1.5, 2.5], 1) == 5.0
+        assert sum([sys.maxint, 1]) == sys.maxint + 1
+        assert sum([1, 2], 0.5) == 3.5
+        assert sum([[1], [2]], []) == [1, 2]
+        class L(list):
+            def __iter__(self):
+                return iter([42])
+        assert sum(L([1, 2])) == 42
+        raises(TypeError, sum, [1, 2], "")
+
 class AppTestRangeImplementation(AppTestRangeListObject):
 
     def setup_class(cls):
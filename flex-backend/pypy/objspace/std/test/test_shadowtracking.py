@@ -167,6 +167,33 @@ class AppTestMethodCaching(AppTestShadowTracking):
         cache_counter = __pypy__.method_cache_counter("f")
         assert cache_counter == (0, 10)
 
+    def test_stats(self):
+        import __pypy__
+        class A(object):
+            def f(self):
+                return 42
+        class B(object):
+            def f(self):
+                return 43
+        l = [A(), B()] * 10
+        __pypy__.reset_method_cache_counter()
+        for a in l:
+            a.f()
+        stats = __pypy__.method_cache_stats()
+        hits, misses, collisions = stats['names']['f']
+        assert hits + misses == 20
+        assert misses >= 2
+        assert collisions <= misses
+        assert stats['size'] == 1 << stats['sizeexp']
+        assert 2 <= stats['used'] <= stats['size']
+        assert stats['hits'] >= hits
+        assert stats['misses'] >= misses
+        assert stats['collisions'] >= collisions
+        for sizeexp, (hits, misses) in stats['simulated'].items():
+            assert hits + misses == stats['hits'] + stats['misses']
+        __pypy__.reset_method_cache_counter()
+        assert __pypy__.method_cache_stats()['names'] == {}
+
     def test_subclasses(self):
         import __pypy__
         class A(object):
@@ -44,6 +44,36 @@ def _mangle(name, klass):
 class VersionTag(object):
     pass
 
+# the sizes of the method caches simulated with withmethodcachecounter
+SIMULATED_METHOD_CACHE_SIZEEXPS = range(4, 17)
+
+class SimulatedMethodCache(object):
+    """ A method cache of another size, only counting its hits """
+
+    def __init__(self, sizeexp):
+        self.sizeexp = sizeexp
+        self.versions = [None] * (1 << sizeexp)
+        self.names = [None] * (1 << sizeexp)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, version_tag, name, product):
+        method_hash = product >> (r_uint.BITS - self.sizeexp)
+        if (self.versions[method_hash] is version_tag and
+            self.names[method_hash] is name):
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.versions[method_hash] = version_tag
+            self.names[method_hash] = name
+
+def reset_method_cache_counter(ec):
+    ec.method_cache_hits = {}
+    ec.method_cache_misses = {}
+    ec.method_cache_collisions = {}
+    ec.method_cache_simulated = [SimulatedMethodCache(sizeexp) for sizeexp
+                                     in SIMULATED_METHOD_CACHE_SIZEEXPS]
+
 class W_TypeObject(W_Object):
     from pypy.objspace.std.typetype import type_typedef as typedef
 
@@ -321,7 +351,11 @@ class W_TypeObject(W_Object):
             tup = w_self._lookup_where(name)
             return tup
         SHIFT = r_uint.BITS - space.config.objspace.std.methodcachesizeexp
-        method_hash = r_uint(intmask(id(version_tag) * hash(name))) >> SHIFT
+        product = r_uint(intmask(id(version_tag) * hash(name)))
+        method_hash = product >> SHIFT
+        if space.config.objspace.std.withmethodcachecounter:
+            for simulated in ec.method_cache_simulated:
+                simulated.lookup(version_tag, name, product)
         cached_version_tag = ec.method_cache_versions[method_hash]
         if cached_version_tag is version_tag:
             cached_name = ec.method_cache_names[method_hash]
@@ -339,6 +373,10 @@ class W_TypeObject(W_Object):
         if space.config.objspace.std.withmethodcachecounter:
             ec.method_cache_misses[name] = \
                     ec.method_cache_misses.get(name, 0) + 1
+            if cached_version_tag is not None:
+                # the entry of another lookup is evicted
+                ec.method_cache_collisions[name] = \
+                        ec.method_cache_collisions.get(name, 0) + 1
 #        print "miss", w_self, name
         return tup
 
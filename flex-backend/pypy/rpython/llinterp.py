@@ -6,7 +6,7 @@ from pypy.rpython.lltypesystem import rclass
 from pypy.rpython.ootypesystem import ootype
 from pypy.rlib.objectmodel import ComputedIntSymbolic, CDefinedIntSymbolic
 
-import sys, os
+import sys, os, types
 import math
 import py
 import traceback, cStringIO
@@ -42,6 +42,9 @@ def type_name(etype):
 class LLInterpreter(object):
     """ low level interpreter working with concrete values. """
 
+    # evaluate the operations with the functions of a CompiledBlock
+    precompile = True
+
     def __init__(self, typer, heap=llheap, tracing=True, exc_data_ptr=None):
         self.bindings = {}
         self.typer = typer
@@ -53,6 +56,10 @@ class LLInterpreter(object):
         self.gc = None
         self.tracer = None
         self.frame_class = LLFrame
+        # {label: count} of the instrument_count operations, if not None
+        self.instrument_counters = None
+        self.compiled_blocks = {}   # {frame class: {block: CompiledBlock}}
+        self.generation = 0
         if hasattr(heap, "prepare_graphs_and_create_gc"):
             flowgraphs = typer.annotator.translator.graphs
             self.gc = heap.prepare_graphs_and_create_gc(self, flowgraphs)
@@ -60,6 +67,9 @@ class LLInterpreter(object):
             self.tracer = Tracer()
 
     def eval_graph(self, graph, args=()):
+        # the graphs may have been changed since the previous run: check
+        # the compiled blocks again when they are used
+        self.generation += 1
         llframe = self.frame_class(graph, args, self)
         if self.tracer:
             self.tracer.start()
@@ -90,6 +100,18 @@ class LLInterpreter(object):
                 self.tracer.stop()
         return retval
 
+    def get_compiled_block(self, frame_class, block):
+        try:
+            blocks = self.compiled_blocks[frame_class]
+        except KeyError:
+            blocks = self.compiled_blocks[frame_class] = {}
+        compiled = blocks.get(block)
+        if compiled is None or (compiled.generation != self.generation and
+                                not compiled.is_valid(block)):
+            compiled = blocks[block] = CompiledBlock(frame_class, block)
+        compiled.generation = self.generation
+        return compiled
+
     def print_traceback(self):
         frame = self.active_frame
         frames = []
@@ -202,7 +224,7 @@ class LLFrame(object):
     def setvar(self, var, val):
         if var.concretetype is not lltype.Void:
             try:
-                val = lltype.enforce(var.concretetype, val)
+                val = get_enforcer(var.concretetype)(val)
             except TypeError:
                 assert False, "type error: input value of type:\n\n\t%r\n\n===> variable of type:\n\n\t%r\n" % (lltype.typeOf(val), var.concretetype)
         assert isinstance(var, Variable)
@@ -213,15 +235,15 @@ class LLFrame(object):
             self.setvar(var, val)
 
     def getval(self, varorconst):
-        try:
-            val = varorconst.value
-        except AttributeError:
+        if isinstance(varorconst, Variable):
             val = self.bindings[varorconst]
+        else:
+            val = varorconst.value
         if isinstance(val, ComputedIntSymbolic):
             val = val.compute_fn()
         if varorconst.concretetype is not lltype.Void:
             try:
-                val = lltype.enforce(varorconst.concretetype, val)
+                val = get_enforcer(varorconst.concretetype)(val)
             except TypeError:
                 assert False, "type error: %r val from %r var/const" % (lltype.typeOf(val), varorconst.concretetype)
         return val
@@ -257,10 +279,17 @@ class LLFrame(object):
         try:
             nextblock = graph.startblock
             args = self.args
+            llinterpreter = self.llinterpreter
             while 1:
                 self.clear()
-                self.fillvars(nextblock, args)
-                nextblock, args = self.eval_block(nextblock)
+                if llinterpreter.precompile:
+                    compiled = llinterpreter.get_compiled_block(
+                        self.__class__, nextblock)
+                    compiled.fillvars(self, args)
+                    nextblock, args = self.eval_block(nextblock, compiled)
+                else:
+                    self.fillvars(nextblock, args)
+                    nextblock, args = self.eval_block(nextblock)
                 if nextblock is None:
                     self.llinterpreter.active_frame = self.f_back
                     for obj in self.alloca_objects:
@@ -271,21 +300,25 @@ class LLFrame(object):
             if tracer:
                 tracer.leave()
 
-    def eval_block(self, block):
+    def eval_block(self, block, compiled=None):
         """ return (nextblock, values) tuple. If nextblock
             is None, values is the concrete return value.
+            compiled is the CompiledBlock of the block, if any.
         """
         self.curr_block = block
         catch_exception = block.exitswitch == c_last_exception
         e = None
 
-        try:
-            for i, op in enumerate(block.operations):
-                self.curr_operation_index = i
-                self.eval_operation(op)
-        except LLException, e:
-            if not (catch_exception and op is block.operations[-1]):
-                raise
+        if compiled is not None:
+            e = self.eval_compiled_operations(compiled, catch_exception)
+        else:
+            try:
+                for i, op in enumerate(block.operations):
+                    self.curr_operation_index = i
+                    self.eval_operation(op)
+            except LLException, e:
+                if not (catch_exception and op is block.operations[-1]):
+                    raise
 
         # determine nextblock and/or return value
         if len(block.exits) == 0:
@@ -360,12 +393,63 @@ class LLFrame(object):
                                      "of %r" % (llexitvalue, block))
                 else:
                     link = defaultexit
-        return link.target, [self.getval(x) for x in link.args]
+        if compiled is None:
+            return link.target, [self.getval(x) for x in link.args]
+        # the values of the variables were checked when they were set,
+        # and they are checked again by the next block
+        bindings = self.bindings
+        values = []
+        for x in link.args:
+            if isinstance(x, Variable):
+                values.append(bindings[x])
+            else:
+                values.append(self.getval(x))
+        return link.target, values
+
+    def eval_compiled_operations(self, compiled, catch_exception):
+        """ Evaluate the operations of a block like eval_block(), with
+        the functions of its CompiledBlock; returns the LLException that
+        the last operation raised if the block catches it, else None.
+        """
+        runs = compiled.runs
+        tracer = self.llinterpreter.tracer
+        i = 0
+        try:
+            if tracer is None or tracer.file is None:
+                for run in runs:
+                    self.curr_operation_index = i
+                    run(self)
+                    i += 1
+            else:
+                texts = compiled.get_texts(tracer)
+                for run in runs:
+                    self.curr_operation_index = i
+                    tracer.dump_quoted(texts[i])
+                    retval = run(self)
+                    if retval is None:
+                        tracer.dump('\n')
+                    else:
+                        tracer.dump('   ---> %r\n' % (retval,))
+                    i += 1
+        except LLException, e:
+            if not (catch_exception and i == len(runs) - 1):
+                raise
+            return e
+        return None
 
     def eval_operation(self, operation):
         tracer = self.llinterpreter.tracer
         if tracer:
             tracer.dump(str(operation))
+        retval = self.perform_operation(operation)
+        if tracer:
+            if retval is None:
+                tracer.dump('\n')
+            else:
+                tracer.dump('   ---> %r\n' % (retval,))
+
+    def perform_operation(self, operation):
+        """ Evaluate the operation and set its result; returns it """
         ophandler = self.getoperationhandler(operation.opname)
         # XXX slighly unnice but an important safety check
         if operation.opname == 'direct_call':
@@ -381,38 +465,40 @@ class LLFrame(object):
             try:
                 retval = ophandler(*vals)
             except LLException, e:
-                # safety check check that the operation is allowed to raise that
-                # exception
-                if operation.opname in lloperation.LL_OPERATIONS:
-                    canraise = lloperation.LL_OPERATIONS[operation.opname].canraise
-                    if Exception not in canraise:
-                        exc = self.llinterpreter.find_exception(e)
-                        for canraiseexc in canraise:
-                            if issubclass(exc, canraiseexc):
-                                break
-                        else:
-                            raise TypeError("the operation %s is not expected to raise %s" % (operation, exc))
-
-                # for exception-transformed graphs, store the LLException
-                # into the exc_data used by this graph
-                exc_data = self.llinterpreter.get_transformed_exc_data(
-                    self.graph)
-                if exc_data:
-                    etype = e.args[0]
-                    evalue = e.args[1]
-                    exc_data.exc_type  = etype
-                    exc_data.exc_value = evalue
-                    from pypy.translator.c import exceptiontransform
-                    retval = exceptiontransform.error_value(
-                        operation.result.concretetype)
-                else:
-                    raise
+                retval = self.handle_llexception(operation, e)
         self.setvar(operation.result, retval)
-        if tracer:
-            if retval is None:
-                tracer.dump('\n')
-            else:
-                tracer.dump('   ---> %r\n' % (retval,))
+        return retval
+
+    def handle_llexception(self, operation, e):
+        """ Called when the operation raised the LLException e: returns
+        the error value of the operation in an exception-transformed
+        graph, or raises e again """
+        tb = sys.exc_info()[2]
+        # safety check check that the operation is allowed to raise that
+        # exception
+        if operation.opname in lloperation.LL_OPERATIONS:
+            canraise = lloperation.LL_OPERATIONS[operation.opname].canraise
+            if Exception not in canraise:
+                exc = self.llinterpreter.find_exception(e)
+                for canraiseexc in canraise:
+                    if issubclass(exc, canraiseexc):
+                        break
+                else:
+                    raise TypeError("the operation %s is not expected to raise %s" % (operation, exc))
+
+        # for exception-transformed graphs, store the LLException
+        # into the exc_data used by this graph
+        exc_data = self.llinterpreter.get_transformed_exc_data(
+            self.graph)
+        if exc_data:
+            etype = e.args[0]
+            evalue = e.args[1]
+            exc_data.exc_type  = etype
+            exc_data.exc_value = evalue
+            from pypy.translator.c import exceptiontransform
+            return exceptiontransform.error_value(
+                operation.result.concretetype)
+        raise e.__class__, e, tb
 
     def make_llexception(self, exc=None):
         if exc is None:
@@ -497,7 +583,9 @@ class LLFrame(object):
             raise LLFatalError(msg, LLException(ll_exc_type, ll_exc))
 
     def op_instrument_count(self, ll_tag, ll_label):
-        pass # xxx for now
+        counters = self.llinterpreter.instrument_counters
+        if counters is not None:
+            counters[ll_label] = counters.get(ll_label, 0) + 1
 
     def op_keepalive(self, value):
         pass
@@ -1006,6 +1094,210 @@ class LLFrame(object):
     def op_oohash(self, s):
         return ootype.oohash(s)
 
+# ____________________________________________________________
+# precompiled operations
+
+_enforcers = {}     # {id(TYPE): (TYPE, enforcer)}
+_primitive_classes = {lltype.Bool: bool, lltype.Float: float}
+
+def get_enforcer(TYPE):
+    """ Returns a function doing lltype.enforce(TYPE, value), with a quick
+    check for the common values """
+    try:
+        return _enforcers[id(TYPE)][1]
+    except KeyError:
+        pass
+    slow = TYPE._enforce
+    if getattr(slow, 'im_func', None) is not lltype.LowLevelType._enforce.im_func:
+        enforcer = slow     # ootype
+    elif TYPE is lltype.Signed:
+        # the variables hold the value of a ComputedIntSymbolic, which
+        # LLFrame.getval() would compute whenever it is read
+        def enforcer(value):
+            if value.__class__ is int:
+                return value
+            value = slow(value)
+            if isinstance(value, ComputedIntSymbolic):
+                value = value.compute_fn()
+            return value
+    elif TYPE in _primitive_classes:
+        cls = _primitive_classes[TYPE]
+        def enforcer(value):
+            if value.__class__ is cls:
+                return value
+            return slow(value)
+    elif isinstance(TYPE, lltype.Ptr):
+        def enforcer(value):
+            if getattr(value, '_TYPE', None) is TYPE:
+                return value
+            return slow(value)
+    else:
+        enforcer = slow
+    _enforcers[id(TYPE)] = TYPE, enforcer   # keeps TYPE and its id alive
+    return enforcer
+
+def operations_signature(block):
+    """ What a CompiledBlock depends on: the input variables and the
+    operations of the block, their arguments and results with their
+    types """
+    result = [(v, getattr(v, 'concretetype', None)) for v in block.inputargs]
+    for op in block.operations:
+        result.append(op.opname)
+        for v in op.args + [op.result]:
+            result.append((v, getattr(v, 'concretetype', None)))
+    return result
+
+class CompiledBlock(object):
+    """ The operations of a block, each turned once into a function
+    run(frame) that evaluates it like LLFrame.perform_operation(): the
+    handler is looked up and the constant arguments are checked when the
+    block is compiled, and the variables are read directly from the
+    bindings of the frame.
+    """
+    def __init__(self, frame_class, block):
+        self.block = block
+        self.signature = operations_signature(block)
+        self.inputargs = []
+        for var in block.inputargs:
+            if var.concretetype is lltype.Void:
+                self.inputargs.append((var, None))
+            else:
+                self.inputargs.append((var, get_enforcer(var.concretetype)))
+        self.operations = list(block.operations)
+        self.runs = [compile_operation(frame_class, op)
+                     for op in self.operations]
+        self.generation = 0
+        self.texts = None
+
+    def fillvars(self, frame, values):
+        """ Like LLFrame.fillvars() """
+        if len(values) != len(self.inputargs):
+            frame.fillvars(self.block, values)    # fails
+        bindings = frame.bindings
+        for (var, enforce), val in zip(self.inputargs, values):
+            if enforce is not None:
+                try:
+                    val = enforce(val)
+                except TypeError:
+                    frame.setvar(var, val)        # fails
+                    continue
+            bindings[var] = val
+
+    def is_valid(self, block):
+        return operations_signature(block) == self.signature
+
+    def get_texts(self, tracer):
+        if self.texts is None:
+            self.texts = [tracer.htmlquote(str(op))
+                          for op in self.operations]
+        return self.texts
+
+def get_operation_function(frame_class, opname):
+    """ Returns (function, with_frame): the handler of the operation, and
+    whether it takes the frame as its first argument """
+    name = 'op_' + opname
+    handler = getattr(frame_class, name, None)
+    if handler is None:
+        # see LLFrame.getoperationhandler()
+        handler = lloperation.LL_OPERATIONS[opname].fold
+        setattr(frame_class, name, staticmethod(handler))
+        return handler, False
+    if isinstance(handler, types.MethodType) and handler.im_self is None:
+        return handler.im_func, True
+    return handler, False
+
+def compile_operation(frame_class, operation):
+    from pypy.translator.oosupport.treebuilder import SubOperation
+    def run_slowly(frame):
+        return frame.perform_operation(operation)
+    handler, with_frame = get_operation_function(frame_class,
+                                                 operation.opname)
+    if operation.opname == 'direct_call':
+        if not isinstance(operation.args[0], Constant):
+            return run_slowly
+    elif operation.opname == 'indirect_call':
+        if not isinstance(operation.args[0], Variable):
+            return run_slowly
+    if getattr(handler, 'specialform', False):
+        return run_slowly
+    kinds = []
+    values = []
+    for arg in operation.args:
+        if isinstance(arg, SubOperation):
+            return run_slowly
+        elif isinstance(arg, Variable):
+            kinds.append('v')
+            values.append(arg)
+        elif isinstance(arg.value, ComputedIntSymbolic):
+            kinds.append('s')
+            values.append(arg.value.compute_fn)
+            values.append(get_enforcer(arg.concretetype))
+        else:
+            value = arg.value
+            if arg.concretetype is not lltype.Void:
+                try:
+                    value = lltype.enforce(arg.concretetype, value)
+                except TypeError:
+                    return run_slowly    # to fail when it runs
+            kinds.append('c')
+            values.append(value)
+    RESULT = operation.result.concretetype
+    need_result_type = getattr(handler, 'need_result_type', False)
+    make_run = get_run_maker(with_frame, need_result_type, tuple(kinds),
+                             RESULT is lltype.Void)
+    return make_run(operation, handler, RESULT, get_enforcer(RESULT),
+                    operation.result, *values)
+
+_run_makers = {}
+
+def get_run_maker(with_frame, need_result_type, kinds, void_result):
+    """ Returns a function that makes the run(frame) of the operations
+    whose arguments are Variables ('v'), Constants ('c') or Constants
+    of ComputedIntSymbolic ('s') in the order of kinds """
+    key = with_frame, need_result_type, kinds, void_result
+    try:
+        return _run_makers[key]
+    except KeyError:
+        pass
+    params = ['operation', 'handler', 'RESULT', 'enforce', 'result']
+    args = []
+    if with_frame:
+        args.append('frame')
+    if need_result_type:
+        args.append('RESULT')
+    for i in range(len(kinds)):
+        if kinds[i] == 'v':
+            params.append('a%d' % i)
+            args.append('bindings[a%d]' % i)
+        elif kinds[i] == 'c':
+            params.append('a%d' % i)
+            args.append('a%d' % i)
+        else:
+            params.append('compute%d' % i)
+            params.append('enforce%d' % i)
+            args.append('enforce%d(compute%d())' % (i, i))
+    lines = ['def make_run(%s):' % ', '.join(params),
+             '    def run(frame):',
+             '        bindings = frame.bindings',
+             '        try:',
+             '            retval = handler(%s)' % ', '.join(args),
+             '        except LLException, e:',
+             '            retval = frame.handle_llexception(operation, e)']
+    if void_result:
+        lines.append('        bindings[result] = retval')
+    else:
+        lines.append('        try:')
+        lines.append('            bindings[result] = enforce(retval)')
+        lines.append('        except TypeError:')
+        lines.append('            frame.setvar(result, retval)')
+    lines.append('        return retval')
+    lines.append('    return run')
+    source = '\n'.join(lines) + '\n'
+    d = {'LLException': LLException}
+    exec compile(source, '<llinterp run %s>' % ''.join(kinds), 'exec') in d
+    make_run = _run_makers[key] = d['make_run']
+    return make_run
+
 class Tracer(object):
     Counter = 0
     file = None
@@ -1042,13 +1334,16 @@ class Tracer(object):
              '''\n<div id="div%d" style="display: %s">\t''')
     LEAVE = '''\n</div>\t'''
 
-    def htmlquote(self, s, text_to_html={}):
+    def htmlquote(self, s, text_to_html={}, quoted=[]):
         # HTML quoting, lazily initialized
         if not text_to_html:
-            import htmlentitydefs
+            import htmlentitydefs, re
             for key, value in htmlentitydefs.entitydefs.items():
-                text_to_html[value] = '&' + key + ';'
-        return ''.join([text_to_html.get(c, c) for c in s])
+                if len(value) == 1:
+                    text_to_html[value] = '&' + key + ';'
+            chars = ''.join([re.escape(c) for c in text_to_html])
+            quoted.append(re.compile('[%s]' % (chars,)))
+        return quoted[0].sub(lambda match: text_to_html[match.group()], s)
 
     def start(self):
         # start of a dump file
@@ -1108,7 +1403,10 @@ class Tracer(object):
 
     def dump(self, text, bold=False):
         if self.file:
-            text = self.htmlquote(text)
+            self.dump_quoted(self.htmlquote(text), bold)
+
+    def dump_quoted(self, text, bold=False):
+        if self.file:
             if bold:
                 text = '<b>%s</b>' % (text,)
             self.file.write(text.replace('\n', '\n'+self.indentation))
@@ -1,10 +1,10 @@
 from pypy.annotation.pairtype import pairtype, extendabletype, pair
 from pypy.annotation import model as annmodel
 from pypy.annotation import description
-from pypy.objspace.flow.model import Constant
+from pypy.objspace.flow.model import Constant, interned_constant
 from pypy.rpython.lltypesystem.lltype import \
      Void, Bool, Float, Signed, Char, UniChar, \
-     typeOf, LowLevelType, Ptr, PyObject, isCompatibleType
+     typeOf, LowLevelType, Ptr, PyObject, isCompatibleType, Primitive
 from pypy.rpython.lltypesystem import lltype, llmemory
 from pypy.rpython.ootypesystem import ootype
 from pypy.rpython.error import TyperError, MissingRTypeOperation 
@@ -416,6 +416,9 @@ def inputconst(reqtype, value):
                              "expected a %r,\n"
                              "     got a %r" % (reqtype, value,
                                                 lltype, realtype))
+    if isinstance(lltype, Primitive):
+        # the Constants of e.g. field names and small integers are shared
+        return interned_constant(value, lltype)
     c = Constant(value)
     c.concretetype = lltype
     return c
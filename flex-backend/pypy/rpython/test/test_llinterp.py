@@ -583,3 +583,33 @@ def test_exceptiontransformed_add_ovf():
     assert res == -63
     res = interp.eval_graph(graph, [1, sys.maxint])
     assert res == -42
+
+def test_precompiled_same_as_classic():
+    def f(n):
+        total = 0
+        i = 0
+        while i < n:
+            if i % 3 == 0:
+                total += (i < n) + (i == 6)
+            else:
+                total += number_ops(i) + 1
+            i += 1
+        return total
+    t, typer, graph = gengraph(f, [int])
+    results = []
+    for precompile in [False, True]:
+        interp = LLInterpreter(typer)
+        interp.precompile = precompile
+        results.append(interp.eval_graph(graph, [25]))
+    assert results[0] == results[1] == f(25)
+
+def test_precompiled_block_changed():
+    def f(x, y):
+        return x + y
+    t, typer, graph = gengraph(f, [int, int])
+    interp = LLInterpreter(typer)
+    assert interp.eval_graph(graph, [5, 3]) == 8
+    for op in graph.startblock.operations:
+        if op.opname == 'int_add':
+            op.opname = 'int_sub'
+    assert interp.eval_graph(graph, [5, 3]) == 2
@@ -56,6 +56,14 @@ def test_slice_reprkeys():
     assert minusone_slice.rtyper_makekey() != startstop.rtyper_makekey()
     
 
+def test_inputconst_shared():
+    c = rmodel.inputconst(Void, 'x')
+    assert rmodel.inputconst(Void, 'x') is c
+    assert c.concretetype is Void
+    assert rmodel.inputconst(Signed, 5) is rmodel.inputconst(Signed, 5)
+    assert rmodel.inputconst(Signed, 5) is not rmodel.inputconst(Void, 5)
+    assert rmodel.inputconst(Float, 0.0) is not rmodel.inputconst(Float, 0.0)
+
 def test_simple():
     def dummyfn(x):
         return x+1
@@ -0,0 +1,23 @@
+""" Splitting a list of items into shards of about the same cost
+"""
+
+def balanced_shards(items, costs, count):
+    """ Split items into at most count non-empty shards, whose total of
+    costs (one per item) are about the same: the items are given, most
+    expensive first, to the shard that costs the least so far.  The items
+    of a shard stay in the order of items.
+    """
+    order = [(-costs[i], i) for i in range(len(items))]
+    order.sort()
+    totals = [0] * count
+    shards = [[] for i in range(count)]
+    for negcost, i in order:
+        smallest = totals.index(min(totals))
+        totals[smallest] -= negcost
+        shards[smallest].append(i)
+    result = []
+    for indices in shards:
+        if indices:
+            indices.sort()
+            result.append([items[i] for i in indices])
+    return result
@@ -0,0 +1,21 @@
+import autopath
+from pypy.tool.algo.shards import balanced_shards
+
+
+def test_balanced_shards():
+    items = ['a', 'b', 'c', 'd', 'e']
+    costs = [5, 1, 4, 2, 3]
+    shards = balanced_shards(items, costs, 2)
+    assert shards == [['a', 'b', 'd'], ['c', 'e']]
+
+def test_keeps_order():
+    items = range(20)
+    shards = balanced_shards(items, [i % 7 for i in items], 3)
+    assert len(shards) == 3
+    for shard in shards:
+        assert shard == sorted(shard)
+    assert sorted(sum(shards, [])) == items
+
+def test_no_empty_shards():
+    assert balanced_shards(['x', 'y'], [1, 1], 5) == [['x'], ['y']]
+    assert balanced_shards([], [], 3) == []
@@ -0,0 +1,92 @@
+"""
+Suggest a size for the method cache (objspace.std.methodcachesizeexp)
+from a workload.
+
+Usage: pypy-c methodcachesize.py [-t tolerance] script.py [args...]
+
+The pypy-c must be translated with --objspace-std-withmethodcachecounter.
+The script is run as __main__ with the given arguments; then the hit
+rates that method caches of various sizes would have had are printed,
+with the most frequently missed names, and the suggested size: the
+smallest one whose hit rate is within the tolerance (default 0.5%) of
+the best one.
+"""
+
+import sys
+
+def hit_rate(hits, misses):
+    if hits + misses == 0:
+        return 1.0
+    return float(hits) / (hits + misses)
+
+def suggest_sizeexp(simulated, tolerance=0.005):
+    """ The smallest sizeexp of {sizeexp: (hits, misses)} whose hit rate
+    is within tolerance of the best one """
+    rates = [(sizeexp, hit_rate(hits, misses))
+             for sizeexp, (hits, misses) in simulated.items()]
+    rates.sort()
+    best = max([rate for sizeexp, rate in rates])
+    for sizeexp, rate in rates:
+        if rate >= best - tolerance:
+            return sizeexp
+
+def report(stats, tolerance=0.005, top=10):
+    """ The lines describing the statistics of __pypy__.method_cache_stats() """
+    lines = []
+    lines.append('method cache: 2**%d = %d entries, %d used (%.1f%%)' % (
+        stats['sizeexp'], stats['size'], stats['used'],
+        100.0 * stats['used'] / stats['size']))
+    lookups = stats['hits'] + stats['misses']
+    lines.append('%d lookups, hit rate %.2f%%, %d collisions (%.2f%%)' % (
+        lookups, 100.0 * hit_rate(stats['hits'], stats['misses']),
+        stats['collisions'], 100.0 * stats['collisions'] / max(lookups, 1)))
+    lines.append('')
+    lines.append('%-30s %10s %10s %10s' % ('name', 'hits', 'misses',
+                                           'collisions'))
+    names = [(misses, name, hits, collisions)
+             for name, (hits, misses, collisions) in stats['names'].items()]
+    names.sort()
+    names.reverse()
+    for misses, name, hits, collisions in names[:top]:
+        lines.append('%-30s %10d %10d %10d' % (name, hits, misses,
+                                               collisions))
+    lines.append('')
+    lines.append('%8s %8s %9s' % ('sizeexp', 'entries', 'hit rate'))
+    simulated = stats['simulated'].items()
+    simulated.sort()
+    for sizeexp, (hits, misses) in simulated:
+        lines.append('%8d %8d %8.2f%%' % (sizeexp, 1 << sizeexp,
+                                          100.0 * hit_rate(hits, misses)))
+    lines.append('')
+    lines.append('suggested: --objspace-std-methodcachesizeexp=%d' % (
+        suggest_sizeexp(stats['simulated'], tolerance),))
+    return lines
+
+def main(argv):
+    tolerance = 0.005
+    if argv[:1] == ['-t']:
+        tolerance = float(argv[1])
+        argv = argv[2:]
+    if not argv:
+        print __doc__
+        sys.exit(2)
+    try:
+        import __pypy__
+        __pypy__.method_cache_stats
+    except (ImportError, AttributeError):
+        print >> sys.stderr, ('this needs a pypy-c translated with '
+                              '--objspace-std-withmethodcachecounter')
+        sys.exit(1)
+    sys.argv = argv
+    __pypy__.reset_method_cache_counter()
+    try:
+        execfile(argv[0], {'__name__': '__main__'})
+    except SystemExit:
+        pass
+    stats = __pypy__.method_cache_stats()
+    print
+    for line in report(stats, tolerance):
+        print line
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
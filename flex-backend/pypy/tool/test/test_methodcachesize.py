@@ -0,0 +1,21 @@
+from pypy.tool.methodcachesize import suggest_sizeexp, report
+
+def test_suggest_sizeexp():
+    simulated = {4: (50, 50), 5: (90, 10), 6: (998, 2), 7: (999, 1),
+                 8: (999, 1)}
+    assert suggest_sizeexp(simulated) == 6
+    assert suggest_sizeexp(simulated, tolerance=0.0) == 7
+    assert suggest_sizeexp(simulated, tolerance=0.5) == 4
+    assert suggest_sizeexp({4: (0, 0), 5: (0, 0)}) == 4
+
+def test_report():
+    stats = {'sizeexp': 4, 'size': 16, 'used': 4,
+             'hits': 30, 'misses': 10, 'collisions': 2,
+             'names': {'f': (20, 2, 0), 'g': (10, 8, 2)},
+             'simulated': {4: (30, 10), 5: (38, 2)}}
+    lines = report(stats)
+    assert lines[0] == 'method cache: 2**4 = 16 entries, 4 used (25.0%)'
+    assert lines[1] == '40 lookups, hit rate 75.00%, 2 collisions (5.00%)'
+    assert lines[4].split() == ['g', '10', '8', '2']
+    assert lines[5].split() == ['f', '20', '2', '0']
+    assert lines[-1] == 'suggested: --objspace-std-methodcachesizeexp=5'
@@ -5,12 +5,14 @@ from pypy.translator.backendopt.malloc import remove_mallocs
 from pypy.translator.backendopt.constfold import constant_fold_graph
 from pypy.translator.backendopt.stat import print_statistics
 from pypy.translator.backendopt.merge_if_blocks import merge_if_blocks
+from pypy.translator.backendopt.merge_if_blocks import instrument_chain_cases
 from pypy.translator import simplify
 from pypy.translator.backendopt.escape import malloc_to_stack
 from pypy.translator.backendopt import mallocprediction
 from pypy.translator.backendopt.removeassert import remove_asserts
 from pypy.translator.backendopt.support import log
 from pypy.translator.backendopt.checkvirtual import check_virtual_methods
+from pypy.translator.backendopt import parallel
 from pypy.objspace.flow.model import checkgraph
 
 INLINE_THRESHOLD_FOR_TEST = 33
@@ -54,11 +56,7 @@ def backend_optimizations(translator, graphs=None, secondary=False, **kwds):
         check_virtual_methods()
 
     # remove obvious no-ops
-    for graph in graphs:
-        removenoops.remove_same_as(graph)
-        simplify.eliminate_empty_blocks(graph)
-        simplify.transform_dead_op_vars(graph, translator)
-        removenoops.remove_duplicate_casts(graph, translator)
+    for_each_graph(config, translator, graphs, remove_noops)
 
     if config.print_statistics:
         print "after no-op removal:"
@@ -73,7 +71,7 @@ def backend_optimizations(translator, graphs=None, secondary=False, **kwds):
         inline_malloc_removal_phase(config, translator, graphs,
                                     threshold,
                                     inline_heuristic=heuristic)
-        constfold(config, graphs)
+        constfold(config, translator, graphs)
 
     if config.clever_malloc_removal:
         threshold = config.clever_malloc_removal_threshold
@@ -86,28 +84,45 @@ def backend_optimizations(translator, graphs=None, secondary=False, **kwds):
             threshold = threshold,
             heuristic=heuristic)
         log.inlineandremove("removed %d simple mallocs in total" % count)
-        constfold(config, graphs)
+        constfold(config, translator, graphs)
         if config.print_statistics:
             print "after clever inlining and malloc removal"
             print_statistics(translator.graphs[0], translator)        
 
 
+    case_count = None
     if config.profile_based_inline and not secondary:
         threshold = config.profile_based_inline_threshold
+        hot_threshold = max(threshold, config.profile_based_inline_hot_threshold)
         heuristic = get_function(config.profile_based_inline_heuristic)
-        inline.instrument_inline_candidates(graphs, threshold)
+        label = inline.instrument_inline_candidates(graphs, hot_threshold)
+        if config.merge_if_blocks:
+            instrument_chain_cases(graphs, label)
         counters = translator.driver_instrument_result(
             config.profile_based_inline)
         n = len(counters)
-        def call_count_pred(label):
+        def call_count(label):
             if label >= n:
-                return False
-            return counters[label] > 250 # xxx introduce an option for this
+                return 0
+            return counters[label]
+        def hot_call(label):
+            return call_count(label) >= config.profile_based_inline_hot_count
+        def warm_call(label):
+            return call_count(label) >= config.profile_based_inline_min_count
+        # first the hot call sites, with the higher threshold, then the
+        # others that were called often enough; the cold ones are left alone
+        log.inlining("hot call sites")
+        inline_malloc_removal_phase(config, translator, graphs,
+                                    hot_threshold,
+                                    inline_heuristic=heuristic,
+                                    call_count_pred=hot_call)
+        log.inlining("warm call sites")
         inline_malloc_removal_phase(config, translator, graphs,
                                     threshold,
                                     inline_heuristic=heuristic,
-                                    call_count_pred=call_count_pred)
-    constfold(config, graphs)
+                                    call_count_pred=warm_call)
+        case_count = call_count
+    constfold(config, translator, graphs)
 
     if config.remove_asserts:
         remove_asserts(translator, graphs)
@@ -118,20 +133,43 @@ def backend_optimizations(translator, graphs=None, secondary=False, **kwds):
 
     if config.merge_if_blocks:
         log.mergeifblocks("starting to merge if blocks")
-        for graph in graphs:
-            merge_if_blocks(graph, translator.config.translation.verbose)
+        def merge_if_blocks_and_check(translator, graph):
+            merge_if_blocks(graph, translator.config.translation.verbose,
+                            case_count)
+            checkgraph(graph)
+        for_each_graph(config, translator, graphs, merge_if_blocks_and_check)
+    else:
+        for_each_graph(config, translator, graphs, check_graph)
 
     if config.print_statistics:
         print "after if-to-switch:"
         print_statistics(translator.graphs[0], translator)
 
-    for graph in graphs:
-        checkgraph(graph)
+def for_each_graph(config, translator, graphs, func):
+    """ Call func(translator, graph) for each graph, in several processes
+    with config.processes > 1: func must then only change the graph it
+    is given (see parallel.py) """
+    if config.processes > 1 and len(graphs) > 1:
+        parallel.for_each_graph(translator, graphs, func, config.processes)
+    else:
+        for graph in graphs:
+            func(translator, graph)
+
+def remove_noops(translator, graph):
+    removenoops.remove_same_as(graph)
+    simplify.eliminate_empty_blocks(graph)
+    simplify.transform_dead_op_vars(graph, translator)
+    removenoops.remove_duplicate_casts(graph, translator)
+
+def constant_fold(translator, graph):
+    constant_fold_graph(graph)
 
-def constfold(config, graphs):
+def check_graph(translator, graph):
+    checkgraph(graph)
+
+def constfold(config, translator, graphs):
     if config.constfold:
-        for graph in graphs:
-            constant_fold_graph(graph)    
+        for_each_graph(config, translator, graphs, constant_fold)
 
 def inline_malloc_removal_phase(config, translator, graphs, inline_threshold,
                                 inline_heuristic,
@@ -195,11 +195,10 @@ class BaseInliner(object):
             else:
                 non_recursive[subgraph] = True
             if call_count_pred:
-                countop = block.operations[index_operation-1]
-                assert countop.opname == 'instrument_count'
-                assert countop.args[0].value == 'inline'
-                label = countop.args[1].value
-                if not call_count_pred(label):
+                # call sites that were not instrumented were never seen
+                # as candidates: leave them alone
+                label = call_site_label(block, index_operation)
+                if label is None or not call_count_pred(label):
                     continue
             operation = block.operations[index_operation]
             self.inline_once(block, index_operation)
@@ -632,7 +631,20 @@ def inlinable_static_callers(graphs):
                         result.append((parentgraph, graph))
     return result
     
-def instrument_inline_candidates(graphs, threshold):
+def call_site_label(block, index_operation):
+    """ The label of the instrument_count operation in front of the call
+    block.operations[index_operation], or None """
+    if index_operation == 0:
+        return None
+    countop = block.operations[index_operation-1]
+    if (countop.opname != 'instrument_count' or
+        countop.args[0].value != 'inline'):
+        return None
+    return countop.args[1].value
+
+def instrument_inline_candidates(graphs, threshold, label=0):
+    """ Count the calls to the graphs below threshold, with the labels
+    from label on; returns the next free label """
     cache = {None: False}
     def candidate(graph):
         try:
@@ -641,7 +653,7 @@ def instrument_inline_candidates(graphs, threshold):
             res = static_instruction_count(graph) <= threshold
             cache[graph] = res
             return res
-    n = 0
+    n = label
     for parentgraph in graphs:
         for block in parentgraph.iterblocks():
             ops = block.operations
@@ -668,7 +680,8 @@ def instrument_inline_candidates(graphs, threshold):
                                                [tag, label], dummy)
                         ops.insert(i+1, count)
                         n += 1
-    log.inlining("%d call sites instrumented" % n)
+    log.inlining("%d call sites instrumented" % (n - label))
+    return n
 
 def auto_inlining(translator, threshold=None,
                   callgraph=None,
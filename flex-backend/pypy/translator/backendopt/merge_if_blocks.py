@@ -1,6 +1,9 @@
 from pypy.objspace.flow.model import Block, Constant, Variable, flatten
 from pypy.objspace.flow.model import checkgraph, mkentrymap
+from pypy.objspace.flow.model import Link, SpaceOperation
+from pypy.rpython.lltypesystem.lltype import Signed, Void
 from pypy.translator.backendopt.support import log
+from pypy.translator import simplify
 
 log = log.mergeifblocks
 
@@ -20,7 +23,58 @@ def is_chain_block(block, first=False):
         return False
     return True
 
-def merge_chain(chain, checkvar, varmap, graph):
+def instrument_chain_cases(graphs, label=0):
+    """Count how often each case of the possible chains is taken, with
+    an instrument_count operation in a block of its own on the link of
+    the case.  The labels start at label; returns the next free label.
+    """
+    n = label
+    for graph in graphs:
+        for block in list(graph.iterblocks()):
+            if not is_chain_block(block, first=True):
+                continue
+            link = block.exits[1]
+            inputargs = []
+            for arg in link.args:
+                var = Variable()
+                var.concretetype = arg.concretetype
+                inputargs.append(var)
+            countblock = Block(inputargs)
+            dummy = Variable()
+            dummy.concretetype = Void
+            countblock.operations.append(
+                SpaceOperation('instrument_count',
+                               [Constant('mergeif', Void),
+                                Constant(n, Signed)], dummy))
+            countblock.closeblock(Link(list(inputargs), link.target))
+            link.target = countblock
+            n += 1
+    log("%d cases instrumented" % (n - label))
+    return n
+
+def case_label(link):
+    """The label counting the link of a case, or None"""
+    ops = link.target.operations
+    if (ops and ops[0].opname == 'instrument_count' and
+        ops[0].args[0].value == 'mergeif'):
+        return ops[0].args[1].value
+    return None
+
+def remove_case_counters(graph):
+    """Remove the operations of instrument_chain_cases() and the blocks
+    that they leave empty"""
+    changed = False
+    for block in graph.iterblocks():
+        ops = [op for op in block.operations
+                  if not (op.opname == 'instrument_count' and
+                          op.args[0].value == 'mergeif')]
+        if len(ops) != len(block.operations):
+            block.operations = ops
+            changed = True
+    if changed:
+        simplify.eliminate_empty_blocks(graph)
+
+def merge_chain(chain, checkvar, varmap, graph, case_count=None):
     def get_new_arg(var_or_const):
         if isinstance(var_or_const, Constant):
             return var_or_const
@@ -45,13 +99,26 @@ def merge_chain(chain, checkvar, varmap, graph):
         link.exitcase = case.value
         link.llexitcase = case.value
         link.args = [get_new_arg(arg) for arg in link.args]
+    if case_count is not None:
+        # the cases taken most often first; the sort is stable
+        order = []
+        for i in range(len(links)):
+            label = case_label(links[i])
+            count = 0
+            if label is not None:
+                count = case_count(label)
+            order.append((-count, i, links[i]))
+        order.sort()
+        links = [link for _, _, link in order]
     links.append(default)
     firstblock.recloseblock(*links)
 
-def merge_if_blocks_once(graph):
+def merge_if_blocks_once(graph, case_count=None):
     """Convert consecutive blocks that all compare a variable (of Primitive type)
     with a constant into one block with multiple exits. The backends can in
-    turn output this block as a switch statement.
+    turn output this block as a switch statement.  With case_count, a
+    function giving the count of a label of instrument_chain_cases(), the
+    exits are sorted by how often they were taken.
     """
     candidates = [block for block in graph.iterblocks()
                       if is_chain_block(block, first=True)]
@@ -101,14 +168,15 @@ def merge_if_blocks_once(graph):
             break
     else:
         return False
-    merge_chain(chain, checkvars[0], varmap, graph)
+    merge_chain(chain, checkvars[0], varmap, graph, case_count)
     checkgraph(graph)
     return True
 
-def merge_if_blocks(graph, verbose=True):
+def merge_if_blocks(graph, verbose=True, case_count=None):
     merge = False
-    while merge_if_blocks_once(graph):
+    while merge_if_blocks_once(graph, case_count):
         merge = True
+    remove_case_counters(graph)
     if merge:
         if verbose:
             log("merging blocks in %s" % (graph.name, ))
@@ -0,0 +1,226 @@
+""" Running per-graph backend optimizations in several processes
+
+for_each_graph() splits the graphs into shards and forks a child process
+per shard, which runs the pass over the graphs of its shard.  The
+children send their graphs back, pickled with the CheckpointPickler:
+everything that the graphs referred to before the fork -- low-level
+types, other graphs, the blocks and Variables that are still there -- is
+sent as a reference to the object of the parent, which has it at the
+very same address, and only the new objects and the new content of the
+blocks and links are sent by value.  The objects that can be sent this
+way are found by walking from the graphs of the translator once per
+translation, and then only through what the passes change (see
+shared_objects()); an object that is not reachable from there nor from
+the modules is copied.  The parent puts the graphs back together in the
+order of the shards, so that the result only depends on the number of
+processes.
+
+The changes that a pass makes to anything else than the graphs it is
+given are lost, so only passes that look at one graph at a time can run
+this way.
+"""
+
+import os, sys, gc, time, tempfile, traceback
+from pypy.objspace.flow.model import FunctionGraph, Block, Link
+from pypy.objspace.flow.model import SpaceOperation, Variable, Constant
+from pypy.translator.tool.checkpoint import GlobalNames, CheckpointPickler
+from pypy.translator.tool.checkpoint import ATOMIC_TYPES
+from pypy.translator.tool.checkpoint import CheckpointUnpickler
+from pypy.translator.tool.checkpoint import _raised_recursion_limit
+from pypy.translator.backendopt.support import log
+from pypy.tool.algo.shards import balanced_shards
+
+class ParallelError(Exception):
+    pass
+
+def graph_size(graph):
+    size = 0
+    for block in graph.iterblocks():
+        size += len(block.operations) + 1
+    return size
+
+def split_graphs(graphs, count):
+    """ Split graphs into at most count shards of about the same number
+    of operations.  The graphs of a shard stay in the order of graphs.
+    """
+    return balanced_shards(graphs, [graph_size(graph) for graph in graphs],
+                           count)
+
+def _flow_objects(graphs):
+    objects = []
+    for graph in graphs:
+        objects.append(graph)
+        objects.extend(graph.iterblocks())
+        objects.extend(graph.iterlinks())
+    return objects
+
+# the flow objects, which the passes change, and the containers that
+# hold them (the exits of a Block are a tuple): walked again by every pass
+CHANGING_TYPES = (FunctionGraph, Block, Link, SpaceOperation, Variable,
+                  Constant, list, dict, tuple)
+
+def shared_objects(translator, graphs, globalnames):
+    """ The objects that the graphs of the translator and graphs refer to,
+    directly or not, as a dictionary id -> object.  The walk stops at the
+    objects known to globalnames, which are sent by name anyway.
+
+    The objects found are remembered on the translator, apart from the
+    flow objects and the containers (see CHANGING_TYPES): the next passes
+    only walk again through those and through the new objects, instead
+    of through the whole heap.  The graphs are reached again this way,
+    the other objects that changed since are not.
+    """
+    known = translator.__dict__.setdefault('_backendopt_shared', {})
+    shared = known.copy()
+    seen = {}
+    pending = translator.graphs + list(graphs)
+    while pending:
+        obj = pending.pop()
+        if type(obj) in ATOMIC_TYPES or id(obj) in seen:
+            continue
+        seen[id(obj)] = obj
+        if known.get(id(obj)) is obj:
+            continue    # with all it refers to, by a previous pass
+        if globalnames.lookup(obj) is not None:
+            continue
+        shared[id(obj)] = obj
+        if not isinstance(obj, CHANGING_TYPES):
+            known[id(obj)] = obj
+        pending.extend(gc.get_referents(obj))
+    return shared
+
+class ForkPickler(CheckpointPickler):
+    """ Pickler for the graphs of a forked child: objects of the parent
+    are sent as ('p', address), the types and functions that are not
+    known to the gc as globals """
+
+    def __init__(self, file, shared, globalnames):
+        CheckpointPickler.__init__(self, file, globalnames, {})
+        self.shared = shared
+        self.byvalue = {}
+
+    def persistent_id(self, obj):
+        if id(obj) in self.byvalue or type(obj) is SpaceOperation:
+            return None   # changed in place by the passes, see dump_graphs
+        if self.shared.get(id(obj), self) is obj:
+            return ('p', id(obj))
+        return self.globalnames.lookup(obj)
+
+    def dump_graphs(self, graphs):
+        objects = _flow_objects(graphs)
+        # the lists and dicts holding the content of the blocks, links and
+        # graphs are sent by value even if they are the ones of the parent
+        for obj in objects:
+            state = self.reduce_object(obj)[2]
+            if isinstance(state, tuple):
+                containers = [state[0]] + state[1].values()
+            else:
+                containers = [state]
+            for container in containers:
+                if isinstance(container, (list, dict)):
+                    self.byvalue[id(container)] = container
+        new = [obj for obj in objects
+               if self.shared.get(id(obj), self) is not obj]
+        self.dump_shallow(new)
+        self.dump_contents(objects)
+        self.dump_delayed()
+
+class ForkUnpickler(CheckpointUnpickler):
+    def __init__(self, file, shared):
+        CheckpointUnpickler.__init__(self, file, {})
+        self.shared = shared
+
+    def persistent_load(self, pid):
+        if pid[0] == 'p':
+            return self.shared[pid[1]]
+        return CheckpointUnpickler.persistent_load(self, pid)
+
+    def load_graphs(self):
+        self.load()    # the new flow objects, empty...
+        self.load()    # ...and all of them filled
+        delayed = []
+        while 1:
+            batch = self.load()
+            if batch is None:
+                break
+            delayed.extend(batch)
+        keepalive = self.load()
+        for container, items in delayed:
+            container.update(items)
+        return keepalive
+
+def _run_child(translator, graphs, func, shared, globalnames, filename):
+    status = 1
+    try:
+        f = open(filename, 'wb')
+        try:
+            try:
+                for graph in graphs:
+                    func(translator, graph)
+                f.write('G')
+                pickler = ForkPickler(f, shared, globalnames)
+                _raised_recursion_limit(pickler.dump_graphs, graphs)
+                status = 0
+            except:
+                f.seek(0)
+                f.truncate()
+                f.write('E' + ''.join(traceback.format_exception(
+                    *sys.exc_info())))
+        finally:
+            f.close()
+    finally:
+        os._exit(status)
+
+def for_each_graph(translator, graphs, func, processes):
+    """ Call func(translator, graph) for every graph, in up to processes
+    child processes """
+    start = time.time()
+    shards = split_graphs(graphs, processes)
+    globalnames = GlobalNames()
+    # the objects of the parent, kept alive so that their addresses are
+    # not reused by the new objects of the children
+    shared = shared_objects(translator, graphs, globalnames)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    children = []
+    try:
+        for shard in shards:
+            fd, filename = tempfile.mkstemp(prefix='backendopt-')
+            os.close(fd)
+            pid = os.fork()
+            if pid == 0:
+                _run_child(translator, shard, func, shared, globalnames,
+                           filename)
+            children.append((pid, filename))
+        failed = []
+        for pid, filename in children:
+            pid, status = os.waitpid(pid, 0)
+            if status != 0:
+                failed.append(filename)
+        if failed:
+            f = open(failed[0], 'rb')
+            try:
+                message = f.read()[1:]
+            finally:
+                f.close()
+            raise ParallelError("%d of %d processes failed, the first one "
+                                "with:\n%s" % (len(failed), len(children),
+                                               message))
+        keepalive = []
+        for pid, filename in children:
+            f = open(filename, 'rb')
+            try:
+                assert f.read(1) == 'G'
+                unpickler = ForkUnpickler(f, shared)
+                keepalive.append(_raised_recursion_limit(
+                    unpickler.load_graphs))
+            finally:
+                f.close()
+    finally:
+        for pid, filename in children:
+            os.unlink(filename)
+    # objects only held by weakrefs
+    translator.__dict__.setdefault('_backendopt_keepalive', []).extend(
+        keepalive)
+    log.parallel("%s over %d graphs in %d processes: %.1f seconds" % (
+        func.__name__, len(graphs), len(shards), time.time() - start))
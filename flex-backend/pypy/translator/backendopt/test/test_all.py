@@ -1,4 +1,4 @@
-import py
+import py, os
 from pypy.translator.backendopt.all import backend_optimizations
 from pypy.translator.backendopt.all import INLINE_THRESHOLD_FOR_TEST
 from pypy.translator.backendopt.support import md5digest
@@ -200,6 +200,35 @@ class BaseTester(object):
             assert Constant(7) not in link.args
             assert Constant(11) not in link.args
 
+    def test_processes(self):
+        if not hasattr(os, 'fork'):
+            py.test.skip("needs os.fork()")
+        def g(x, y):
+            if x < 0:
+                return 0
+            elif x == 1:
+                return y
+            elif x == 2:
+                return -y
+            return x + y
+        def f(x):
+            return g(x, 7) + g(x, 11) + A(x, 5).mean()
+        def operations(t):
+            # per graph: the number and the order of the empty blocks left
+            # over by the passes vary from run to run
+            result = []
+            for graph in t.graphs:
+                result.append([op.opname for block in graph.iterblocks()
+                                         for op in block.operations])
+                result[-1].sort()
+            return result
+        t1 = self.translateopt(f, [int], merge_if_blocks=True)
+        t2 = self.translateopt(f, [int], merge_if_blocks=True, processes=3)
+        assert operations(t2) == operations(t1)
+        interp = LLInterpreter(t2.rtyper)
+        for x in [-5, 1, 2, 10]:
+            assert interp.eval_graph(graphof(t2, f), [x]) == f(x)
+
 class TestLLType(BaseTester):
     type_system = 'lltype'
     check_malloc_removed = LLTypeMallocRemovalTest.check_malloc_removed
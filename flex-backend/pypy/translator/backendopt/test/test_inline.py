@@ -419,6 +419,33 @@ class BaseTestInline:
         result = eval_func([15])
         assert result == -1
 
+    def test_inline_counted_call_sites(self):
+        def g(x):
+            return x * 2 + 1
+        def f(x):
+            if x > 0:
+                return g(x)
+            return g(-x) - 1
+        t = self.translate(f, [int])
+        threshold = INLINE_THRESHOLD_FOR_TEST
+        assert instrument_inline_candidates(t.graphs, threshold) == 2
+        interp = LLInterpreter(t.rtyper)
+        interp.instrument_counters = counters = {}
+        for x in range(1, 6):
+            interp.eval_graph(graphof(t, f), [x])
+        assert counters.values() == [5]
+        # only the call site that was run is inlined
+        auto_inlining(t, threshold,
+                      call_count_pred=lambda lbl: counters.get(lbl, 0) > 0)
+        sanity_check(t)
+        f_graph = graphof(t, f)
+        calls = [op for block in f_graph.iterblocks()
+                    for op in block.operations if op.opname == 'direct_call'
+                                               or op.opname == 'oosend']
+        assert len(calls) == 1
+        assert interp.eval_graph(f_graph, [3]) == 7
+        assert interp.eval_graph(f_graph, [-3]) == 6
+
     def test_inline_exception_catching(self):
         def f3():
             raise CustomError1
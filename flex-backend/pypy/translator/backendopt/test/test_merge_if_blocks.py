@@ -1,5 +1,6 @@
 from pypy.translator.backendopt.merge_if_blocks import merge_if_blocks_once
 from pypy.translator.backendopt.merge_if_blocks import merge_if_blocks
+from pypy.translator.backendopt.merge_if_blocks import instrument_chain_cases
 from pypy.translator.backendopt.all import backend_optimizations
 from pypy.translator.translator import TranslationContext, graphof as tgraphof
 from pypy.objspace.flow.model import flatten, Block
@@ -26,6 +27,37 @@ def do_test_merge(fn, testvalues):
         actual = interp.eval_graph(graph, [i])
         assert actual == expected
 
+def test_merge_ordered_by_counts():
+    def merge_int(n):
+        n += 1
+        if n == 1:
+            return 1
+        elif n == 2:
+            return 2
+        elif n == 3:
+            return 3
+        return 4
+    t = TranslationContext()
+    a = t.buildannotator()
+    a.build_types(merge_int, [int])
+    rtyper = t.buildrtyper()
+    rtyper.specialize()
+    graph = tgraphof(t, merge_int)
+    remove_same_as(graph)
+    assert instrument_chain_cases([graph]) == 3
+    interp = LLInterpreter(rtyper)
+    interp.instrument_counters = counters = {}
+    for i in [0, 2, 2, 2, 1, 1, 5]:
+        interp.eval_graph(graph, [i])
+    merge_if_blocks(graph, case_count=lambda label: counters.get(label, 0))
+    cases = [link.exitcase for link in graph.startblock.exits]
+    assert cases == [3, 2, 1, 'default']
+    for block in graph.iterblocks():
+        for op in block.operations:
+            assert op.opname != 'instrument_count'
+    for i in range(-1, 5):
+        assert interp.eval_graph(graph, [i]) == merge_int(i)
+
 def test_merge1():
     def merge_int(n):
         n += 1
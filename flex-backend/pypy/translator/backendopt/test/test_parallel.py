@@ -0,0 +1,103 @@
+import py, os, gc
+from pypy.translator.translator import TranslationContext, graphof
+from pypy.translator.backendopt import parallel
+from pypy.translator.backendopt.all import backend_optimizations
+from pypy.translator.tool.checkpoint import GlobalNames
+from pypy.rpython.llinterp import LLInterpreter
+from pypy.rpython.lltypesystem import lltype
+from pypy.objspace.flow.model import Variable, Constant, SpaceOperation
+
+class A:
+    pass
+
+def g(x):
+    a = A()
+    a.x = x
+    if x == 1:
+        return a.x + 1
+    elif x == 2:
+        return a.x * 2
+    return a.x
+
+def f(x):
+    return g(x) + g(x + 1)
+
+def rtype(func, argtypes):
+    t = TranslationContext()
+    t.buildannotator().build_types(func, argtypes)
+    t.buildrtyper().specialize()
+    return t
+
+def test_shared_objects():
+    t = rtype(f, [int])
+    graph = graphof(t, g)
+    shared = parallel.shared_objects(t, [], GlobalNames())
+    assert shared[id(graph)] is graph
+    for block in graph.iterblocks():
+        assert shared[id(block)] is block
+        for op in block.operations:
+            assert shared[id(op)] is op
+            for v in op.args:
+                assert shared[id(v)] is v
+    for link in graph.iterlinks():
+        assert shared[id(link)] is link
+
+def test_shared_objects_walked_once():
+    t = rtype(f, [int])
+    walked = []
+    def get_referents(obj):
+        walked.append(obj)
+        return old(obj)
+    old = parallel.gc.get_referents
+    parallel.gc.get_referents = get_referents
+    try:
+        shared1 = parallel.shared_objects(t, [], GlobalNames())
+        first = len(walked)
+        del walked[:]
+        # a pass adds an operation
+        graph = graphof(t, g)
+        v = Variable()
+        v.concretetype = lltype.Signed
+        op = SpaceOperation('same_as', [Constant(42, lltype.Signed)], v)
+        graph.startblock.operations.insert(0, op)
+        shared2 = parallel.shared_objects(t, [], GlobalNames())
+    finally:
+        parallel.gc.get_referents = old
+    # only the flow objects and the new objects are walked again
+    assert len(walked) < first
+    for obj in walked:
+        assert (isinstance(obj, parallel.CHANGING_TYPES) or
+                shared1.get(id(obj)) is not obj)
+    assert shared2[id(op)] is op
+    assert shared2[id(op.args[0])] is op.args[0]
+    for key, obj in shared1.items():
+        if not isinstance(obj, parallel.CHANGING_TYPES):
+            assert shared2[key] is obj
+
+def test_no_heap_snapshot():
+    if not hasattr(os, 'fork'):
+        py.test.skip("needs os.fork()")
+    t1 = rtype(f, [int])
+    backend_optimizations(t1, merge_if_blocks=True)
+    t2 = rtype(f, [int])
+    def get_objects():
+        raise AssertionError("the whole heap should not be needed")
+    old = parallel.gc.get_objects
+    parallel.gc.get_objects = get_objects
+    try:
+        backend_optimizations(t2, merge_if_blocks=True, processes=2)
+    finally:
+        parallel.gc.get_objects = old
+    def operations(t):
+        # per graph: the number and the order of the empty blocks left
+        # over by the passes vary from run to run
+        result = []
+        for graph in t.graphs:
+            result.append([op.opname for block in graph.iterblocks()
+                                     for op in block.operations])
+            result[-1].sort()
+        return result
+    assert operations(t2) == operations(t1)
+    interp = LLInterpreter(t2.rtyper)
+    for x in [0, 1, 2, 5]:
+        assert interp.eval_graph(graphof(t2, f), [x]) == f(x)
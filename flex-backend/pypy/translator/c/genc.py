@@ -1,17 +1,19 @@
 import autopath
 import py
-import sys
+import os, sys, marshal, tempfile
 from pypy.translator.c.node import PyObjectNode, PyObjHeadNode, FuncNode
 from pypy.translator.c.database import LowLevelDatabase
 from pypy.translator.c.extfunc import pre_include_code_lines
 from pypy.translator.gensupp import uniquemodulename, NameManager
 from pypy.translator.tool.cbuild import compile_c_module
 from pypy.translator.tool.cbuild import build_executable, CCompiler, ProfOpt
+from pypy.translator.tool.objectcache import ObjectCache
 from pypy.translator.tool.cbuild import import_module_from_directory
 from pypy.translator.tool.cbuild import check_under_under_thread
 from pypy.rpython.lltypesystem import lltype
 from pypy.tool.udir import udir
 from pypy.tool import isolate
+from pypy.tool.algo.shards import balanced_shards
 from pypy.translator.locality.calltree import CallTree
 from pypy.translator.c.support import log, c_string_constant
 from pypy.rpython.typesystem import getfunctionptr
@@ -22,6 +24,7 @@ class CBuilder(object):
     _compiled = False
     symboltable = None
     modulename = None
+    precompiled = None
     
     def __init__(self, translator, entrypoint, config, libraries=None,
                  gcpolicy=None):
@@ -143,7 +146,7 @@ class CBuilder(object):
             if CBuilder.have___thread:
                 if not self.config.translation.no__thread:
                     defines['USE___THREAD'] = 1
-            cfile, extra, extraincludes = \
+            cfile, extra, extraincludes, self.precompiled = \
                    gen_source_standalone(db, modulename, targetdir,
                                          entrypointname = pfname,
                                          defines = defines)
@@ -234,12 +237,17 @@ class CStandaloneBuilder(CBuilder):
             profopt = self.config.translation.profopt
             if profopt is not None and not self.config.translation.noprofopt:
                 profbased = (ProfOpt, profopt)
+        object_cache = None
+        if self.config.translation.object_cache is not None:
+            object_cache = ObjectCache(self.config.translation.object_cache,
+                    self.config.translation.object_cache_size * 1024 * 1024)
 
         return CCompiler(
             [self.c_source_filename] + self.extrafiles,
             include_dirs = [autopath.this_dir, python_inc] + extra_includes,
             libraries    = self.libraries,
-            compiler_exe = cc, profbased = profbased)
+            compiler_exe = cc, profbased = profbased,
+            object_cache = object_cache)
 
     def compile(self):
         assert self.c_source_filename
@@ -319,8 +327,22 @@ class CStandaloneBuilder(CBuilder):
             print >> f, 'TFLAGS  = ' + ''
         print >> f, 'PROFOPT = ' + profopt
         print >> f, 'CC      = ' + cc
+        if self.precompiled is not None:
+            header, sources = self.precompiled
+            print >> f, 'PCH     = %s.gch' % header
         print >> f
         print >> f, MAKEFILE.strip()
+        if self.precompiled is not None:
+            # gcc uses the .gch instead of the header when it is there
+            # and was made with the same flags, and ignores it otherwise
+            print >> f
+            print >> f, ('$(PCH): %s common_header.h structdef.h '
+                         'forwarddecl.h' % header)
+            print >> f, ('\t$(CC) $(CFLAGS) -x c-header -o $@ -c $< '
+                         '$(INCLUDEDIRS)')
+            print >> f
+            for source in sources:
+                print >> f, '%s.o: %s $(PCH)' % (source[:-2], source)
         f.close()
 
 
@@ -338,6 +360,9 @@ SPLIT_CRITERIA = 65535 # support VC++ 7.2
 
 MARKER = '/*/*/' # provide an easy way to split after generating
 
+LINES_PER_OPERATION = 3   # rough size of the C code of an operation
+PCH_HEADER = 'implement.h'  # included first by the implement*.c files
+
 class SourceGenerator:
     one_source_file = True
 
@@ -345,6 +370,7 @@ class SourceGenerator:
         self.database = database
         self.preimpl = preimplementationlines
         self.extrafiles = []
+        self.precompiled = None  # (header, files including it first)
         self.path = None
         self.namespace = NameManager()
 
@@ -505,11 +531,18 @@ class SourceGenerator:
             print >> fc, '/***********************************************************/'
             fc.close()
 
+        if py.std.sys.platform != "win32":
+            self.gen_implement_shards(f)
+        else:
+            self.gen_implement_files(f, split_criteria_big)
+        print >> f
+
+    def gen_implement_files(self, f, split_criteria):
         nextralines = 8 + len(self.preimpl) + 4 + 1
         for name, nodeiter in self.splitnodesimpl('implement.c',
                                                    self.funcnodes,
                                                    nextralines, 1,
-                                                   split_criteria_big):
+                                                   split_criteria):
             print >> f, '/* %s */' % name
             fc = self.makefile(name)
             print >> fc, '/***********************************************************/'
@@ -531,7 +564,129 @@ class SourceGenerator:
                 print >> fc, MARKER
             print >> fc, '/***********************************************************/'
             fc.close()
-        print >> f
+
+    def gen_implement_shards(self, f):
+        # the function implementations go to files of about the same
+        # estimated compile cost, that include a single header first,
+        # which the Makefile precompiles
+        config = self.database.translator.config.translation
+        shards = split_funcnodes(self.funcnodes, config.source_shards)
+        fi = self.makefile(PCH_HEADER)
+        print >> fi, '/***********************************************************/'
+        print >> fi, '/***  Header of the implementation files                  ***/'
+        print >> fi
+        print >> fi, '#define PYPY_NOT_MAIN_FILE'
+        print >> fi, '#include "common_header.h"'
+        print >> fi, '#include "structdef.h"'
+        print >> fi, '#include "forwarddecl.h"'
+        print >> fi
+        for line in self.preimpl:
+            print >> fi, line
+        print >> fi
+        print >> fi, '#include "src/g_include.h"'
+        fi.close()
+        names = []
+        for nodes in shards:
+            name = self.uniquecname('implement.c')
+            print >> f, '/* %s */' % name
+            self.extrafiles.append(self.path.join(name))
+            names.append(name)
+        self.precompiled = PCH_HEADER, names
+        self.write_implement_shards(zip(names, shards),
+                                    config.source_processes)
+
+    def write_implement_shard(self, name, nodes):
+        log.writing(name)
+        fc = self.path.join(name).open('w')
+        print >> fc, '/***********************************************************/'
+        print >> fc, '/***  Implementations                                    ***/'
+        print >> fc
+        print >> fc, '#include "%s"' % PCH_HEADER
+        print >> fc
+        print >> fc, MARKER
+        for node in nodes:
+            print >> fc, '\n'.join(list(node.implementation()))
+            print >> fc, MARKER
+        print >> fc, '/***********************************************************/'
+        fc.close()
+
+    def write_implement_shards(self, shards, processes):
+        """ Write the (filename, nodes) shards, in up to processes forked
+        processes.  A child that finds new types or containers while
+        rendering has its shards written again here, as the database of
+        this process would not know about them.
+        """
+        if processes <= 1 or len(shards) <= 1 or not hasattr(os, 'fork'):
+            for name, nodes in shards:
+                self.write_implement_shard(name, nodes)
+            return
+        db = self.database
+        sizes = len(db.structdefnodes), len(db.containerlist)
+        py.std.sys.stdout.flush()
+        py.std.sys.stderr.flush()
+        children = []
+        for i in range(min(processes, len(shards))):
+            mine = shards[i::processes]
+            fd, resultfile = tempfile.mkstemp(prefix='genc-')
+            os.close(fd)
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    done = []
+                    try:
+                        for name, nodes in mine:
+                            self.write_implement_shard(name, nodes)
+                            done.append(name)
+                        if (len(db.structdefnodes),
+                            len(db.containerlist)) != sizes:
+                            done = []
+                        result = open(resultfile, 'wb')
+                        marshal.dump((done, db.instrument_ncounter), result)
+                        result.close()
+                    except:
+                        pass
+                finally:
+                    os._exit(0)
+            children.append((pid, resultfile, mine))
+        again = []
+        for pid, resultfile, mine in children:
+            os.waitpid(pid, 0)
+            try:
+                done, ncounter = marshal.load(open(resultfile, 'rb'))
+            except (EOFError, ValueError, TypeError):
+                done, ncounter = [], 0
+            os.unlink(resultfile)
+            db.instrument_ncounter = max(db.instrument_ncounter, ncounter)
+            for name, nodes in mine:
+                if name not in done:
+                    again.append((name, nodes))
+        for name, nodes in again:
+            log.writing("%s again, in the main process" % name)
+            self.write_implement_shard(name, nodes)
+
+
+def estimated_cost(node):
+    """ Rough number of lines of the implementation of a FuncNode """
+    cost = 1
+    for funcgen in node.funcgens:
+        graph = getattr(funcgen, 'graph', None)
+        if graph is None:
+            cost += 10
+            continue
+        for block in graph.iterblocks():
+            cost += 1 + len(block.exits) + (
+                LINES_PER_OPERATION * len(block.operations))
+    return cost
+
+def split_funcnodes(funcnodes, count=0):
+    """ Split funcnodes into count lists of about the same estimated cost,
+    or into as many as needed to stay below SPLIT_CRITERIA lines if count
+    is 0.  The nodes of each list keep their order.
+    """
+    costs = [estimated_cost(node) for node in funcnodes]
+    if count <= 0:
+        count = sum(costs) // SPLIT_CRITERIA + 1
+    return balanced_shards(funcnodes, costs, count)
 
 
 # this function acts as the fallback for small sources for now.
@@ -684,7 +839,8 @@ def gen_source_standalone(database, modulename, targetdir,
         print >>fi, "#define INSTRUMENT_NCOUNTER %d" % n
         fi.close()
 
-    return filename, sg.getextrafiles() + sources, include_dirs
+    return (filename, sg.getextrafiles() + sources, include_dirs,
+            sg.precompiled)
 
 
 def gen_source(database, modulename, targetdir, defines={}, exports={},
@@ -876,7 +1032,7 @@ $(TARGET): $(OBJECTS)
 \t$(CC) $(CFLAGS) -o $@ -c $< $(INCLUDEDIRS)
 
 clean:
-\trm -f $(OBJECTS) $(TARGET)
+\trm -f $(OBJECTS) $(TARGET) $(PCH)
 
 debug:
 \tmake CFLAGS="-g -DRPY_ASSERT"
@@ -893,6 +1049,6 @@ profile:
 profopt:
 \tmake CFLAGS="-fprofile-generate $(CFLAGS)" LDFLAGS="-fprofile-generate $(LDFLAGS)"
 \t./$(TARGET) $(PROFOPT)
-\trm -f $(OBJECTS) $(TARGET)
+\trm -f $(OBJECTS) $(TARGET) $(PCH)
 \tmake CFLAGS="-fprofile-use $(CFLAGS)" LDFLAGS="-fprofile-use $(LDFLAGS)"
 '''
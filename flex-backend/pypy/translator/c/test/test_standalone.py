@@ -164,3 +164,36 @@ def test_profopt():
     exe = t.compile()
     out = py.process.cmdexec("%s 500" % exe)
     assert int(out) == 500*501/2
+
+def test_source_shards():
+    if not hasattr(os, 'fork'):
+        py.test.skip("needs os.fork()")
+    def add(a, b):
+        return a + b
+    def mul(a, b):
+        return a * b
+    def entry_point(argv):
+        x = int(argv[1])
+        os.write(1, str(add(x, 2)) + ' ' + str(mul(x, 3)) + '\n')
+        return 0
+    t = TranslationContext()
+    t.config.translation.source_shards = 3
+    t.config.translation.source_processes = 2
+    t.buildannotator().build_types(entry_point, [s_list_of_strings])
+    t.buildrtyper().specialize()
+
+    cbuilder = CStandaloneBuilder(t, entry_point, t.config)
+    cbuilder.generate_source()
+    header, sources = cbuilder.precompiled
+    assert len(sources) == 3
+    for source in sources:
+        text = cbuilder.targetdir.join(source).read()
+        assert text.count('#include') == 1
+        assert '#include "%s"' % header in text
+    makefile = cbuilder.targetdir.join('Makefile').read()
+    assert 'PCH     = %s.gch' % header in makefile
+    for source in sources:
+        assert '%s.o: %s $(PCH)' % (source[:-2], source) in makefile
+    cbuilder.compile()
+    data = cbuilder.cmdexec('5')
+    assert data == '7 15\n'
@@ -100,6 +100,13 @@ class TranslationDriver(SimpleTaskEngine):
         self.extmod_name = extmod_name
 
         self.done = {}
+        self.checkpointed = {}
+
+        if self.config.translation.task_profile:
+            from pypy.translator.tool.taskprofile import TaskProfile
+            self.profile = TaskProfile()
+        else:
+            self.profile = None
 
         self.disable(disable)
 
@@ -213,11 +220,45 @@ class TranslationDriver(SimpleTaskEngine):
 
         self.translator.driver_instrument_result = self.instrument_result
 
+        if self.config.translation.resume:
+            self.resume(self.config.translation.resume)
+
+    def resume(self, filename):
+        """ Put the state saved in a checkpoint into the translator, and
+        mark the goals that were done then as done
+        """
+        from pypy.translator.tool.checkpoint import load_checkpoint
+        from pypy.translator.tool.checkpoint import latest_checkpoint
+        if os.path.isdir(filename):
+            filename = latest_checkpoint(filename)
+        self.log.info("resuming from %s" % filename)
+        goals = load_checkpoint(filename, self.translator)
+        backend, ts = self.get_backend_and_type_system()
+        for goal in goals:
+            if goal.startswith('rtype_') and ts and goal != 'rtype_' + ts:
+                raise Exception("%s holds a translation rtyped with %s, "
+                                "not %s" % (filename, goal, ts))
+            self.done[goal] = True
+            self.checkpointed[goal] = True
+
+    def save_checkpoint(self, goal):
+        from pypy.translator.tool.checkpoint import save_checkpoint
+        dirname = self.config.translation.checkpoint_dir
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        filename = os.path.join(dirname, goal + '.checkpoint')
+        self.log.info("saving checkpoint %s" % filename)
+        save_checkpoint(filename, self.translator, self.done.keys())
+        self.checkpointed[goal] = True
+
     def setup_library(self, libdef, policy=None, extra={}, empty_translator=None):
         self.setup(None, None, policy, extra, empty_translator)
         self.libdef = libdef
 
     def instrument_result(self, args):
+        runner = self.config.translation.backendopt.profile_based_inline_runner
+        if runner == 'llinterp':
+            return self.llinterp_instrument_result(args)
         backend, ts = self.get_backend_and_type_system()
         if backend != 'c' or sys.platform == 'win32':
             raise Exception("instrumentation requires the c backend"
@@ -250,6 +291,30 @@ class TranslationDriver(SimpleTaskEngine):
             datafile.close()
             return counters
 
+    def llinterp_instrument_result(self, args):
+        """ Run the entry point on the low-level graphs with the
+        llinterpreter, returning the counters like instrument_result() """
+        import array, shlex
+        from pypy.rpython.llinterp import LLInterpreter
+        if not self.standalone:
+            raise Exception("instrumentation with the llinterpreter "
+                            "requires a standalone program")
+        translator = self.translator
+        bk = translator.annotator.bookkeeper
+        graph = bk.getdesc(self.entry_point).getuniquegraph()
+        r_argv = translator.rtyper.bindingrepr(graph.getargs()[0])
+        ll_argv = r_argv.convert_const(['pypy-llinterp'] + shlex.split(args))
+        interp = LLInterpreter(translator.rtyper, tracing=False)
+        interp.instrument_counters = {}
+        interp.eval_graph(graph, [ll_argv])
+        n = 0
+        if interp.instrument_counters:
+            n = max(interp.instrument_counters.keys()) + 1
+        counters = array.array('L', [0] * n)
+        for label, count in interp.instrument_counters.items():
+            counters[label] = count
+        return counters
+
     def info(self, msg):
         log.info(msg)
 
@@ -262,7 +327,11 @@ class TranslationDriver(SimpleTaskEngine):
             self.log.info("%s..." % title)
         instrument = False
         try:
-            res = func()
+            if self.profile is not None:
+                res = self.profile.measure(goal, title, func,
+                                           getattr(self, 'translator', None))
+            else:
+                res = func()
         except Instrument:
             instrument = True
         if not func.task_idempotent:
@@ -272,6 +341,32 @@ class TranslationDriver(SimpleTaskEngine):
             assert False, 'we should not get here'
         return res
 
+    def _execute(self, goals, *args, **kwds):
+        try:
+            return SimpleTaskEngine._execute(self, goals, *args, **kwds)
+        finally:
+            # only once the outermost goals are done, the tasks that
+            # are still running have no figures yet
+            if self.profile is not None and not self.profile.stack:
+                # don't hide the exception of a failed task, nor fail a
+                # translation that worked, because of the profile
+                try:
+                    self.save_profile()
+                except (KeyboardInterrupt, SystemExit):
+                    raise
+                except Exception, e:
+                    self.log.ERROR("could not write the task profile: "
+                                   "%s: %s" % (e.__class__.__name__, e))
+
+    def save_profile(self):
+        filename = self.config.translation.task_profile
+        self.profile.write_json(filename)
+        self.profile.write_folded(filename + '.folded')
+        self.log.info("task profile written to %s and %s.folded" %
+                      (filename, filename))
+        for line in self.profile.summary().split('\n'):
+            self.log.info(line)
+
     def task_annotate(self):
         # includes annotation and annotatation simplifications
         translator = self.translator
@@ -290,6 +385,8 @@ class TranslationDriver(SimpleTaskEngine):
                                 "int (and not, e.g., None or always raise an "
                                 "exception).")
             annotator.simplify()
+            if translator.flowcache is not None:
+                translator.flowcache.report()
             return s
         else:
             assert self.libdef is not None
@@ -297,6 +394,8 @@ class TranslationDriver(SimpleTaskEngine):
                 annotator.build_types(func, inputtypes)
             self.sanity_check_annotation()
             annotator.simplify()
+            if translator.flowcache is not None:
+                translator.flowcache.report()
     #
     task_annotate = taskdef(task_annotate, [], "Annotating&simplifying")
 
@@ -628,20 +727,48 @@ class TranslationDriver(SimpleTaskEngine):
                               'Please manually run the generated code')
 
 
+    def task_prune_flex(self):
+        from pypy.translator.flex.prune import prune
+        self.flex_pruning = None
+        if self.config.translation.flex.prune:
+            unpruned_bytes = None
+            if self.config.translation.flex.prune_measure:
+                from pypy.translator.flex.js import measure_source
+                unpruned_bytes = measure_source(self.translator,
+                                                self.entry_point, self.config)
+            entry_graph = self.translator.annotator.bookkeeper.getdesc(
+                self.entry_point).cachedgraph(None)
+            self.flex_pruning = prune(self.translator, entry_graph)
+            self.flex_pruning.unpruned_bytes = unpruned_bytes
+    task_prune_flex = taskdef(task_prune_flex,
+                              ['??' + OOBACKENDOPT, OOTYPE],
+                              'Removing code unreachable from the Flex entry points')
+
     def task_source_flex(self):
         from pypy.translator.flex.js import JS
         self.gen = JS(self.translator, functions=[self.entry_point],
-                      stackless=self.config.translation.stackless)
+                      stackless=self.config.translation.stackless,
+                      config=self.config,
+                      pruning=self.flex_pruning)
         filename = self.gen.write_source()
         self.log.info("Wrote %s" % (filename,))
     task_source_flex = taskdef(task_source_flex, 
-                        [OOTYPE],
+                        ['prune_flex', OOTYPE],
                         'Generating Flex source')
 
     def task_compile_flex(self):
-        pass
+        flexconfig = self.config.translation.flex
+        if not flexconfig.swf:
+            return
+        from pypy.translator.flex.build import FlexBuild
+        builder = FlexBuild('.', compc=flexconfig.compc,
+                            mxmlc=flexconfig.mxmlc,
+                            jobs=flexconfig.build_jobs)
+        self.swf = builder.build(self.gen.assembly_name,
+                                 self.gen.tmpfile.read())
+        self.log.info("Wrote %s" % (self.swf,))
     task_compile_flex = taskdef(task_compile_flex, ['source_flex'],
-                              'Skipping Javascript compilation')
+                              'Compiling the Flex application')
 
     def task_run_flex(self):
         pass
@@ -818,6 +945,12 @@ mono "$(dirname $0)/$(basename $0)-data/%s" "$@" # XXX doesn't work if it's plac
                         prereq()
                     from pypy.translator.goal import unixcheckpoint
                     unixcheckpoint.restartable_point(auto='run')
+        elif kind == 'post':
+            from pypy.translator.tool.checkpoint import CHECKPOINT_GOALS
+            if (self.config.translation.checkpoint_dir and
+                    goal in CHECKPOINT_GOALS and
+                    goal not in self.checkpointed):
+                self.save_checkpoint(goal)
 
 
 def mkexename(name):
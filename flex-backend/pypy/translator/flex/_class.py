@@ -78,6 +78,8 @@ class Class(Node):
         for m_name, m_meth in self.classdef._methods.iteritems():
             graph = getattr(m_meth, 'graph', None)
             if m_name=="o__init__": continue
+            if not self.db.is_method_used(m_name, graph):
+                continue
             if graph:
                 f = self.db.genoo.Function(self.db, graph, m_name, is_method = True, _class = self.name)
                 f.render(ilasm)
@@ -97,6 +99,8 @@ class Class(Node):
         default_values = self.classdef._fields.copy()
         default_values.update(self.classdef._overridden_defaults)
         for field_name, (field_type, field_value) in default_values.iteritems():
+            if not self.db.is_field_used(field_name):
+                continue
             ilasm.load_str("this")
             self.db.load_const(field_type, field_value, ilasm)
             ilasm.set_field(None, field_name)
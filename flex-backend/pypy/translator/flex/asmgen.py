@@ -15,6 +15,7 @@ def add_import(name):
 class CodeGenerator(object):
     def __init__(self, out, indentstep = 4, startblock = '{', endblock = '}'):
         self._out = out
+        self.filename = None # set for generators buffering a py/*.as file
         self._indent = 0
         self._bol = True # begin of line
         self._indentstep = indentstep
@@ -45,6 +46,22 @@ class CodeGenerator(object):
     def close(self):
         self._out.close()
 
+def write_file(filename, data, cache=None):
+    """ Write data to filename, going through the graph cache (if any)
+    so that unchanged files keep their mtime
+    """
+    if cache is not None:
+        cache.write(filename, data)
+    else:
+        f = open(filename, "w")
+        f.write(data)
+        f.close()
+
+def _rettype(rettype):
+    if rettype is None:
+        return ""
+    return ":" + rettype
+
 class Queue(object):
     def __init__(self, l, subst_table):
         self.l = l[:]
@@ -72,14 +89,16 @@ class Queue(object):
 class AsmGen(object):
     """ JS 'assembler' generator routines
     """
-    def __init__(self, outfile, name):
+    def __init__(self, outfile, name, cache=None):
         self.outfile = outfile
         self.name = name
+        self.cache = cache
         self.subst_table = {}
         self.right_hand = Queue([], self.subst_table)
         self.codegenerator = CodeGenerator(outfile)
         self.gen_stack = []
         self.push = True
+        self.written_bytes = 0 # size of the py/*.as files generated
         
     def set_push(self, value):
         self.push = value
@@ -87,17 +106,23 @@ class AsmGen(object):
     def push_gen(self, generator):
         self.gen_stack.append( self.codegenerator )
         if isinstance(generator, str):
-            generator = CodeGenerator(open(generator, "w") )
+            filename = generator
+            generator = CodeGenerator(StringIO())
+            generator.filename = filename
         self.codegenerator = generator 
         
     def pop_gen(self):
-        #self.codegenerator.close()
+        generator = self.codegenerator
+        if generator.filename is not None:
+            data = generator._out.getvalue()
+            self.written_bytes += len(data)
+            write_file(generator.filename, data, self.cache)
         self.codegenerator = self.gen_stack.pop()
         
     def close(self):
         self.outfile.close()
     
-    def begin_function(self, name, arglist):
+    def begin_function(self, name, arglist, rettype=None):
         if self.push:
             self.push_gen("py/"+name+".as")
             self.codegenerator.write("package py ")
@@ -107,11 +132,11 @@ class AsmGen(object):
             for iname in import_list:
                 self.codegenerator.writeline("import "+iname+";")
             
-        args = ",".join([i[1] for i in arglist])
-        self.codegenerator.write("public function %s (%s) "%(name, args))
+        args = ",".join(arglist)
+        self.codegenerator.write("public function %s (%s)%s "%(name, args, _rettype(rettype)))
         self.codegenerator.openblock()
     
-    def begin_method(self, name, _class, arglist):
+    def begin_method(self, name, _class, arglist, rettype=None):
         if self.push:
             self.push_gen("py/"+name+".as")
             self.codegenerator.write("package py ")
@@ -122,7 +147,7 @@ class AsmGen(object):
                 self.codegenerator.writeline("import "+iname+";")
 
         args = ",".join(arglist)
-        self.codegenerator.write("%s.prototype.%s = function (%s)"%(_class, name, args))
+        self.codegenerator.write("%s.prototype.%s = function (%s)%s"%(_class, name, args, _rettype(rettype)))
         self.codegenerator.openblock()
     
     def end_function(self):
@@ -145,6 +170,15 @@ class AsmGen(object):
         self.codegenerator.write("dynamic public class %s extends %s "%(name, base))
         self.codegenerator.openblock()
 
+    def begin_const_pool(self, name):
+        self.codegenerator.write("package py ")
+        self.codegenerator.openblock()
+        self.codegenerator.write("public class %s " % name)
+        self.codegenerator.openblock()
+
+    def static_field(self, name, _type):
+        self.codegenerator.writeline("public static var %s:%s;" % (name, _type))
+
     def end_class(self):
         self.codegenerator.closeblock()
         self.codegenerator.closeblock()
@@ -196,6 +230,10 @@ class AsmGen(object):
             arg_name = arg
         self.branch_if_string("%s == %s"%(arg_name, mapping(str(exitcase))))
         
+    def branch_if_value(self, value):
+        arg = self.right_hand.pop()
+        self.branch_if_string("%s == %s"%(self.subst_table.get(arg, arg), value))
+
     def branch_if_string(self, arg):
         self.codegenerator.writeline("if (%s)"%arg)
         self.codegenerator.openblock()
@@ -352,6 +390,26 @@ class AsmGen(object):
     def end_for(self):
         self.codegenerator.closeblock()
         self.codegenerator.closeblock()
+
+    def begin_loop(self, label):
+        self.codegenerator.write("%s: while (true) "%label)
+        self.codegenerator.openblock()
+
+    def end_loop(self):
+        self.codegenerator.closeblock()
+
+    def begin_labeled_block(self, label):
+        self.codegenerator.write("%s: "%label)
+        self.codegenerator.openblock()
+
+    def end_labeled_block(self):
+        self.codegenerator.closeblock()
+
+    def continue_to(self, label):
+        self.codegenerator.writeline("continue %s;"%label)
+
+    def break_to(self, label):
+        self.codegenerator.writeline("break %s;"%label)
     
     def inherits(self, subclass_name, parent_name):
         self.codegenerator.writeline("inherits(%s,%s);"%(subclass_name, parent_name))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+""" Benchmark of the JSON reader and writer
+Usage: bench_json.py [sizes in MB, default 1 10]
+
+Compares pypy.translator.flex.json with the character by character
+implementation still used by the javascript backend, on payloads shaped
+like the answers of a lib/server.py application (a list of records with
+strings, numbers and nested lists).  iterparse is measured reading the
+payload from a file, one item at a time.
+"""
+
+import autopath
+import sys, time
+from pypy.translator.flex import json
+from pypy.translator.js import json as old_json
+from pypy.tool.udir import udir
+
+def make_payload(size):
+    items = []
+    length = 2
+    i = 0
+    while length < size:
+        item = {'id': i, 'name': 'item "%d"\n' % i, 'price': i * 0.25,
+                'tags': ['a', 'b/c', 'd'], 'valid': i % 2 == 0,
+                'parent': None}
+        items.append(item)
+        length += len(json.write(item)) + 1
+        i += 1
+    return items
+
+def timeit(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+def bench(megabytes):
+    items = make_payload(megabytes * 1024 * 1024)
+    new_write, data = timeit(json.write, items)
+    old_write, _ = timeit(old_json.write, items)
+    new_read, _ = timeit(json.read, data)
+    old_read, _ = timeit(old_json.read, data)
+    filename = udir.join('bench_json_%d.json' % megabytes)
+    filename.write(data)
+    f = filename.open()
+    try:
+        stream, count = timeit(lambda: len(list(json.iterparse(f, items=True))))
+    finally:
+        f.close()
+    assert count == len(items)
+    return [('write', old_write, new_write), ('read', old_read, new_read),
+            ('iterparse', None, stream)]
+
+def main(args):
+    sizes = [int(arg) for arg in args] or [1, 10]
+    print '%-6s %-10s %10s %10s %8s' % ('MB', 'operation', 'old (s)',
+                                        'new (s)', 'speedup')
+    for size in sizes:
+        for name, old, new in bench(size):
+            if old is None:
+                print '%-6d %-10s %10s %10.3f %8s' % (size, name, '-', new, '-')
+            else:
+                print '%-6d %-10s %10.3f %10.3f %7.1fx' % (size, name, old,
+                                                           new, old / new)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
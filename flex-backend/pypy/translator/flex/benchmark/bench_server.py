@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+""" Load test of the development server
+Usage: bench_server.py [--clients=N] [--requests=N] [--delay=SECONDS]
+
+Runs the same load against the single-threaded server and against the
+threaded server with persistent connections: every client sends its
+requests one after the other, every tenth of them to an exported method
+sleeping for the given delay (a slow database call, say) and the others
+to a fast one.  Prints the requests per second and the median and 99th
+percentile latencies.
+"""
+
+import autopath
+import sys, time, thread, threading, httplib
+from pypy.translator.flex.lib import server
+from pypy.rpython.ootypesystem.bltregistry import described
+
+DELAY = 0.05
+
+class Methods(server.ExportedMethods):
+    @described(retval=int)
+    def fast(self):
+        return 1
+
+    @described(retval=int)
+    def slow(self):
+        time.sleep(DELAY)
+        return 1
+
+class Root(server.Collection):
+    exported_methods = Methods()
+
+class Handler(server.NewHandler):
+    application = Root()
+
+    def log_message(self, format, *args):
+        pass
+
+def client(port, requests, keep_alive, latencies, lock):
+    conn = None
+    mine = []
+    for i in range(requests):
+        if i % 10 == 0:
+            path = '/exported_methods/slow'
+        else:
+            path = '/exported_methods/fast'
+        start = time.time()
+        if conn is None:
+            conn = httplib.HTTPConnection('127.0.0.1', port)
+        conn.request('GET', path)
+        response = conn.getresponse()
+        response.read()
+        if not keep_alive or response.getheader('connection') == 'close':
+            conn.close()
+            conn = None
+        mine.append(time.time() - start)
+    if conn is not None:
+        conn.close()
+    lock.acquire()
+    latencies.extend(mine)
+    lock.release()
+
+def run(threaded, keep_alive, clients, requests):
+    httpd = server.create_server(('127.0.0.1', 0), Handler,
+                                 threaded=threaded, keep_alive=keep_alive)
+    thread.start_new_thread(httpd.serve_forever, ())
+    latencies = []
+    lock = threading.Lock()
+    threads = [threading.Thread(target=client,
+                                args=(httpd.server_port, requests,
+                                      keep_alive, latencies, lock))
+               for i in range(clients)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+    latencies.sort()
+    return (len(latencies) / elapsed,
+            latencies[len(latencies) // 2],
+            latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)])
+
+def main(args):
+    global DELAY
+    clients = 20
+    requests = 50
+    for arg in args:
+        name, value = arg.split('=')
+        if name == '--clients':
+            clients = int(value)
+        elif name == '--requests':
+            requests = int(value)
+        elif name == '--delay':
+            DELAY = float(value)
+    print '%-30s %10s %10s %10s' % ('server', 'req/s', 'p50 (ms)',
+                                    'p99 (ms)')
+    for name, threaded, keep_alive in [('single-threaded', False, False),
+                                       ('threaded', True, False),
+                                       ('threaded, keep-alive', True, True)]:
+        rate, p50, p99 = run(threaded, keep_alive, clients, requests)
+        print '%-30s %10.1f %10.1f %10.1f' % (name, rate, p50 * 1000,
+                                              p99 * 1000)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+""" Microbenchmarks comparing typed and untyped ActionScript output
+Usage: bench_typed.py [--player=COMMAND] [benchmark names]
+
+Every benchmark is compiled twice into its own directory, with and
+without translation.flex.typed, and the resulting output.mxml is built
+with mxmlc (which must be on the PATH).  If a player is given, it is run
+as 'COMMAND output.swf' and is expected to print the trace() output of
+the SWF on stdout (e.g. a debugger player or an avmshell wrapper); the
+time measured inside the SWF with getTimer() is then reported as well.
+"""
+
+import autopath
+import sys, os, re, time
+import py
+from pypy.rpython.extfunc import register_external
+from pypy.config.config import Config
+from pypy.tool.udir import udir
+
+N = 1000000
+
+def getTimer():
+    return int(time.time() * 1000)
+register_external(getTimer, args=[], result=int,
+                  export_name="flash.utils.getTimer")
+
+def bench_loop():
+    total = 0
+    i = 0
+    while i < N:
+        total += i * 3 % 7
+        i += 1
+    return total
+
+def bench_float_loop():
+    total = 0.0
+    i = 0
+    while i < N:
+        total += i * 0.5
+        i += 1
+    return int(total)
+
+def bench_list():
+    l = []
+    for i in range(N // 10):
+        l.append(i)
+    total = 0
+    for k in range(10):
+        for x in l:
+            total += x
+        l[k] = total
+    return total
+
+def bench_dict():
+    d = {}
+    for i in range(N // 10):
+        d[i] = i * 2
+    total = 0
+    for k in range(10):
+        for i in range(N // 10):
+            total += d[i]
+    return total
+
+def bench_string_dict():
+    keys = [str(i) for i in range(1000)]
+    d = {}
+    for key in keys:
+        d[key] = len(key)
+    total = 0
+    for k in range(N // 1000):
+        for key in keys:
+            total += d[key]
+    return total
+
+benchmarks = ['bench_loop', 'bench_float_loop', 'bench_list', 'bench_dict',
+              'bench_string_dict']
+
+main_source = """
+from pypy.translator.flex.benchmark.bench_typed import %(name)s, getTimer
+from pypy.translator.flex.modules.flex import trace
+
+def flash_main(a=1):
+    start = getTimer()
+    result = %(name)s()
+    trace("bench %(name)s " + str(getTimer() - start))
+    trace("result " + str(result))
+"""
+
+def build(name, typed, player=None):
+    from pypy.translator.flex.main import rpython2javascript_main, js_optiondescr
+    if typed:
+        kind = 'typed'
+    else:
+        kind = 'untyped'
+    workdir = udir.ensure('flexbench', '%s_%s' % (name, kind), dir=1)
+    static = py.path.local(__file__).dirpath().dirpath().join('examples',
+                                                              'static')
+    static.join('py').copy(workdir.ensure('py', dir=1))
+    static.join('ll_os_path').copy(workdir.ensure('ll_os_path', dir=1))
+    modfile = workdir.join('%s_main.py' % name)
+    modfile.write(main_source % {'name': name})
+
+    jsconfig = Config(js_optiondescr)
+    jsconfig.typed = typed
+    jsconfig.output = 'output.mxml'
+    result = {'name': name, 'kind': kind}
+    olddir = workdir.chdir()
+    try:
+        rpython2javascript_main([str(modfile), 'flash_main'], jsconfig)
+        start = time.time()
+        status = os.system('mxmlc output.mxml >mxmlc.log 2>&1')
+        result['compile'] = time.time() - start
+        if status != 0:
+            raise Exception("mxmlc failed, see %s" % workdir.join('mxmlc.log'))
+        result['size'] = workdir.join('output.swf').size()
+        if player:
+            output = os.popen('%s output.swf' % player).read()
+            m = re.search(r'bench %s (\d+)' % name, output)
+            if m:
+                result['run'] = int(m.group(1)) / 1000.0
+    finally:
+        olddir.chdir()
+    return result
+
+def main(args):
+    player = None
+    names = []
+    for arg in args:
+        if arg.startswith('--player='):
+            player = arg[len('--player='):]
+        else:
+            names.append(arg)
+    if not names:
+        names = benchmarks
+    if py.path.local.sysfind('mxmlc') is None:
+        print "mxmlc not found on the PATH"
+        sys.exit(1)
+
+    results = []
+    for name in names:
+        for typed in [False, True]:
+            results.append(build(name, typed, player))
+
+    print '%-20s %-8s %10s %10s %10s' % ('benchmark', 'kind', 'swf size',
+                                         'mxmlc (s)', 'run (s)')
+    for result in results:
+        run = result.get('run')
+        if run is None:
+            run = '-'
+        else:
+            run = '%.3f' % run
+        print '%-20s %-8s %10d %10.2f %10s' % (result['name'], result['kind'],
+                                               result['size'],
+                                               result['compile'], run)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,284 @@
+""" building the SWF out of the generated ActionScript
+
+Compiling the whole py package with a single mxmlc run takes most of the
+turnaround time of big applications.  FlexBuild splits the .as files
+into a fixed number of libraries, always putting a given file into the
+same one.  The libraries that changed since the previous build, or that
+refer to a library that changed, are compiled again with compc, several
+of them at a time.  The application is then linked against all of them
+with mxmlc.
+"""
+
+import os
+import re
+import md5
+import time
+import shlex
+import marshal
+import subprocess
+
+from pypy.translator.flex.log import log
+
+log = log.build
+
+BUILD_VERSION = 2
+INDEX_NAME = '.flexbuild'
+SHARDS = 16
+PACKAGES = ['py', 'll_os_path']
+
+WORD = re.compile(r'\w+')
+
+class FlexBuildError(Exception):
+    pass
+
+def shard_of(filename, shards=SHARDS):
+    """ The number of the library in which filename is compiled.  It
+    depends only on the name, so that adding or changing a function does
+    not move the other ones around.
+    """
+    return int(md5.new(filename).hexdigest()[:8], 16) % shards
+
+def definition_name(filename):
+    return filename[:-len('.as')].replace(os.sep, '.')
+
+def find_sources(dirname, packages=PACKAGES):
+    """ The .as files of the given packages, relative to dirname """
+    result = []
+    for package in packages:
+        pkgdir = os.path.join(dirname, package)
+        if not os.path.isdir(pkgdir):
+            continue
+        for name in os.listdir(pkgdir):
+            if name.endswith('.as'):
+                result.append(os.path.join(package, name))
+    result.sort()
+    return result
+
+def split_command(command):
+    if isinstance(command, str):
+        return shlex.split(command)
+    return list(command)
+
+class FlexBuild(object):
+    """ Incremental, parallel build of a Flex application living in
+    dirname.  compc and mxmlc are the commands used to compile the
+    libraries and to link the application (strings are split like a
+    shell would do), jobs is the number of compc processes running at
+    the same time.
+    """
+    def __init__(self, dirname='.', compc='compc', mxmlc='mxmlc', jobs=4,
+                 shards=SHARDS):
+        self.dirname = dirname
+        self.compc = split_command(compc)
+        self.mxmlc = split_command(mxmlc)
+        self.jobs = max(jobs, 1)
+        self.shards = shards
+        self.builddir = os.path.join(dirname, 'flexbuild')
+        self.indexfile = os.path.join(self.builddir, INDEX_NAME)
+        self.compiled = []
+        self.reused = []
+
+    def _load_index(self):
+        try:
+            f = open(self.indexfile, 'rb')
+        except IOError:
+            return {}
+        try:
+            try:
+                version, index = marshal.load(f)
+            except (EOFError, ValueError, TypeError):
+                return {}
+        finally:
+            f.close()
+        if version != BUILD_VERSION:
+            return {}
+        return index
+
+    def _save_index(self, index):
+        f = open(self.indexfile, 'wb')
+        try:
+            marshal.dump((BUILD_VERSION, index), f)
+        finally:
+            f.close()
+
+    def split(self, sources):
+        """ Group sources into libraries, returning a list of
+        (swc filename, sources) for the libraries that are not empty
+        """
+        groups = {}
+        for filename in sources:
+            groups.setdefault(shard_of(filename, self.shards), []).append(
+                filename)
+        result = []
+        numbers = groups.keys()
+        numbers.sort()
+        for number in numbers:
+            swc = os.path.join(self.builddir, 'lib%d.swc' % number)
+            result.append((swc, groups[number]))
+        return result
+
+    def read_source(self, filename):
+        f = open(os.path.join(self.dirname, filename), 'rb')
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def library_keys(self, libraries):
+        """ The keys of the (swc filename, sources) libraries.  A library
+        is compiled against the definitions of the libraries it refers
+        to, so its key covers their sources too, transitively: changing
+        a function signature rebuilds every library that may use it.
+        """
+        digests = {}    # swc -> digest of its own sources
+        words = {}      # swc -> {identifier used in its sources: True}
+        defined = {}    # name of a definition -> swc defining it
+        for swc, sources in libraries:
+            m = md5.new(' '.join(self.compc))
+            used = {}
+            for filename in sources:
+                data = self.read_source(filename)
+                m.update('\n%s %s' % (filename, md5.new(data).hexdigest()))
+                for word in WORD.findall(data):
+                    used[word] = True
+                name = os.path.basename(filename)[:-len('.as')]
+                defined[name] = swc
+            digests[swc] = m.hexdigest()
+            words[swc] = used
+        depends = {}
+        for swc, _ in libraries:
+            depends[swc] = {}
+            for word in words[swc]:
+                other = defined.get(word)
+                if other is not None and other != swc:
+                    depends[swc][other] = True
+        keys = {}
+        for swc, _ in libraries:
+            seen = {swc: True}
+            pending = [swc]
+            while pending:
+                for other in depends[pending.pop()]:
+                    if other not in seen:
+                        seen[other] = True
+                        pending.append(other)
+            closure = seen.keys()
+            closure.sort()
+            m = md5.new()
+            for other in closure:
+                m.update('%s %s\n' % (os.path.basename(other),
+                                      digests[other]))
+            keys[swc] = m.hexdigest()
+        return keys
+
+    def compc_command(self, swc, sources, all_sources):
+        own = {}
+        for filename in sources:
+            own[filename] = True
+        externs = [definition_name(filename) for filename in all_sources
+                   if filename not in own]
+        command = self.compc + ['-source-path', os.path.abspath(self.dirname),
+                                '-include-sources']
+        command += [os.path.abspath(os.path.join(self.dirname, filename))
+                    for filename in sources]
+        if externs:
+            command += ['-externs'] + externs
+        command += ['-output', os.path.abspath(swc)]
+        return command
+
+    def run_all(self, commands):
+        """ Run the (logfile, command) pairs, at most self.jobs of them at
+        the same time.  Raises FlexBuildError if one of them fails.
+        """
+        pending = list(commands)
+        pending.reverse()
+        running = []
+        failed = []
+        while pending or running:
+            while pending and len(running) < self.jobs:
+                logfile, command = pending.pop()
+                out = open(logfile, 'w')
+                process = subprocess.Popen(command, stdout=out,
+                                           stderr=subprocess.STDOUT,
+                                           cwd=self.builddir)
+                running.append((process, out, logfile))
+            for item in running[:]:
+                process, out, logfile = item
+                if process.poll() is not None:
+                    out.close()
+                    running.remove(item)
+                    if process.returncode != 0:
+                        failed.append(logfile)
+            if running:
+                time.sleep(0.05)
+        if failed:
+            raise FlexBuildError("compilation failed, see %s" %
+                                 ', '.join(failed))
+
+    def build(self, name, mxml_source):
+        """ Build name.swf in dirname out of mxml_source and of the .as
+        files of the generated packages; returns the filename of the swf.
+        """
+        if not os.path.isdir(self.builddir):
+            os.mkdir(self.builddir)
+        old_index = self._load_index()
+        index = {}
+        sources = find_sources(self.dirname)
+        libraries = self.split(sources)
+
+        keys = self.library_keys(libraries)
+        commands = []
+        for swc, shard in libraries:
+            key = keys[swc]
+            index[swc] = key
+            if old_index.get(swc) == key and os.path.exists(swc):
+                self.reused.append(swc)
+                continue
+            logfile = swc[:-len('.swc')] + '.log'
+            commands.append((logfile, self.compc_command(swc, shard,
+                                                         sources)))
+            self.compiled.append(swc)
+        try:
+            self.run_all(commands)
+        except FlexBuildError:
+            # don't trust any of the libraries of this run next time
+            for swc in self.compiled:
+                index.pop(swc, None)
+            self._save_index(index)
+            raise
+        log("%d libraries compiled, %d reused" % (len(self.compiled),
+                                                  len(self.reused)))
+
+        swf = os.path.abspath(os.path.join(self.dirname, name + '.swf'))
+        link_key = md5.new(mxml_source + ' '.join(self.mxmlc) +
+                           ''.join([index[swc] for swc, _ in libraries]))
+        link_key = link_key.hexdigest()
+        if old_index.get(swf) == link_key and os.path.exists(swf):
+            log("%s is up to date" % swf)
+        else:
+            self.link(name, mxml_source, [swc for swc, _ in libraries], swf)
+        index[swf] = link_key
+        self._save_index(index)
+        return swf
+
+    def link(self, name, mxml_source, libraries, swf):
+        # the application is compiled in the build directory, because
+        # mxmlc always looks for sources next to the .mxml file and would
+        # otherwise recompile the whole py package instead of using the
+        # libraries
+        mxml = os.path.join(self.builddir, name + '.mxml')
+        f = open(mxml, 'w')
+        try:
+            f.write(mxml_source)
+        finally:
+            f.close()
+        data = os.path.abspath(os.path.join(self.dirname, 'data'))
+        link = os.path.join(self.builddir, 'data')
+        if os.path.isdir(data) and not os.path.exists(link):
+            os.symlink(data, link)
+        command = self.mxmlc[:]
+        if libraries:
+            command.append('-library-path+=' + ','.join(
+                [os.path.abspath(swc) for swc in libraries]))
+        command += ['-output', swf, os.path.abspath(mxml)]
+        self.run_all([(os.path.join(self.builddir, name + '.log'), command)])
+        log("linked %s" % swf)
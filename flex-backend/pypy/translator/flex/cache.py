@@ -0,0 +1,88 @@
+""" on-disk cache of the generated ActionScript files
+
+Every function, method and class of the flex backend ends up in its own
+py/<name>.as file, and mxmlc decides what to recompile by looking at the
+mtimes of those files.  GraphCache keeps an index of what was written
+during the previous run, so that files whose content did not change are
+not touched at all.
+"""
+
+import os
+import md5
+import marshal
+
+from pypy.translator.flex.log import log
+
+log = log.cache
+
+CACHE_VERSION = 2
+INDEX_NAME = '.graphcache'
+
+class GraphCache(object):
+    """ Index of the files written by a previous run, mapping
+    filename -> (content digest, (size, mtime)).
+    """
+    def __init__(self, dirname):
+        self.dirname = dirname
+        self.indexfile = os.path.join(dirname, INDEX_NAME)
+        self.index = self._load()
+        self.written = 0
+        self.kept = 0
+
+    def _load(self):
+        try:
+            f = open(self.indexfile, 'rb')
+        except IOError:
+            return {}
+        try:
+            try:
+                version, index = marshal.load(f)
+            except (EOFError, ValueError, TypeError):
+                return {}
+        finally:
+            f.close()
+        if version != CACHE_VERSION:
+            return {}
+        return index
+
+    def _stamp(self, filename):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime)
+
+    def is_fresh(self, filename, digest):
+        """ True if filename still holds exactly the content with the
+        given digest that we wrote last time
+        """
+        try:
+            old_digest, old_stamp = self.index[filename]
+        except KeyError:
+            return False
+        return old_digest == digest and old_stamp == self._stamp(filename)
+
+    def write(self, filename, data):
+        """ Write data to filename unless it is already there.  Returns
+        True if the file was actually written.
+        """
+        digest = md5.new(data).hexdigest()
+        if self.is_fresh(filename, digest):
+            self.kept += 1
+            return False
+        f = open(filename, 'w')
+        try:
+            f.write(data)
+        finally:
+            f.close()
+        self.index[filename] = (digest, self._stamp(filename))
+        self.written += 1
+        return True
+
+    def save(self):
+        f = open(self.indexfile, 'wb')
+        try:
+            marshal.dump((CACHE_VERSION, self.index), f)
+        finally:
+            f.close()
+        log("%d files written, %d unchanged" % (self.written, self.kept))
@@ -91,13 +91,95 @@ MOCHIKIT_BODY = """
 }
 """
 
+BATCH_BODY = r"""
+var %(class)s_batch = [];
+
+// called with the method name and the message of each call of a batch
+// that failed, instead of its callback; replace it to handle the errors
+var %(class)s_batch_onerror = function (method, message) {
+    throw new Error("remote call " + method + " failed: " + message);
+};
+
+function %(class)s_batch_call(method, data, callback) {
+    // calls made during the same frame are sent together, once the
+    // current event handler returned
+    if (%(class)s_batch.length == 0) {
+        setTimeout(%(class)s_batch_flush, 0);
+    }
+    %(class)s_batch.push([method, data, callback]);
+}
+
+function %(class)s_batch_quote(s) {
+    s = s.toString();
+    s = s.replace(/\\/g, "\\\\").replace(/"/g, '\\"');
+    s = s.replace(/\n/g, "\\n").replace(/\r/g, "\\r");
+    return '"' + s + '"';
+}
+
+function %(class)s_batch_flush() {
+    var calls = %(class)s_batch;
+    %(class)s_batch = [];
+    var items = [];
+    for (var i = 0; i < calls.length; i++) {
+        var args = [];
+        for (var name in calls[i][1]) {
+            if (calls[i][1][name]) {
+                args.push(%(class)s_batch_quote(name) + ":" +
+                          %(class)s_batch_quote(calls[i][1][name]));
+            }
+        }
+        items.push("[" + %(class)s_batch_quote(calls[i][0]) + ",{" +
+                   args.join(",") + "}]");
+    }
+    var x = new XMLHttpRequest();
+    x.open("POST", '%(call)s', true);
+    x.setRequestHeader("Content-type", "application/x-www-form-urlencoded");
+    x.onreadystatechange = function () {
+        var results;
+        var errors = [];
+        if (x.readyState == 4) {
+            if (x.status != 200) {
+                for (var i = 0; i < calls.length; i++) {
+                    errors.push([calls[i][0], "HTTP error " + x.status]);
+                }
+            } else {
+                eval ( "results = " + x.responseText );
+                for (var i = 0; i < calls.length; i++) {
+                    if (results[i].error != undefined) {
+                        errors.push([calls[i][0], results[i].error]);
+                    } else {
+                        calls[i][2](results[i].result);
+                    }
+                }
+            }
+            // the callbacks of the calls that succeeded already ran
+            for (var i = 0; i < errors.length; i++) {
+                %(class)s_batch_onerror(errors[i][0], errors[i][1]);
+            }
+        }
+    };
+    x.send("calls=" + encodeURIComponent("[" + items.join(",") + "]"));
+}
+"""
+
+BATCH_METHOD_BODY = """
+%(class)s.prototype.%(method)s = function ( %(args)s ) {
+    %(class)s_batch_call('%(method)s', %(data)s, callback);
+}
+"""
+
+# name of the exported method dispatching a batch, see
+# lib/server.py:ExportedMethods
+BATCH_METHOD = "_batch"
+
 USE_MOCHIKIT = True # FIXME: some option?
 
 class XmlHttp(object):
     """ Class for rendering xmlhttp request communication
     over normal js code
     """
-    def __init__(self, ext_obj, name, use_xml=False, base_url="", method="GET"):
+    def __init__(self, ext_obj, name, use_xml=False, base_url="", method="GET",
+                 batch=False):
         self.ext_obj = ext_obj
         self.name = name
         self.use_xml = use_xml
@@ -106,12 +188,22 @@ class XmlHttp(object):
         if not base_url and hasattr(obj, '_render_base_path'):
             self.base_url = obj._render_base_path
         self.method = method
+        self.batch = batch
     
     def render(self, ilasm):
         self.render_body(ilasm)
+        if self.batch:
+            assert not self.use_xml, "Cannot batch xml requests"
+            ilasm.codegenerator.write(BATCH_BODY % {'class':self.name,
+                'call':self.method_url(BATCH_METHOD)})
         for method_name, method in self.ext_obj._TYPE._class_._methods.iteritems():
             self.render_method(method_name, method, ilasm)
     
+    def method_url(self, method_name):
+        if len(self.base_url) > 0 and not self.base_url.endswith("/"):
+            return self.base_url + "/" + method_name
+        return self.base_url + method_name
+
     def render_body(self, ilasm):
         ilasm.begin_function(self.name, [])
         ilasm.end_function()
@@ -124,10 +216,12 @@ class XmlHttp(object):
         # FIXME: dirty JS here
         data = "{%s}" % ",".join(["'%s':%s" % (i,i) for i in real_args if i != 'callback'])
         real_callback = Variable("callback").name
-        if len(self.base_url) > 0 and not self.base_url.endswith("/"):
-            url = self.base_url + "/" +method_name
-        else:
-            url = self.base_url + method_name
+        url = self.method_url(method_name)
+        if self.batch:
+            ilasm.codegenerator.write(BATCH_METHOD_BODY % {'class':self.name,
+                'method':method_name, 'args':','.join(real_args),
+                'data':data})
+            return
         
         METHOD_BODY = globals()[self.method + "_METHOD_BODY"]
         if USE_MOCHIKIT and self.use_xml:
@@ -24,6 +24,14 @@ try:
 except NameError:
     from sets import Set as set
 
+class ConstPool(object):
+    """ Class holding all the prebuilt constants as typed static fields,
+    so that loading a constant compiles to a slot access rather than to a
+    dynamic lookup on the _consts_0 object
+    """
+    def __init__(self, name):
+        self.name = name
+
 class LowLevelDatabase(object):
     def __init__(self, genoo):
         self._pending_nodes = set()
@@ -37,11 +45,12 @@ class LowLevelDatabase(object):
         self.reverse_consts = {}
         self.const_names = set()
         self.rendered = set()
-        self.const_var = Variable("_consts")
+        self.const_var = ConstPool("Consts")
         self.name_manager = JavascriptNameManager(self)
         self.pending_consts = []
         self.cts = self.genoo.TypeSystem(self)
         self.proxies = []
+        self.pruning = None # set by JS when the prune_flex task was run
     
     def is_primitive(self, type_):
         if type_ in [Void, Bool, Float, Signed, Unsigned, SignedLongLong, UnsignedLongLong, Char, UniChar, ootype.StringBuilder] or \
@@ -71,6 +80,16 @@ class LowLevelDatabase(object):
             return
         self._pending_nodes.add(node)
 
+    def is_method_used(self, name, graph):
+        if self.pruning is None:
+            return True
+        return self.pruning.is_method_used(name, graph)
+
+    def is_field_used(self, name):
+        if self.pruning is None:
+            return True
+        return self.pruning.is_field_used(name)
+
     def record_function(self, graph, name):
         self.functions[graph] = name
     
@@ -183,8 +202,20 @@ class LowLevelDatabase(object):
             #ilasm.field(name, const.get_type(), static=True)
         for const, name in to_init:
             const.init_fields(ilasm, self.const_var, name)
-        
-        
+
+    def gen_const_pool(self, ilasm):
+        """ Render the class declaring a static field of the right type
+        for every recorded constant
+        """
+        ilasm.push_gen("py/%s.as" % self.const_var.name)
+        ilasm.begin_const_pool(self.const_var.name)
+        fields = [(name, const.get_as_type())
+                  for const, name in self.consts.iteritems()]
+        fields.sort()
+        for name, as_type in fields:
+            ilasm.static_field(name, as_type)
+        ilasm.end_class()
+        ilasm.pop_gen()
 
     def load_const(self, type_, value, ilasm):
         if self.is_primitive(type_):
@@ -251,6 +282,11 @@ class AbstractConst(object):
     def get_type(self):
         pass
 
+    def get_as_type(self):
+        """ ActionScript type of the static field holding the constant
+        """
+        return "*"
+
     def init(self, ilasm):
         pass
     
@@ -282,6 +318,15 @@ class InstanceConst(AbstractConst):
     def get_type(self):
         return self.cts.lltype_to_cts(self.static_type)
 
+    def get_as_type(self):
+        if not self.obj:
+            return "Object"
+        as_type = self.cts.as3_class_name(self.obj._TYPE)
+        if as_type == "Object":
+            return as_type
+        # fully qualified, the field is named after the class
+        return "py." + as_type
+
     def init(self, ilasm):
         if not self.obj:
             ilasm.load_void()
@@ -300,7 +345,7 @@ class InstanceConst(AbstractConst):
         INSTANCE = self.obj._TYPE
         #while INSTANCE:
         for i, (_type, val) in INSTANCE._allfields().items():
-            if _type is not ootype.Void:
+            if _type is not ootype.Void and self.db.is_field_used(i):
                 name = self.db.record_const(getattr(self.obj, i), _type, 'const')
                 if name is not None:
                     self.depends.add(name)
@@ -313,7 +358,7 @@ class InstanceConst(AbstractConst):
         INSTANCE = self.obj._TYPE
         #while INSTANCE:
         for i, (_type, el) in INSTANCE._allfields().items():
-            if _type is not ootype.Void:
+            if _type is not ootype.Void and self.db.is_field_used(i):
                 ilasm.load_local(const_var)
                 self.db.load_const(_type, getattr(self.obj, i), ilasm)
                 ilasm.set_field(None, "%s.%s"%(name, i))
@@ -322,6 +367,9 @@ class InstanceConst(AbstractConst):
 class RecordConst(AbstractConst):
     def get_name(self):
         return "const_tuple"
+
+    def get_as_type(self):
+        return "Object"
     
     def init(self, ilasm):
         if not self.const:
@@ -358,6 +406,9 @@ class ListConst(AbstractConst):
     
     def get_name(self):
         return "const_list"
+
+    def get_as_type(self):
+        return "Array"
     
     def init(self, ilasm):
         if not self.const:
@@ -394,6 +445,9 @@ class StringConst(AbstractConst):
     def get_name(self):
         return "const_str"
 
+    def get_as_type(self):
+        return "String"
+
     def get_key(self):
         return self.const._str
 
@@ -423,6 +477,9 @@ class ClassConst(AbstractConst):
     
     def get_name(self):
         return self.const._INSTANCE._name.replace(".", "_")
+
+    def get_as_type(self):
+        return "Class"
     
     def init(self, ilasm):
         ilasm.load_const("%s" % self.get_name())
@@ -494,7 +551,9 @@ class ExtObject(AbstractConst):
             base_url = getattr(_class, '_base_url', "") # XXX: should be
             method = getattr(_class, '_use_method', 'GET')
                 # on per-method basis
-            self.db.register_comm_proxy(self.const, self.name, use_xml, base_url, method)
+            batch = getattr(_class, '_use_batch', False)
+            self.db.register_comm_proxy(self.const, self.name, use_xml, base_url,
+                                        method, batch)
             ilasm.new(self.get_name())
         else:
             # Otherwise they just exist, or it's not implemented
@@ -11,6 +11,7 @@ from pypy.translator.oosupport.metavm import Generator,InstructionList
 from pypy.translator.oosupport import function
 
 from pypy.translator.flex.log import log
+from pypy.translator.flex.structure import Structure
 from types import FunctionType
 
 import re
@@ -133,11 +134,11 @@ class BaseGenerator(object):
         self.db.load_const(TYPE, value, self.ilasm)        
 
     def branch_unconditionally(self, target_label):
-        self.ilasm.jump_block(self.block_map[target_label])
+        self.jump_to(target_label)
 
     def branch_conditionally(self, exitcase, target_label):
         self.ilasm.branch_if(exitcase)
-        self.ilasm.jump_block(self.block_map[target_label])
+        self.jump_to(target_label)
         self.ilasm.close_branch()
 
 class Function(function.Function, BaseGenerator):
@@ -149,6 +150,97 @@ class Function(function.Function, BaseGenerator):
         self._set_locals()
         self.order = 0
         self.name = name or self.db.get_uniquename(self.graph, self.graph.name)
+        self.structure = None
+        self.current_block = None
+
+    def render(self, ilasm):
+        pruning = self.db.pruning
+        if pruning is not None and self.graph not in pruning.reachable:
+            log("rendering %s, which the pruning found unreachable" %
+                self.name)
+        function.Function.render(self, ilasm)
+
+    def find_structure(self):
+        """ The Structure of the graph, or None to render it with the
+        dispatch loop of oosupport
+        """
+        if not self.db.genoo.config.translation.flex.structured:
+            return None
+        structure = Structure(self.graph)
+        if not structure.reducible:
+            log("irreducible graph %s, using the dispatch loop" % self.name)
+            return None
+        return structure
+
+    def render_blocks(self):
+        """ Render the graph as structured code if possible, falling back
+        to the dispatch loop of oosupport for irreducible graphs
+        """
+        if self.structure is None:
+            function.Function.render_blocks(self)
+        else:
+            self.render_tree(self.graph.startblock)
+
+    def render_tree(self, block):
+        if self.structure.is_loop_header(block):
+            self.ilasm.begin_loop(self._get_block_name(block))
+            self.render_within(block, self.structure.merge_children(block))
+            self.ilasm.end_loop()
+        else:
+            self.render_within(block, self.structure.merge_children(block))
+
+    def render_within(self, block, merge_children):
+        # every merge node gets a labeled block around the code that can
+        # jump to it ('break label'), and is rendered right after it
+        if merge_children:
+            child = merge_children[0]
+            self.ilasm.begin_labeled_block(self._get_block_name(child))
+            self.render_within(block, merge_children[1:])
+            self.ilasm.end_labeled_block()
+            self.render_tree(child)
+            return
+
+        previous_block = self.current_block
+        self.current_block = block
+        if self._is_exc_handling_block(block):
+            self.render_exc_handling_block(block)
+        else:
+            self.render_normal_block(block)
+        self.current_block = previous_block
+
+    def jump_to(self, target_label):
+        if self.structure is None:
+            self.ilasm.jump_block(self.block_map[target_label])
+            return
+        target = self.label_map[target_label]
+        if self._is_return_block(target):
+            self.render_return_block(target)
+        elif self._is_raise_block(target):
+            self.render_raise_block(target)
+        elif self.structure.is_backedge(self.current_block, target):
+            self.ilasm.continue_to(target_label)
+        elif self.structure.is_merge_node(target):
+            self.ilasm.break_to(target_label)
+        else:
+            # the only way to reach target, render it in place
+            self.render_tree(target)
+
+    def render_numeric_switch(self, block):
+        default = None
+        for link in block.exits:
+            if link.exitcase == 'default':
+                default = link
+                continue
+            self.load(block.exitswitch)
+            value = self.cts.primitive_repr(block.exitswitch.concretetype,
+                                            link.llexitcase)
+            self.ilasm.branch_if_value(value)
+            self._setup_link(link)
+            self.jump_to(self._get_block_name(link.target))
+            self.ilasm.close_branch()
+        assert default is not None, 'numeric switch without default'
+        self._setup_link(default)
+        self.jump_to(self._get_block_name(default.target))
 
     def _setup_link(self, link, is_exc_link = False):
         target = link.target
@@ -164,21 +256,31 @@ class Function(function.Function, BaseGenerator):
         return self
 
     def begin_render(self):
+        self.structure = self.find_structure()
         block_map = {}
+        label_map = {}
         for blocknum, block in enumerate(self.graph.iterblocks()):
             block_map[self._get_block_name(block)] = blocknum
+            label_map[self._get_block_name(block)] = block
         self.block_map = block_map
+        self.label_map = label_map
 
         if self.is_method:
             args = self.args[1:] # self is implicit
         else:
             args = self.args
+        args = [self.cts.declaration(t, name) for t, name in args]
+        rettype = None
+        if self.db.genoo.config.translation.flex.typed:
+            rettype = self.cts.as3_type(self.graph.getreturnvar().concretetype)
         if self.is_method:
-            self.ilasm.begin_method(self.name, self._class, [i[1] for i in args])
+            self.ilasm.begin_method(self.name, self._class, args, rettype)
         else:
-            self.ilasm.begin_function(self.name, args)
-        self.ilasm.set_locals(",".join([i[1] for i in self.locals]))
-        self.ilasm.begin_for()
+            self.ilasm.begin_function(self.name, args, rettype)
+        self.ilasm.set_locals(",".join([self.cts.declaration(t, name)
+                                        for t, name in self.locals]))
+        if self.structure is None:
+            self.ilasm.begin_for()
 
     def render_return_block(self, block):
         return_var = block.inputargs[0]
@@ -190,14 +292,15 @@ class Function(function.Function, BaseGenerator):
             self.ilasm.ret()
 
     def end_render(self):
-        self.ilasm.end_for()        
+        if self.structure is None:
+            self.ilasm.end_for()        
         self.ilasm.end_function()
 
     def render_raise_block(self, block):
         self.ilasm.throw(block.inputargs[1])
 
     def end_try(self, target_label):
-        self.ilasm.jump_block(self.block_map[target_label])
+        self.jump_to(target_label)
         self.ilasm.catch()
         #self.ilasm.close_branch()
 
@@ -216,7 +319,7 @@ class Function(function.Function, BaseGenerator):
 
     def store_exception_and_link(self, link):
         self._setup_link(link, True)
-        self.ilasm.jump_block(self.block_map[self._get_block_name(link.target)])
+        self.jump_to(self._get_block_name(link.target))
 
     def after_except_block(self):
         #self.ilasm.close_branch()
@@ -24,6 +24,7 @@ from pypy.translator.flex.jts import JTS
 from pypy.translator.flex.opcodes import opcodes
 from pypy.translator.flex.function import Function
 from pypy.translator.flex.database import LowLevelDatabase
+from pypy.translator.flex.cache import GraphCache
 
 from pypy.translator.oosupport.genoo import GenOO
 
@@ -50,6 +51,24 @@ class Tee(object):
             if outfile is not sys.stdout:
                 outfile.close()
 
+class DiscardingCache(object):
+    """ Stands for the graph cache when the source is only rendered to
+    be measured: nothing is written """
+    def write(self, filename, data):
+        pass
+
+    def save(self):
+        pass
+
+def measure_source(translator, entry_point, config):
+    """ Render the source for entry_point without writing it, and return
+    the size of the py/*.as files it would have """
+    gen = JS(translator, functions=[entry_point], config=config)
+    gen.cache = DiscardingCache()
+    gen.tmpfile = udir.join(gen.assembly_name + '-measured.js')
+    gen.generate_source()
+    return gen.written_bytes
+
 class JS(GenOO):
     TypeSystem = JTS
     opcodes = opcodes
@@ -57,12 +76,17 @@ class JS(GenOO):
     Database = LowLevelDatabase
     
     def __init__(self, translator, functions=[], stackless=False, compress=False, \
-            logging=False, use_debug=False):
+            logging=False, use_debug=False, config=None, pruning=None):
         if not isinstance(functions, list):
             functions = [functions]
-        GenOO.__init__(self, udir, translator, None)
-
-        pending_graphs = [translator.annotator.bookkeeper.getdesc(f).cachedgraph(None) for f in functions ]
+        GenOO.__init__(self, udir, translator, None, config)
+        self.pruning = pruning
+        self.db.pruning = pruning
+
+        if pruning is not None:
+            pending_graphs = pruning.roots
+        else:
+            pending_graphs = [translator.annotator.bookkeeper.getdesc(f).cachedgraph(None) for f in functions ]
         for graph in pending_graphs:
             self.db.pending_function(graph)
 
@@ -70,7 +94,16 @@ class JS(GenOO):
         self.use_debug = use_debug
         self.assembly_name = self.translator.graphs[0].name        
         self.tmpfile = udir.join(self.assembly_name + '.js')
+        if self.config.translation.flex.graph_cache:
+            self.cache = GraphCache("py")
+        else:
+            self.cache = None
     
+    def gen_entrypoint(self):
+        if self.pruning is None:
+            GenOO.gen_entrypoint(self)
+        # otherwise the roots of the pruning are already pending
+
     def gen_pendings(self):
         while self.db._pending_nodes:
             node = self.db._pending_nodes.pop()
@@ -95,18 +128,20 @@ class JS(GenOO):
 
     def create_assembler(self):
         out = self.tmpfile.open('w')        
-        return AsmGen(out, self.assembly_name)
+        return AsmGen(out, self.assembly_name, self.cache)
 
     def generate_source(self):
         self.ilasm = self.create_assembler()
         self.fix_names()
         self.gen_entrypoint()
-        constants_code_generator = asmgen.CodeGenerator(open("py/_consts_0.as", "w"))
+        constants_code_generator = asmgen.CodeGenerator(StringIO())
         constants_code_generator.write("package py ")
         constants_code_generator.openblock()
         constants_code_generator.writeline("public var _consts_0 = {};")
         constants_code_generator.closeblock()
-        constants_code_generator = asmgen.CodeGenerator(open("py/__load_consts_flex.as", "w"))
+        asmgen.write_file("py/_consts_0.as",
+                          constants_code_generator._out.getvalue(), self.cache)
+        constants_code_generator = asmgen.CodeGenerator(StringIO())
         constants_code_generator.write("package py ")
         constants_code_generator.openblock()
         constants_code_generator.writeline("import flash.net.*;");
@@ -120,15 +155,18 @@ class JS(GenOO):
             self.ilasm.pop_gen()
             
             
+        self.db.gen_const_pool(self.ilasm)
         self.ilasm.push_gen( constants_code_generator )
         self.ilasm.end_consts()
         const_filename = _path_join(os.path.dirname(__file__), 'jssrc', 'library.as')
         constants_code_generator.write( open(const_filename).read() )
         constants_code_generator.closeblock()
-        self.ilasm.close()
         
         self.ilasm.pop_gen()        
         self.ilasm.close()
+        self.written_bytes = self.ilasm.written_bytes
+        asmgen.write_file("py/__load_consts_flex.as",
+                          constants_code_generator._out.getvalue(), self.cache)
         assert len(self.ilasm.right_hand) == 0
         return self.tmpfile.strpath
         
@@ -154,35 +192,21 @@ class JS(GenOO):
         self.generate_communication_proxy()
         f.write(flex%(lib, data, resources))
         f.close()
+        if self.cache is not None:
+            self.cache.save()
+        if self.pruning is not None:
+            log.prune(self.pruning.report(self.written_bytes))
 
         self.filename = self.tmpfile
         
         return self.tmpfile
 
     def copy_py_resource( self ):
-        src = _path_join(os.path.dirname(__file__), 'jssrc', 'PyResource.as')
-        data = open(src).read()        
-        dst = open("py/PyResource.as", "w")
-        dst.write( data )
-        dst.close()
-
-        src = _path_join(os.path.dirname(__file__), 'jssrc', 'load_resource.as')
-        data = open(src).read()        
-        dst = open("py/load_resource.as", "w")
-        dst.write( data )
-        dst.close()
-
-        src = _path_join(os.path.dirname(__file__), 'jssrc', 'load_sprite.as')
-        data = open(src).read()        
-        dst = open("py/load_sprite.as", "w")
-        dst.write( data )
-        dst.close()
-
-        src = _path_join(os.path.dirname(__file__), 'jssrc', 'load_sound_resource.as')
-        data = open(src).read()        
-        dst = open("py/load_sound_resource.as", "w")
-        dst.write( data )
-        dst.close()
+        for name in ['PyResource.as', 'load_resource.as', 'load_sprite.as',
+                     'load_sound_resource.as']:
+            src = _path_join(os.path.dirname(__file__), 'jssrc', name)
+            data = open(src).read()
+            asmgen.write_file("py/" + name, data, self.cache)
 
     def load_resources( self ):
         """load resoucers from data directory and create embeded flex resources"""
@@ -1,4 +1,4 @@
-import string
+import re
 import types
 
 ##    json.py implements a JSON (http://json.org) reader and writer.
@@ -19,25 +19,30 @@ import types
 ##    License along with this library; if not, write to the Free Software
 ##    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 
+##    The reader works on slices of its input with regular expressions
+##    instead of going through it one character at a time, and can read
+##    from a file-like object a block at a time (see iterparse).
 
-class _StringGenerator(object):
-        def __init__(self, string):
-                self.string = string
-                self.index = -1
-        def peek(self):
-                i = self.index + 1
-                if i < len(self.string):
-                        return self.string[i]
-                else:
-                        return None
-        def next(self):
-                self.index += 1
-                if self.index < len(self.string):
-                        return self.string[self.index]
-                else:
-                        raise StopIteration
-        def all(self):
-                return self.string
+BUFSIZE = 65536
+
+_whitespace = re.compile(r'[ \t\n\r\f\v]*')
+_number = re.compile(r'-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_string_chunk = re.compile(r'([^"\\]*)(["\\])')
+_hex4 = re.compile(r'[0-9a-fA-F]{4}')
+_line = re.compile(r'[^\r\n]*[\r\n]')
+_skipped = ' \t\n\r\f\v/'
+_literals = {'t': ('true', True), 'f': ('false', False), 'n': ('null', None)}
+
+_escape = re.compile(r'[\\"\x00-\x1f]')
+_escape_slash = re.compile(r'[\\"\x00-\x1f/]')
+_escapes = {'\\': r'\\', '"': r'\"', '\b': r'\b', '\f': r'\f',
+            '\n': r'\n', '\r': r'\r', '\t': r'\t', '/': r'\/'}
+for _i in range(0x20):
+    _escapes.setdefault(chr(_i), '\\u%04x' % _i)
+del _i
+
+def _escape_char(match):
+    return _escapes[match.group()]
 
 class WriteException(Exception):
     pass
@@ -46,260 +51,320 @@ class ReadException(Exception):
     pass
 
 class JsonReader(object):
-    hex_digits = {'A': 10,'B': 11,'C': 12,'D': 13,'E': 14,'F':15}
-    escapes = {'t':'\t','n':'\n','f':'\f','r':'\r','b':'\b'}
+    escapes = {'t':'\t','n':'\n','f':'\f','r':'\r','b':'\b',
+               '"':'"','/':'/','\\':'\\'}
+
+    def __init__(self, stream=None, bufsize=BUFSIZE):
+        self._stream = stream
+        self._bufsize = bufsize
+        self._s = ''
+        self._pos = 0
 
     def read(self, s):
-        self._generator = _StringGenerator(s)
+        self._s = s
+        self._pos = 0
+        self._stream = None
         result = self._read()
         return result
 
+    def iterparse(self, items=False):
+        """ Yield the values read from the stream one after the other.
+        With items=True the stream must hold a single array, whose
+        items are yielded instead, so that the array is never built in
+        memory.
+        """
+        if items:
+            self._eatWhitespace()
+            if not self._ensure(1) or self._s[self._pos] != '[':
+                self._error("Not a JSON array")
+            self._pos += 1
+            self._eatWhitespace()
+            if self._ensure(1) and self._s[self._pos] == ']':
+                self._pos += 1
+                return
+            while 1:
+                yield self._read()
+                self._eatWhitespace()
+                ch = self._nextchar()
+                if ch == ']':
+                    return
+                if ch != ',':
+                    self._error("Not a valid JSON array, due to: '%s'" % ch)
+        else:
+            while 1:
+                self._eatWhitespace()
+                if not self._ensure(1):
+                    return
+                yield self._read()
+
+    # buffer handling
+
+    def _more(self):
+        """ Read the next block of the stream, dropping what was already
+        consumed.  Returns False at the end of the input.
+        """
+        if self._stream is None:
+            return False
+        data = self._stream.read(self._bufsize)
+        if not data:
+            self._stream = None
+            return False
+        self._s = self._s[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def _ensure(self, n):
+        while len(self._s) - self._pos < n:
+            if not self._more():
+                return False
+        return True
+
+    def _nextchar(self):
+        """ The next character, which must be there: only called after
+        _eatWhitespace """
+        try:
+            ch = self._s[self._pos]
+        except IndexError:
+            self._error("Unexpected end of input")
+        self._pos += 1
+        return ch
+
+    def _error(self, msg):
+        start = max(self._pos - 20, 0)
+        raise ReadException, "%s at position %d: '%s'" % (
+            msg, self._pos, self._s[start:self._pos + 20])
+
+    # the reader proper
+
     def _read(self):
         self._eatWhitespace()
-        peek = self._peek()
-        if peek is None:
-            raise ReadException, "Nothing to read: '%s'" % self._generator.all()
-        if peek == '{':
-            return self._readObject()
-        elif peek == '[':
-            return self._readArray()            
-        elif peek == '"':
+        # _eatWhitespace only stops at the end of the buffer at the end
+        # of the input
+        try:
+            peek = self._s[self._pos]
+        except IndexError:
+            self._error("Nothing to read")
+        if peek == '"':
             return self._readString()
         elif peek == '-' or peek.isdigit():
             return self._readNumber()
-        elif peek == 't':
-            return self._readTrue()
-        elif peek == 'f':
-            return self._readFalse()
-        elif peek == 'n':
-            return self._readNull()
-        elif peek == '/':
-            self._readComment()
-            return self._read()
+        elif peek == '{':
+            return self._readObject()
+        elif peek == '[':
+            return self._readArray()
+        elif peek in _literals:
+            return self._readLiteral(peek)
         else:
-            raise ReadException, "Input is not valid JSON: '%s'" % self._generator.all()
+            self._error("Input is not valid JSON")
 
-    def _readTrue(self):
-        self._assertNext('t', "true")
-        self._assertNext('r', "true")
-        self._assertNext('u', "true")
-        self._assertNext('e', "true")
-        return True
-
-    def _readFalse(self):
-        self._assertNext('f', "false")
-        self._assertNext('a', "false")
-        self._assertNext('l', "false")
-        self._assertNext('s', "false")
-        self._assertNext('e', "false")
-        return False
-
-    def _readNull(self):
-        self._assertNext('n', "null")
-        self._assertNext('u', "null")
-        self._assertNext('l', "null")
-        self._assertNext('l', "null")
-        return None
-
-    def _assertNext(self, ch, target):
-        if self._next() != ch:
-            raise ReadException, "Trying to read %s: '%s'" % (target, self._generator.all())
+    def _readLiteral(self, peek):
+        word, value = _literals[peek]
+        self._ensure(len(word))
+        if not self._s.startswith(word, self._pos):
+            self._error("Trying to read %s" % word)
+        self._pos += len(word)
+        return value
 
     def _readNumber(self):
-        isfloat = False
-        result = self._next()
-        peek = self._peek()
-        while peek is not None and (peek.isdigit() or peek == "."):
-            isfloat = isfloat or peek == "."
-            result = result + self._next()
-            peek = self._peek()
-        try:
-            if isfloat:
-                return float(result)
-            else:
-                return int(result)
-        except ValueError:
-            raise ReadException, "Not a valid JSON number: '%s'" % result
+        while 1:
+            m = _number.match(self._s, self._pos)
+            if self._stream is None:
+                break
+            # a number close to the end of the buffer may go on in the
+            # next block (an exponent needs up to two more characters
+            # before it matches)
+            if m is None or len(self._s) - m.end() < 3:
+                if self._more():
+                    continue
+            break
+        if m is None:
+            self._error("Not a valid JSON number")
+        result = m.group()
+        self._pos = m.end()
+        if '.' in result or 'e' in result or 'E' in result:
+            return float(result)
+        return int(result)
 
     def _readString(self):
-        result = ""
-        assert self._next() == '"'
-        try:
-            while self._peek() != '"':
-                ch = self._next()
-                if ch == "\\":
-                    ch = self._next()
-                    if ch in 'brnft':
-                        ch = self.escapes[ch]
-                    elif ch == "u":
-                        ch4096 = self._next()
-                        ch256  = self._next()
-                        ch16   = self._next()
-                        ch1    = self._next()
-                        n = 4096 * self._hexDigitToInt(ch4096)
-                        n += 256 * self._hexDigitToInt(ch256)
-                        n += 16  * self._hexDigitToInt(ch16)
-                        n += self._hexDigitToInt(ch1)
-                        ch = unichr(n)
-                    elif ch not in '"/\\':
-                        raise ReadException, "Not a valid escaped JSON character: '%s' in %s" % (ch, self._generator.all())
-                result = result + ch
-        except StopIteration:
-            raise ReadException, "Not a valid JSON string: '%s'" % self._generator.all()
-        assert self._next() == '"'
-        return result
-
-    def _hexDigitToInt(self, ch):
-        try:
-            result = self.hex_digits[ch.upper()]
-        except KeyError:
-            try:
-                result = int(ch)
-            except ValueError:
-                 raise ReadException, "The character %s is not a hex digit." % ch
-        return result
+        self._pos += 1
+        chunks = []
+        while 1:
+            m = _string_chunk.match(self._s, self._pos)
+            if m is None:
+                # no quote nor backslash in the rest of the buffer
+                chunks.append(self._s[self._pos:])
+                self._pos = len(self._s)
+                if self._more():
+                    continue
+                self._error("Not a valid JSON string")
+            content, terminator = m.groups()
+            if content:
+                chunks.append(content)
+            self._pos = m.end()
+            if terminator == '"':
+                break
+            if not self._ensure(1):
+                self._error("Not a valid JSON string")
+            ch = self._s[self._pos]
+            if ch == 'u':
+                self._ensure(5)
+                m = _hex4.match(self._s, self._pos + 1)
+                if m is None:
+                    self._error("Not a valid \\u escape")
+                chunks.append(unichr(int(m.group(), 16)))
+                self._pos += 5
+            else:
+                try:
+                    chunks.append(self.escapes[ch])
+                except KeyError:
+                    self._error("Not a valid escaped JSON character: '%s'"
+                                % ch)
+                self._pos += 1
+        return ''.join(chunks)
 
     def _readComment(self):
-        assert self._next() == "/"
-        second = self._next()
-        if second == "/":
+        self._ensure(2)
+        second = self._s[self._pos + 1:self._pos + 2]
+        if second == '/':
             self._readDoubleSolidusComment()
         elif second == '*':
             self._readCStyleComment()
         else:
-            raise ReadException, "Not a valid JSON comment: %s" % self._generator.all()
+            self._error("Not a valid JSON comment")
 
     def _readCStyleComment(self):
-        try:
-            done = False
-            while not done:
-                ch = self._next()
-                done = (ch == "*" and self._peek() == "/")
-                if not done and ch == "/" and self._peek() == "*":
-                    raise ReadException, "Not a valid JSON comment: %s, '/*' cannot be embedded in the comment." % self._generator.all()
-            self._next()
-        except StopIteration:
-            raise ReadException, "Not a valid JSON comment: %s, expected */" % self._generator.all()
+        start = self._pos + 2
+        while 1:
+            end = self._s.find('*/', start)
+            if end >= 0:
+                break
+            if not self._more():
+                self._error("Not a valid JSON comment, expected */")
+            start = 2
+        if self._s.find('/*', self._pos + 2, end) >= 0:
+            self._error("Not a valid JSON comment, '/*' cannot be embedded "
+                        "in the comment")
+        self._pos = end + 2
 
     def _readDoubleSolidusComment(self):
-        try:
-            ch = self._next()
-            while ch != "\r" and ch != "\n":
-                ch = self._next()
-        except StopIteration:
-            pass
+        while 1:
+            m = _line.match(self._s, self._pos)
+            if m is not None:
+                self._pos = m.end()
+                return
+            if not self._more():
+                self._pos = len(self._s)
+                return
 
     def _readArray(self):
         result = []
-        assert self._next() == '['
-        done = self._peek() == ']'
-        while not done:
-            item = self._read()
-            result.append(item)
+        self._pos += 1
+        self._eatWhitespace()
+        if self._ensure(1) and self._s[self._pos] == ']':
+            self._pos += 1
+            return result
+        append = result.append
+        while 1:
+            append(self._read())
             self._eatWhitespace()
-            done = self._peek() == ']'
-            if not done:
-                ch = self._next()
-                if ch != ",":
-                    raise ReadException, "Not a valid JSON array: '%s' due to: '%s'" % (self._generator.all(), ch)
-        assert ']' == self._next()
-        return result
+            ch = self._nextchar()
+            if ch == ']':
+                return result
+            if ch != ',':
+                self._error("Not a valid JSON array, due to: '%s'" % ch)
 
     def _readObject(self):
         result = {}
-        assert self._next() == '{'
-        done = self._peek() == '}'
-        while not done:
+        self._pos += 1
+        self._eatWhitespace()
+        if self._ensure(1) and self._s[self._pos] == '}':
+            self._pos += 1
+            return result
+        while 1:
             key = self._read()
             if type(key) is not types.StringType:
-                raise ReadException, "Not a valid JSON object key (should be a string): %s" % key
-            self._eatWhitespace()
-            ch = self._next()
-            if ch != ":":
-                raise ReadException, "Not a valid JSON object: '%s' due to: '%s'" % (self._generator.all(), ch)
+                self._error("Not a valid JSON object key (should be a "
+                            "string): %s" % (key,))
             self._eatWhitespace()
-            val = self._read()
-            result[key] = val
+            ch = self._nextchar()
+            if ch != ':':
+                self._error("Not a valid JSON object, due to: '%s'" % ch)
+            result[key] = self._read()
             self._eatWhitespace()
-            done = self._peek() == '}'
-            if not done:
-                ch = self._next()
-                if ch != ",":
-                    raise ReadException, "Not a valid JSON array: '%s' due to: '%s'" % (self._generator.all(), ch)
-        assert self._next() == "}"
-        return result
+            ch = self._nextchar()
+            if ch == '}':
+                return result
+            if ch != ',':
+                self._error("Not a valid JSON object, due to: '%s'" % ch)
 
     def _eatWhitespace(self):
-        p = self._peek()
-        while p is not None and p in string.whitespace or p == '/':
-            if p == '/':
-                self._readComment()
-            else:
-                self._next()
-            p = self._peek()
-
-    def _peek(self):
-        return self._generator.peek()
-
-    def _next(self):
-        return self._generator.next()
+        try:
+            if self._s[self._pos] not in _skipped:
+                return
+        except IndexError:
+            pass
+        while 1:
+            self._pos = _whitespace.match(self._s, self._pos).end()
+            if self._pos == len(self._s):
+                if self._more():
+                    continue
+                return
+            if self._s[self._pos] != '/':
+                return
+            self._readComment()
 
 class JsonWriter(object):
-        
-    def _append(self, s):
-        self._results.append(s)
 
     def write(self, obj, escaped_forward_slash=False):
-        self._escaped_forward_slash = escaped_forward_slash
+        if escaped_forward_slash:
+            self._escape_re = _escape_slash
+        else:
+            self._escape_re = _escape
         self._results = []
         self._write(obj)
         return "".join(self._results)
 
     def _write(self, obj):
+        append = self._results.append
         ty = type(obj)
-        if ty is types.DictType:
-            n = len(obj)
-            self._append("{")
-            for k, v in obj.items():
+        if ty is types.StringType or ty is types.UnicodeType:
+            if self._escape_re.search(obj) is not None:
+                obj = self._escape_re.sub(_escape_char, obj)
+            append('"')
+            append(obj)
+            append('"')
+        elif ty is types.IntType or ty is types.LongType:
+            append(str(obj))
+        elif ty is types.DictType:
+            append("{")
+            first = True
+            for k, v in obj.iteritems():
+                if first:
+                    first = False
+                else:
+                    append(",")
                 self._write(k)
-                self._append(":")
+                append(":")
                 self._write(v)
-                n = n - 1
-                if n > 0:
-                    self._append(",")
-            self._append("}")
+            append("}")
         elif ty is types.ListType or ty is types.TupleType:
-            n = len(obj)
-            self._append("[")
+            append("[")
+            first = True
             for item in obj:
+                if first:
+                    first = False
+                else:
+                    append(",")
                 self._write(item)
-                n = n - 1
-                if n > 0:
-                    self._append(",")
-            self._append("]")
-        elif ty is types.StringType or ty is types.UnicodeType:
-            self._append('"')
-            obj = obj.replace('\\', r'\\')
-            if self._escaped_forward_slash:
-                obj = obj.replace('/', r'\/')
-            obj = obj.replace('"', r'\"')
-            obj = obj.replace('\b', r'\b')
-            obj = obj.replace('\f', r'\f')
-            obj = obj.replace('\n', r'\n')
-            obj = obj.replace('\r', r'\r')
-            obj = obj.replace('\t', r'\t')
-            self._append(obj)
-            self._append('"')
-        elif ty is types.IntType or ty is types.LongType:
-            self._append(str(obj))
+            append("]")
         elif ty is types.FloatType:
-            self._append("%f" % obj)
+            append("%f" % obj)
         elif obj is True:
-            self._append("true")
+            append("true")
         elif obj is False:
-            self._append("false")
+            append("false")
         elif obj is None:
-            self._append("null")
+            append("null")
         else:
             raise WriteException, "Cannot write in JSON: %s" % repr(obj)
 
@@ -308,3 +373,9 @@ def write(obj, escaped_forward_slash=False):
 
 def read(s):
     return JsonReader().read(s)
+
+def iterparse(stream, items=False, bufsize=BUFSIZE):
+    """ Read JSON values from a file-like object a block at a time,
+    yielding them as they are complete (see JsonReader.iterparse)
+    """
+    return JsonReader(stream, bufsize).iterparse(items)
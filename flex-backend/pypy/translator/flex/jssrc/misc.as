@@ -6,8 +6,9 @@ import mx.controls.Button;
 
 import py.*;
 import py._consts_0;
+import py.Consts;
 //import py.f.DictIter;
-
+
 
 
 // starts hand written code
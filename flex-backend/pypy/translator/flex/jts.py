@@ -37,7 +37,50 @@ class JTS(object):
         return name.replace('.', '_')
     
     def llvar_to_cts(self, var):
-        return 'var ', var.name
+        if self.db.genoo.config.translation.flex.typed:
+            return self.as3_type(var.concretetype), var.name
+        return None, var.name
+
+    def as3_type(self, t):
+        """ ActionScript 3 type to declare variables of low-level type t
+        with, or None if it is not known precisely enough
+        """
+        if t is Signed:
+            return "int"
+        elif t is Unsigned:
+            return "uint"
+        elif t is Float or t is SignedLongLong or t is UnsignedLongLong:
+            return "Number"
+        elif t is Bool:
+            return "Boolean"
+        elif t is Char or t is UniChar or t is ootype.String:
+            return "String"
+        elif isinstance(t, ootype.Instance):
+            return self.as3_class_name(t)
+        elif isinstance(t, ootype.List):
+            return "Array"
+        elif isinstance(t, (ootype.Record, ootype.Dict,
+                            ootype.DictItemsIterator)):
+            return "Object"
+        elif isinstance(t, StaticMethod):
+            return "Function"
+        return None
+
+    def as3_class_name(self, INSTANCE):
+        """ ActionScript 3 class of the instances of INSTANCE; Object for
+        the root classes and the external ones, which are not emitted
+        under their own name
+        """
+        if ('_suggested_external' in INSTANCE._hints or
+            INSTANCE._superclass is None):
+            return "Object"
+        self.db.pending_class(INSTANCE)
+        return self.escape_name(INSTANCE._name)
+
+    def declaration(self, as3_type, name):
+        if as3_type is None:
+            return name
+        return "%s:%s" % (name, as3_type)
     
     def lltype_to_cts(self, t):
         if isinstance(t, ootype.Instance):
@@ -49,7 +92,7 @@ class JTS(object):
             return "var"
         elif isinstance(t, ootype.Record):
             return "Object"
-        elif isinstance(t, ootype.String.__class__):
+        elif t is ootype.String:
             return '""'
         elif isinstance(t, ootype.Dict):
             return "Object"
@@ -101,7 +144,7 @@ class JTS(object):
                 val = 'true'
         elif _type is Void:
             val = 'undefined'
-        elif isinstance(_type,String.__class__):
+        elif _type is String:
             val = '%r'%v._str
         elif isinstance(_type,List):
             # FIXME: It's not ok to use always empty list
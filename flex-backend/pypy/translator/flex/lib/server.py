@@ -20,12 +20,14 @@ import traceback
 HTTP_STATUS_MESSAGES = {
     200: 'OK',
     204: 'No Content',
+    206: 'Partial Content',
     301: 'Moved permanently',
     302: 'Found',
     304: 'Not modified',
     401: 'Unauthorized',
     403: 'Forbidden',
     404: 'Not found',
+    416: 'Requested range not satisfiable',
     500: 'Server error',
     501: 'Not implemented',
 }
@@ -44,17 +46,23 @@ class HTTPError(Exception):
         return '<HTTPException %s "%s"%s>' % (self.status, self.message, data)
 
 from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
 
 import re
 import time
 import random
 import os
 import sys
+import socket
+import thread
+import gzip
+import mimetypes
+from StringIO import StringIO
 
 import py
 from pypy.translator.js.lib.url import parse_url
 
-from pypy.translator.js import json
+from pypy.translator.flex import json
 
 from pypy.rpython.ootypesystem.bltregistry import MethodDesc, BasicExternal,\
     described
@@ -147,8 +155,54 @@ class ExportedMethods(BasicExternal, Collection):
         return lambda **args : ('text/json', json.write(resource(**args)))
     _render_xmlhttp = True
 
+    def _batch(self, calls):
+        """ dispatch the calls coalesced by a proxy with _use_batch set
+
+            'calls' is a JSON list of [method name, arguments] pairs, the
+            arguments being a dictionary like the query of a single call;
+            one entry is returned per call, in the order of the calls:
+            {"result": <return value>} or, if the call failed,
+            {"error": <message>} - a failing call does not stop the others
+        """
+        results = []
+        for name, args in json.read(calls):
+            if name not in self._methods:
+                results.append({'error': 'no such method: %s' % (name,)})
+                continue
+            kwargs = {}
+            for key, value in args.iteritems():
+                kwargs[str(key)] = value
+            try:
+                result = getattr(self, name)(**kwargs)
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except Exception, e:
+                results.append({'error': '%s: %s' % (e.__class__.__name__,
+                                                     e)})
+            else:
+                results.append({'result': result})
+        return results
+
 exported_methods = ExportedMethods()
 
+def read_form_body(handler):
+    """ return the arguments sent form-encoded in the body of a POST
+    """
+    if handler.command != 'POST':
+        return {}
+    length = int(handler.headers.get('content-length', 0))
+    if not length:
+        return {}
+    # always consume the body, the next request of a persistent
+    # connection follows it
+    body = handler.rfile.read(length)
+    content_type = handler.headers.get('content-type', '')
+    if (content_type and not
+            content_type.startswith('application/x-www-form-urlencoded')):
+        return {}
+    _, args = parse_url('?' + body)
+    return args
+
 def patch_handler(handler_class):
     """ This function takes care of adding necessary
     attributed to Static objects
@@ -164,6 +218,7 @@ class TestHandler(BaseHTTPRequestHandler):
     
     def do_GET(self):
         path, args = parse_url(self.path)
+        args.update(read_form_body(self))
         if not path:
             path = ["index"]
         name_path = path[0].replace(".", "_")
@@ -223,18 +278,207 @@ class Static(object):
     def __call__(self):
         return open(str(self.path)).read()
 
+mimetypes.add_type('application/x-shockwave-flash', '.swf')
+
+GZIP_TYPES = ['text/', 'application/javascript', 'application/x-javascript',
+              'application/json', 'application/xml', 'image/svg+xml']
+
+class CachedFile(object):
+    """ content of a file, as held by FileCache """
+    def __init__(self, data, mtime, size):
+        self.data = data
+        self.mtime = mtime
+        self.size = size
+        self.gzipped = None
+        self.last_used = 0
+
+    def gzip(self):
+        """ the content compressed with gzip, computed once """
+        if self.gzipped is None:
+            out = StringIO()
+            f = gzip.GzipFile(fileobj=out, mode='wb')
+            f.write(self.data)
+            f.close()
+            self.gzipped = out.getvalue()
+        return self.gzipped
+
+class FileCache(object):
+    """ LRU cache of file contents, validated by the mtime and size of the
+    files; files bigger than maxfilesize are never cached (they are sent
+    straight from the disk)
+    """
+    def __init__(self, maxbytes=32*1024*1024, maxfilesize=1024*1024):
+        self.maxbytes = maxbytes
+        self.maxfilesize = maxfilesize
+        self.files = {}
+        self.bytes = 0
+        self.clock = 0
+        self.lock = thread.allocate_lock()
+
+    def get(self, path, mtime, size):
+        if size > self.maxfilesize:
+            return None
+        self.lock.acquire()
+        try:
+            entry = self.files.get(path)
+            if entry is None or entry.mtime != mtime or entry.size != size:
+                if entry is not None:
+                    self._remove(path)
+                f = open(path, 'rb')
+                try:
+                    data = f.read()
+                finally:
+                    f.close()
+                entry = CachedFile(data, mtime, size)
+                self.files[path] = entry
+                self.bytes += size
+            self.clock += 1
+            entry.last_used = self.clock
+            self._evict()
+            return entry
+        finally:
+            self.lock.release()
+
+    def _remove(self, path):
+        entry = self.files.pop(path)
+        self.bytes -= entry.size
+
+    def _evict(self):
+        while self.bytes > self.maxbytes and len(self.files) > 1:
+            oldest = None
+            for path, entry in self.files.iteritems():
+                if oldest is None or entry.last_used < oldest[1].last_used:
+                    oldest = (path, entry)
+            self._remove(oldest[0])
+
+file_cache = FileCache()
+
+class OpenFile(object):
+    """ body of a response sent straight from the disk: length bytes of
+    the file, from offset on
+    """
+    def __init__(self, path, offset, length):
+        self.file = open(path, 'rb')
+        self.file.seek(offset)
+        self.offset = offset
+        self.length = length
+        self.left = length
+
+    def read(self, size):
+        data = self.file.read(min(size, self.left))
+        self.left -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+def http_date(t):
+    return time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(t))
+
+# returned by parse_range for a range starting after the end of the file
+UNSATISFIABLE = 'unsatisfiable'
+
+def parse_range(value, size):
+    """ parse a 'bytes=start-end' Range header, returning (start, end)
+    with end excluded, UNSATISFIABLE if the range lies past the end of
+    the file, or None if it is not a single valid range (and should be
+    ignored)
+    """
+    if not value.startswith('bytes=') or ',' in value:
+        return None
+    start, end = value[len('bytes='):].split('-', 1)
+    try:
+        if not start:
+            # the last 'end' bytes
+            length = int(end)
+            if length <= 0:
+                return UNSATISFIABLE
+            start = max(size - length, 0)
+            end = size
+        else:
+            start = int(start)
+            if end:
+                last = int(end)
+                if last < start:
+                    return None
+                end = min(last + 1, size)
+            else:
+                end = size
+    except ValueError:
+        return None
+    if start >= size:
+        return UNSATISFIABLE
+    return start, end
+
+def serve_file(handler, path, content_type, cache=file_cache):
+    """ answer a request for a static file, returning (status, headers,
+    body): handles If-None-Match, single byte ranges and gzip encoding
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        raise HTTPError(404)
+    # the full mtime: a file rewritten within the same second with the
+    # same size must get a new ETag
+    mtime, size = st.st_mtime, st.st_size
+    etag = '"%x-%x"' % (int(mtime * 1000000), size)
+    # the gzipped body is a different representation, with its own ETag
+    gzip_etag = etag[:-1] + '-gzip"'
+    headers = {'Content-Type': content_type, 'ETag': etag,
+               'Last-Modified': http_date(mtime), 'Accept-Ranges': 'bytes',
+               # the browser may keep the file, but has to check
+               # whether it changed (which costs a 304)
+               'Cache-Control': 'no-cache'}
+    compressible = False
+    for prefix in GZIP_TYPES:
+        if content_type.startswith(prefix):
+            compressible = True
+            headers['Vary'] = 'Accept-Encoding'
+            break
+    accepts_gzip = 'gzip' in handler.headers.get('accept-encoding', '')
+    tags = [tag.strip() for tag in
+            handler.headers.get('if-none-match', '').split(',')]
+    if etag in tags:
+        return 304, headers, ''
+    if compressible and gzip_etag in tags:
+        headers['ETag'] = gzip_etag
+        return 304, headers, ''
+
+    byte_range = parse_range(handler.headers.get('range', ''), size)
+    if byte_range == UNSATISFIABLE:
+        headers['Content-Range'] = 'bytes */%d' % size
+        headers['Content-Length'] = 0
+        return 416, headers, ''
+    entry = cache.get(path, mtime, size)
+    if byte_range is not None:
+        start, end = byte_range
+        headers['Content-Range'] = 'bytes %d-%d/%d' % (start, end - 1, size)
+        headers['Content-Length'] = end - start
+        if entry is not None:
+            return 206, headers, entry.data[start:end]
+        return 206, headers, OpenFile(path, start, end - start)
+    if entry is None:
+        headers['Content-Length'] = size
+        return 200, headers, OpenFile(path, 0, size)
+    if compressible and accepts_gzip:
+        headers['Content-Encoding'] = 'gzip'
+        headers['ETag'] = gzip_etag
+        return 200, headers, entry.gzip()
+    return 200, headers, entry.data
+
 class FsFile(object):
     exposed = True
-    debug = False
+    wants_handler = True # see NewHandler.do_GET
+
     def __init__(self, path, content_type="text/html"):
         self._path = path
         self._content_type = content_type
 
-    _data = None
-    def __call__(self):
-        if self._data is None or self.debug:
-            self._data = self._path.read()
-        return ({'Content-Type': self._content_type}, self._data)
+    def __call__(self, handler=None):
+        if handler is None:
+            # called without any request, as by TestHandler
+            return ({'Content-Type': self._content_type}, self._path.read())
+        return serve_file(handler, str(self._path), self._content_type)
 
 class StaticDir(Collection):
     exposed = True
@@ -244,20 +488,62 @@ class StaticDir(Collection):
         self.type = type
 
     def traverse(self, path, orgpath):
-        data = open(os.path.join(str(self.path), *path)).read()
-        if self.type:
-            return lambda : (self.type, data)
-        return lambda : data
+        for name in path:
+            if name in ('', '.', '..') or os.sep in name:
+                raise HTTPError(404)
+        filename = os.path.join(str(self.path), *path)
+        content_type = self.type
+        if content_type is None:
+            content_type = mimetypes.guess_type(filename)[0] or 'text/html'
+        return FsFile(py.path.local(filename), content_type)
+
+class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+    """ HTTPServer handling every connection in its own thread, so that
+    a slow exported method does not block the other clients
+    """
+    daemon_threads = True
+    request_queue_size = 64 # the default of 5 makes bursts of clients
+                            # wait for SYN retransmissions
+
+def keep_alive_handler(handler):
+    """ Return a subclass of handler speaking HTTP/1.1, which keeps the
+    connection open between requests as long as the length of the
+    answers is known
+    """
+    class KeepAliveHandler(handler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            handler.setup(self)
+            # headers and body are written separately, on a persistent
+            # connection Nagle's algorithm would delay every answer
+            self.connection.setsockopt(socket.IPPROTO_TCP,
+                                       socket.TCP_NODELAY, 1)
+
+        def send_error(self, code, message=None):
+            # the error page is sent without a Content-Length
+            self.close_connection = 1
+            handler.send_error(self, code, message)
+    KeepAliveHandler.__name__ = handler.__name__
+    return KeepAliveHandler
 
 def create_server(server_address = ('', 8000), handler=TestHandler,
-                 server=HTTPServer):
+                 server=HTTPServer, threaded=False, keep_alive=False):
     """ Parameters:
     spawn - create new thread and return (by default it doesn't return)
     fork - do a real fork
     timeout - kill process after X seconds (actually doesn't work for threads)
     port_file - function to be called with port number
+    threaded - serve every connection in a new thread
+    keep_alive - use HTTP/1.1 persistent connections (makes most sense
+                 together with threaded, a single-threaded server serves
+                 one connection at a time)
     """
     patch_handler(handler)
+    if threaded and server is HTTPServer:
+        server = ThreadedHTTPServer
+    if keep_alive:
+        handler = keep_alive_handler(handler)
     httpd = server(server_address, handler)
     httpd.last_activity = time.time()
     print "Server started, listening on %s:%s" %\
@@ -300,15 +586,23 @@ class NewHandler(BaseHTTPRequestHandler):
         """ perform a request """
         path, query = self.process_path(self.path)
         _, args = parse_url("?" + query)
+        args.update(read_form_body(self))
         try:
             resource = self.find_resource(path)
             # XXX strange hack
             if hasattr(resource, 'im_self'):
                 resource.im_self.server = self.server
-            retval = resource(**args)
+            if getattr(resource, 'wants_handler', False):
+                # resources like FsFile look at the request headers
+                retval = resource(handler=self, **args)
+            else:
+                retval = resource(**args)
+            status = 200
             if isinstance(retval, str):
                 headers = {'Content-Type': 'text/html'}
                 data = retval
+            elif len(retval) == 3:
+                status, headers, data = retval
             else:
                 headers, data = retval
                 if isinstance(headers, str):
@@ -326,7 +620,6 @@ class NewHandler(BaseHTTPRequestHandler):
             if hasattr(self.application, 'handle_error'):
                 self.application.handle_error(exc, e, tb)
         else:
-            status = 200
             if not 'content-type' in [k.lower() for k in headers]:
                 headers['Content-Type'] = 'text/html; charset=UTF-8'
         self.response(status, headers, data, send_body)
@@ -379,13 +672,24 @@ class NewHandler(BaseHTTPRequestHandler):
         if (isinstance(body, str) and
                 not 'content-length' in [k.lower() for k in headers]):
             headers['Content-Length'] = len(body)
+        if not 'content-length' in [k.lower() for k in headers]:
+            # the end of the body is the end of the connection
+            headers['Connection'] = 'close'
+            self.close_connection = 1
         for keyword, value in headers.iteritems():
             self.send_header(keyword, value)
         self.end_headers()
         if not send_body:
+            if isinstance(body, OpenFile):
+                body.close()
             return
         if isinstance(body, str):
             self.wfile.write(body)
+        elif isinstance(body, OpenFile):
+            try:
+                self.send_open_file(body)
+            finally:
+                body.close()
         elif hasattr(body, 'read'):
             while 1:
                 data = body.read(self.bufsize)
@@ -394,3 +698,12 @@ class NewHandler(BaseHTTPRequestHandler):
                 self.wfile.write(data)
         else:
             raise ValueError('body is not a plain string or file-like object')
+
+    def send_open_file(self, body):
+        """ send a file from the disk, in chunks
+        """
+        while 1:
+            data = body.read(65536)
+            if not data:
+                break
+            self.wfile.write(data)
@@ -0,0 +1,103 @@
+""" Batched remote calls
+"""
+
+import py
+import threading
+import urllib
+from StringIO import StringIO
+from pypy.translator.flex.lib import server
+from pypy.translator.flex import json
+from pypy.translator.flex.commproxy import XmlHttp
+from pypy.rpython.ootypesystem.bltregistry import described
+
+class Methods(server.ExportedMethods):
+    _use_batch = True
+
+    @described(retval={str: str})
+    def greet(self, name="x"):
+        return {'greeting': 'hello ' + name}
+
+    @described(retval=[int])
+    def count(self, n="0"):
+        return range(int(n))
+
+    @described(retval=int)
+    def fail(self):
+        raise ValueError("broken")
+
+methods = Methods()
+
+class Root(server.Collection):
+    exported_methods = methods
+
+def test_dispatch_batch():
+    calls = json.write([['greet', {'name': 'a'}], ['count', {'n': '3'}],
+                        ['greet', {'name': 'b'}]])
+    assert methods._batch(calls) == [{'result': {'greeting': 'hello a'}},
+                                     {'result': [0, 1, 2]},
+                                     {'result': {'greeting': 'hello b'}}]
+
+def test_dispatch_batch_errors():
+    calls = json.write([['fail', {}], ['_batch', {'calls': '[]'}],
+                        ['count', {'n': 'x'}], ['count', {'n': '1'}]])
+    results = methods._batch(calls)
+    assert len(results) == 4
+    assert results[0] == {'error': 'ValueError: broken'}
+    assert results[1] == {'error': 'no such method: _batch'}
+    assert results[2]['error'].startswith('ValueError: ')
+    assert results[3] == {'result': [0]}
+
+class TestBatchOverHTTP(object):
+    def setup_class(cls):
+        class Handler(server.NewHandler):
+            application = Root()
+        cls.httpd = server.HTTPServer(('127.0.0.1', 0), Handler)
+        cls.thread = threading.Thread(target=cls.httpd.serve_forever)
+        cls.thread.start()
+
+    def teardown_class(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+        cls.thread.join()
+
+    def test_batch(self):
+        url = ("http://127.0.0.1:%d/exported_methods/_batch" %
+               self.httpd.server_port)
+        calls = json.write([['greet', {'name': 'a+b'}], ['fail', {}],
+                            ['count', {'n': '2'}]])
+        body = urllib.urlencode({'calls': calls})
+        answer = urllib.urlopen(url, body).read()
+        assert json.read(answer) == [{'result': {'greeting': 'hello a+b'}},
+                                     {'error': 'ValueError: broken'},
+                                     {'result': [0, 1]}]
+
+class FakeConst(object):
+    class _TYPE:
+        _class_ = Methods
+
+class FakeGenerator(object):
+    def __init__(self):
+        self.codegenerator = StringIO()
+
+    def begin_function(self, name, arglist):
+        self.codegenerator.write("function %s () {\n" % (name,))
+
+    def end_function(self):
+        self.codegenerator.write("}\n")
+
+def test_render_batch_method():
+    proxy = XmlHttp(FakeConst(), 'Methods', batch=True)
+    ilasm = FakeGenerator()
+    proxy.render_method('greet', Methods._methods['greet'], ilasm)
+    source = ilasm.codegenerator.getvalue()
+    assert "Methods_batch_call('greet'" in source
+    assert "XMLHttpRequest" not in source
+
+def test_render_batch_errors():
+    proxy = XmlHttp(FakeConst(), 'Methods', batch=True)
+    ilasm = FakeGenerator()
+    proxy.render(ilasm)
+    source = ilasm.codegenerator.getvalue()
+    assert "var Methods_batch_onerror = function" in source
+    assert "Methods_batch_onerror(errors[i][0], errors[i][1]);" in source
+    assert "calls[i][2](results[i].result);" in source
@@ -0,0 +1,156 @@
+""" Static files: caching, conditional requests, ranges and gzip
+"""
+
+import os
+import py
+import gzip
+import threading
+import urllib2
+from StringIO import StringIO
+from pypy.translator.flex.lib import server
+
+class FakeHandler(object):
+    def __init__(self, **headers):
+        self.headers = {}
+        for key, value in headers.iteritems():
+            self.headers[key.replace('_', '-')] = value
+
+def make_file(name, data):
+    tmpdir = py.test.ensuretemp("server_static_files")
+    f = tmpdir.join(name)
+    f.write(data)
+    return f
+
+def test_serve_file_etag():
+    f = make_file("a.txt", "hello world")
+    cache = server.FileCache()
+    status, headers, body = server.serve_file(FakeHandler(), str(f),
+                                              'text/plain', cache)
+    assert status == 200
+    assert body == "hello world"
+    etag = headers['ETag']
+    status, headers, body = server.serve_file(
+        FakeHandler(if_none_match=etag), str(f), 'text/plain', cache)
+    assert status == 304
+    assert body == ''
+
+def test_serve_file_etag_subsecond():
+    f = make_file("a2.txt", "hello world")
+    st = f.stat()
+    status, headers, body = server.serve_file(FakeHandler(), str(f),
+                                              'text/plain')
+    etag = headers['ETag']
+    # rewritten within the same second, with the same size
+    f.write("HELLO WORLD")
+    os.utime(str(f), (st.atime, int(st.mtime) + 0.5))
+    status, headers, body = server.serve_file(
+        FakeHandler(if_none_match=etag), str(f), 'text/plain')
+    assert status == 200
+    assert headers['ETag'] != etag
+    assert body == "HELLO WORLD"
+
+def test_serve_file_range():
+    f = make_file("b.txt", "0123456789")
+    cache = server.FileCache()
+    status, headers, body = server.serve_file(FakeHandler(range='bytes=2-4'),
+                                              str(f), 'text/plain', cache)
+    assert status == 206
+    assert body == '234'
+    assert headers['Content-Range'] == 'bytes 2-4/10'
+    status, headers, body = server.serve_file(FakeHandler(range='bytes=-3'),
+                                              str(f), 'text/plain', cache)
+    assert body == '789'
+    status, headers, body = server.serve_file(FakeHandler(range='bytes=4-2'),
+                                              str(f), 'text/plain', cache)
+    assert status == 200
+    assert body == '0123456789'
+    for value in ['bytes=20-', 'bytes=10-12', 'bytes=-0']:
+        status, headers, body = server.serve_file(FakeHandler(range=value),
+                                                  str(f), 'text/plain', cache)
+        assert status == 416
+        assert headers['Content-Range'] == 'bytes */10'
+        assert body == ''
+
+def test_serve_file_gzip():
+    data = "compress me " * 100
+    f = make_file("c.js", data)
+    cache = server.FileCache()
+    status, headers, body = server.serve_file(
+        FakeHandler(accept_encoding='gzip, deflate'), str(f),
+        'application/x-javascript', cache)
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert gzip.GzipFile(fileobj=StringIO(body)).read() == data
+    gzip_etag = headers['ETag']
+    status, headers, body = server.serve_file(FakeHandler(), str(f),
+                                              'application/x-javascript', cache)
+    assert 'Content-Encoding' not in headers
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert headers['ETag'] != gzip_etag
+    assert body == data
+    status, headers, body = server.serve_file(
+        FakeHandler(accept_encoding='gzip', if_none_match=gzip_etag), str(f),
+        'application/x-javascript', cache)
+    assert status == 304
+    assert headers['ETag'] == gzip_etag
+    status, headers, body = server.serve_file(
+        FakeHandler(accept_encoding='gzip'), str(f),
+        'application/x-shockwave-flash', cache)
+    assert 'Content-Encoding' not in headers
+    assert 'Vary' not in headers
+
+def test_big_files_are_not_cached():
+    f = make_file("big.swf", "x" * 5000)
+    cache = server.FileCache(maxfilesize=1000)
+    status, headers, body = server.serve_file(FakeHandler(), str(f),
+                                              'application/x-shockwave-flash',
+                                              cache)
+    assert isinstance(body, server.OpenFile)
+    assert body.read(10000) == "x" * 5000
+    body.close()
+    assert not cache.files
+
+def test_cache_eviction_and_reload():
+    cache = server.FileCache(maxbytes=25)
+    files = [make_file("f%d" % i, str(i) * 10) for i in range(3)]
+    for f in files:
+        st = f.stat()
+        cache.get(str(f), st.mtime, st.size)
+    assert str(files[0]) not in cache.files
+    assert cache.bytes <= 25
+    f = files[2]
+    f.write("changed")
+    st = f.stat()
+    assert cache.get(str(f), st.mtime, st.size).data == "changed"
+
+def test_static_dir_over_http():
+    tmpdir = py.test.ensuretemp("server_static_dir_http")
+    tmpdir.join("app.swf").write("SWF" * 100)
+
+    class Root(server.Collection):
+        static = server.StaticDir(tmpdir)
+
+    class Handler(server.NewHandler):
+        application = Root()
+
+    httpd = server.HTTPServer(('127.0.0.1', 0), Handler)
+    serving = threading.Thread(target=httpd.serve_forever)
+    serving.start()
+    try:
+        url = "http://127.0.0.1:%d/static/app.swf" % httpd.server_port
+        response = urllib2.urlopen(url)
+        assert response.read() == "SWF" * 100
+        assert (response.info()['Content-Type'] ==
+                'application/x-shockwave-flash')
+        request = urllib2.Request(url, headers={'Range': 'bytes=0-2'})
+        assert urllib2.urlopen(request).read() == "SWF"
+        request = urllib2.Request(url, headers={'Range': 'bytes=300-'})
+        excinfo = py.test.raises(urllib2.HTTPError, urllib2.urlopen, request)
+        assert excinfo.value.code == 416
+        py.test.raises(urllib2.HTTPError, urllib2.urlopen,
+                       "http://127.0.0.1:%d/static/../app.swf" %
+                       httpd.server_port)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        serving.join()
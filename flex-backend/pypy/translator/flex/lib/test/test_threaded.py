@@ -0,0 +1,57 @@
+""" Threaded server with persistent connections
+"""
+
+import time
+import thread
+import httplib
+from pypy.translator.flex.lib import server
+from pypy.rpython.ootypesystem.bltregistry import described
+
+class Methods(server.ExportedMethods):
+    @described(retval=int)
+    def slow(self):
+        time.sleep(1)
+        return 1
+
+    @described(retval=int)
+    def fast(self):
+        return 2
+
+class Root(server.Collection):
+    exported_methods = Methods()
+
+class Handler(server.NewHandler):
+    application = Root()
+
+def start(**kwds):
+    httpd = server.create_server(('127.0.0.1', 0), Handler, **kwds)
+    thread.start_new_thread(httpd.serve_forever, ())
+    return httpd.server_port
+
+def get(conn, path):
+    conn.request('GET', path)
+    response = conn.getresponse()
+    return response, response.read()
+
+def test_slow_call_does_not_block():
+    port = start(threaded=True)
+    thread.start_new_thread(get, (httplib.HTTPConnection('127.0.0.1', port),
+                                  '/exported_methods/slow'))
+    time.sleep(0.1)
+    start_time = time.time()
+    response, data = get(httplib.HTTPConnection('127.0.0.1', port),
+                         '/exported_methods/fast')
+    assert data == '2'
+    assert time.time() - start_time < 0.5
+
+def test_keep_alive():
+    port = start(threaded=True, keep_alive=True)
+    conn = httplib.HTTPConnection('127.0.0.1', port)
+    for i in range(3):
+        response, data = get(conn, '/exported_methods/fast')
+        assert data == '2'
+        assert response.version == 11
+        assert response.getheader('connection') != 'close'
+    response, data = get(conn, '/nonexistent')
+    assert response.status == 404
+    conn.close()
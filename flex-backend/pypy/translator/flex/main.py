@@ -26,6 +26,10 @@ js_optiondescr = OptionDescription("jscompile", "", [
                default=False, cmdline="--view"),
     BoolOption("use_pdb", "Use debugger",
                default=False, cmdline="--pdb"),
+    BoolOption("typed", "Emit typed ActionScript 3 declarations",
+               default=False, cmdline="--typed"),
+    BoolOption("swf", "Also compile the SWF with compc and mxmlc",
+               default=False, cmdline="--swf"),
     StrOption("output", "File to save results (default output.mxml)",
               default="output.mxml", cmdline="--output")])
 
@@ -91,6 +95,8 @@ from pypy.rlib.nonconst import NonConstant as NonConst
 def some_strange_function_which_will_never_be_called():
     
 %(functions)s
+
+some_strange_function_which_will_never_be_called.flex_entry_wrapper = True
 """
 
 wrapped_function_def_base = """
@@ -155,11 +161,13 @@ def rpython2javascript(mod, function_names, jsconfig=None, use_pdb=False):
             raise BadSignature("Function %s does not have default arguments" % func_name)
     source_ssf = get_source_ssf(mod, module_name, function_names)
     exec(source_ssf) in globals()
-    # now we gonna just cut off not needed function
-    # XXX: Really do that
+    # the wrapper is only there for the annotator, the prune_flex task
+    # cuts it off together with everything the functions don't need
     #options = optparse.Values(defaults=DEFAULT_OPTIONS)
     from pypy.config.pypyoption import get_pypy_config
     config = get_pypy_config(translating=True)
+    config.translation.flex.typed = jsconfig.typed
+    config.translation.flex.swf = jsconfig.swf
     driver = TranslationDriver(config=config)
     try:
         driver.setup(some_strange_function_which_will_never_be_called, [], policy = JsPolicy())
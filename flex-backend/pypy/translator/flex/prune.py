@@ -0,0 +1,269 @@
+""" reachability based pruning for the flex backend
+
+Functions are rendered lazily by following calls, but classes are
+rendered with all their methods, and prebuilt instances and class
+constructors with all their fields, which drags in a lot of code and
+constants that no client code can reach.  Pruning walks the graphs from
+the entry points, following calls, method names sent, fields read or
+written and prebuilt constants, and records what is really used; the
+database then leaves the rest out of the generated source.  Instances
+passed to functions or methods without a graph (external code, which
+can look at any of their fields) keep all the fields of their classes.
+"""
+
+from types import FunctionType
+
+from pypy.objspace.flow.model import Constant
+from pypy.rpython.ootypesystem import ootype
+from pypy.rpython.ootypesystem.bltregistry import ExternalType
+from pypy.translator.flex.log import log
+
+log = log.prune
+
+class Pruning(object):
+    def __init__(self, translator, roots):
+        self.translator = translator
+        self.roots = roots
+        self.reachable = {}       # graph -> True
+        self.used_methods = {}    # method name -> True
+        self.used_fields = {}     # field name -> True
+        self.instances = {}       # INSTANCE -> True
+        self.instance_consts = [] # prebuilt _instances seen so far
+        self.seen_consts = {}
+        self.opaque_types = {}    # INSTANCE -> True, see use_all_fields()
+        self.pending = []
+        self.graphs_by_func = {}  # function -> the graphs built for it
+        # the size of the py/*.as files without pruning, when it was
+        # measured (see js.measure_source())
+        self.unpruned_bytes = None
+        for graph in translator.graphs:
+            func = getattr(graph, 'func', None)
+            if func is not None:
+                self.graphs_by_func.setdefault(func, []).append(graph)
+        for graph in roots:
+            self.add_graph(graph)
+        self.propagate()
+
+    def add_graph(self, graph):
+        if graph not in self.reachable:
+            self.reachable[graph] = True
+            self.pending.append(graph)
+
+    def add_instance(self, INSTANCE):
+        while INSTANCE is not None and INSTANCE not in self.instances:
+            self.instances[INSTANCE] = True
+            for name, meth in INSTANCE._methods.iteritems():
+                if name in self.used_methods:
+                    self.add_method(meth)
+            INSTANCE = INSTANCE._superclass
+
+    def add_method(self, meth):
+        graph = getattr(meth, 'graph', None)
+        if graph is not None:
+            self.add_graph(graph)
+
+    def use_method(self, name):
+        if name in self.used_methods:
+            return
+        self.used_methods[name] = True
+        for INSTANCE in self.instances:
+            meth = INSTANCE._methods.get(name)
+            if meth is not None:
+                self.add_method(meth)
+
+    def use_field(self, name):
+        if name in self.used_fields:
+            return
+        self.used_fields[name] = True
+        for inst in self.instance_consts:
+            if name in inst._TYPE._allfields():
+                self.add_const(getattr(inst, name))
+
+    def use_all_fields(self, TYPE):
+        """ Instances of TYPE are seen by code without a graph: keep all
+        the fields of TYPE and of its subclasses
+        """
+        if not isinstance(TYPE, ootype.Instance) or TYPE in self.opaque_types:
+            return
+        self.opaque_types[TYPE] = True
+        for name in TYPE._allfields():
+            self.use_field(name)
+        for SUBTYPE in TYPE._subclasses:
+            self.use_all_fields(SUBTYPE)
+
+    def add_type(self, TYPE):
+        if isinstance(TYPE, ootype.Instance):
+            self.add_instance(TYPE)
+
+    def add_const(self, value):
+        if isinstance(value, ootype._view):
+            value = value._inst
+        if isinstance(value, FunctionType):
+            # Void constants of functions passed around as callbacks,
+            # see BaseGenerator.load_special; only look at the graphs
+            # that were already built, the analysis must not build any
+            for graph in self.graphs_by_func.get(value, []):
+                self.add_graph(graph)
+            return
+        if not isinstance(value, (ootype._static_meth, ootype._instance,
+                                  ootype._list, ootype._dict,
+                                  ootype._record, ootype._class)):
+            return
+        try:
+            if id(value) in self.seen_consts:
+                return
+        except TypeError:
+            return
+        self.seen_consts[id(value)] = value
+
+        if isinstance(value, ootype._static_meth):
+            graph = getattr(value, 'graph', None)
+            if graph is not None:
+                self.add_graph(graph)
+        elif isinstance(value, ootype._instance):
+            if not value:
+                return
+            self.add_instance(value._TYPE)
+            self.instance_consts.append(value)
+            for name in value._TYPE._allfields():
+                if name in self.used_fields:
+                    self.add_const(getattr(value, name))
+        elif isinstance(value, ootype._list):
+            for item in value._list:
+                self.add_const(item)
+        elif isinstance(value, ootype._dict):
+            for key, item in value._dict.iteritems():
+                self.add_const(key)
+                self.add_const(item)
+        elif isinstance(value, ootype._record):
+            for item in value._items.itervalues():
+                self.add_const(item)
+        elif isinstance(value, ootype._class):
+            if value._INSTANCE is not None:
+                self.add_instance(value._INSTANCE)
+
+    def add_arg(self, v):
+        self.add_type(getattr(v, 'concretetype', None))
+        if isinstance(v, Constant):
+            self.add_const(v.value)
+
+    def propagate(self):
+        while self.pending:
+            graph = self.pending.pop()
+            for block in graph.iterblocks():
+                for v in block.inputargs:
+                    self.add_arg(v)
+                for op in block.operations:
+                    if op.opname == 'oosend':
+                        self.use_method(op.args[0].value)
+                        if self.is_opaque_send(op):
+                            self.use_args_fields(op.args[1:])
+                    elif op.opname in ('oogetfield', 'oosetfield'):
+                        self.use_field(op.args[1].value)
+                    elif op.opname == 'direct_call':
+                        if getattr(op.args[0].value, 'graph', None) is None:
+                            self.use_args_fields(op.args[1:])
+                    elif op.opname == 'new':
+                        self.add_type(op.args[0].value)
+                    for v in op.args:
+                        self.add_arg(v)
+                    self.add_arg(op.result)
+                for link in block.exits:
+                    for v in link.args:
+                        if v is not None:
+                            self.add_arg(v)
+
+    def is_opaque_send(self, op):
+        """ Is the method called by the oosend op implemented by code
+        without a graph?
+        """
+        TYPE = op.args[1].concretetype
+        if isinstance(TYPE, ExternalType):
+            return True
+        if not isinstance(TYPE, ootype.Instance):
+            return False
+        _, meth = TYPE._lookup(op.args[0].value)
+        if meth is None:
+            return True
+        # the implementations of abstract methods are found by use_method
+        return (getattr(meth, 'graph', None) is None and
+                not getattr(meth, 'abstract', False))
+
+    def use_args_fields(self, args):
+        for v in args:
+            self.use_all_fields(getattr(v, 'concretetype', None))
+
+    def is_method_used(self, name, graph):
+        if name not in self.used_methods:
+            return False
+        return graph is None or graph in self.reachable
+
+    def is_field_used(self, name):
+        return name in self.used_fields
+
+    def estimated_savings(self, written_bytes):
+        """ Estimate the size of the source that the dropped graphs
+        would have produced, from the size of what was written for the
+        kept ones; this is only an extrapolation by operation count
+        """
+        if not self.kept_operations:
+            return 0
+        return written_bytes * self.removed_operations // self.kept_operations
+
+    def report(self, written_bytes):
+        """ A line telling what pruning saved, given the size of the
+        py/*.as files written with it """
+        if self.unpruned_bytes is not None:
+            return ("dropped %d graphs, %d of %d bytes of py/*.as saved" %
+                    (self.removed_graphs, self.unpruned_bytes - written_bytes,
+                     self.unpruned_bytes))
+        return ("dropped %d graphs, estimated %d bytes of py/*.as saved "
+                "(extrapolated from the kept graphs, use "
+                "--flex-prune-measure to measure it)" %
+                (self.removed_graphs, self.estimated_savings(written_bytes)))
+
+    def count_operations(self, graphs):
+        count = 0
+        for graph in graphs:
+            for block in graph.iterblocks():
+                count += len(block.operations)
+        return count
+
+def entry_roots(translator, entry_graph):
+    """ The graphs to start from.  The wrapper that rpython2javascript
+    builds around the client functions is only there for the annotator
+    and is never called, so it is replaced by the functions it calls.
+    """
+    func = getattr(entry_graph, 'func', None)
+    if not getattr(func, 'flex_entry_wrapper', False):
+        return [entry_graph]
+    roots = []
+    for block in entry_graph.iterblocks():
+        for op in block.operations:
+            if op.opname == 'direct_call':
+                graph = getattr(op.args[0].value, 'graph', None)
+                if graph is not None and graph not in roots:
+                    roots.append(graph)
+    return roots
+
+def prune(translator, entry_graph):
+    """ Compute what is reachable from entry_graph and drop the other
+    graphs from translator.graphs.  Returns the Pruning.
+    """
+    pruning = Pruning(translator, entry_roots(translator, entry_graph))
+    # the entry graph stays in translator.graphs even when it is not
+    # rendered, the backend takes the name of the output from it
+    kept = []
+    removed = []
+    for graph in translator.graphs:
+        if graph in pruning.reachable or graph is entry_graph:
+            kept.append(graph)
+        else:
+            removed.append(graph)
+    pruning.removed_graphs = len(removed)
+    pruning.removed_operations = pruning.count_operations(removed)
+    pruning.kept_operations = pruning.count_operations(pruning.reachable)
+    translator.graphs[:] = kept
+    log("kept %d graphs, dropped %d graphs (%d operations)" %
+        (len(pruning.reachable), len(removed), pruning.removed_operations))
+    return pruning
@@ -0,0 +1,149 @@
+""" recovery of structured control flow from flow graphs
+
+Function uses this to render loops as real 'while' loops and branches as
+plain 'if' statements, instead of a dispatch loop switching on the number
+of the current block.  The scheme is the one of N. Ramsey, "Beyond
+Relooper": every reducible graph can be written with loops, labeled
+blocks and labeled break/continue, placing the code by walking the
+dominator tree in reverse postorder.
+"""
+
+from pypy.objspace.flow.model import c_last_exception
+
+class Structure(object):
+    """ Block ordering, dominators, loops and merge points of a graph.
+    Blocks without exits (return and raise blocks) are terminal: they are
+    not part of the tree, the backend renders them at every branch
+    reaching them.
+    """
+    def __init__(self, graph):
+        self.graph = graph
+        self._compute_order()
+        self._compute_dominators()
+        self._find_loops()
+        self._find_merge_nodes()
+
+    def _compute_order(self):
+        # iterative depth-first search, numbering the blocks in reverse
+        # postorder
+        start = self.graph.startblock
+        postorder = []
+        seen = {start: True}
+        stack = [(start, iter(start.exits))]
+        while stack:
+            block, links = stack[-1]
+            for link in links:
+                target = link.target
+                if target not in seen:
+                    seen[target] = True
+                    stack.append((target, iter(target.exits)))
+                    break
+            else:
+                stack.pop()
+                postorder.append(block)
+        postorder.reverse()
+        self.order = postorder
+        self.rpo = {}
+        for i, block in enumerate(self.order):
+            self.rpo[block] = i
+        self.preds = {}
+        for block in self.order:
+            self.preds[block] = []
+        for block in self.order:
+            for link in block.exits:
+                self.preds[link.target].append(block)
+
+    def _compute_dominators(self):
+        # Cooper, Harvey, Kennedy: "A Simple, Fast Dominance Algorithm"
+        start = self.order[0]
+        idom = {start: start}
+        rpo = self.rpo
+
+        def intersect(b1, b2):
+            while b1 is not b2:
+                while rpo[b1] > rpo[b2]:
+                    b1 = idom[b1]
+                while rpo[b2] > rpo[b1]:
+                    b2 = idom[b2]
+            return b1
+
+        changed = True
+        while changed:
+            changed = False
+            for block in self.order[1:]:
+                new_idom = None
+                for pred in self.preds[block]:
+                    if pred not in idom:
+                        continue
+                    if new_idom is None:
+                        new_idom = pred
+                    else:
+                        new_idom = intersect(pred, new_idom)
+                if idom.get(block) is not new_idom:
+                    idom[block] = new_idom
+                    changed = True
+        self.idom = idom
+
+        self.children = {}
+        for block in self.order:
+            self.children[block] = []
+        for block in self.order[1:]:
+            if not self.is_terminal(block):
+                self.children[idom[block]].append(block)
+
+    def _find_loops(self):
+        self.loop_headers = {}
+        self.reducible = True
+        for block in self.order:
+            for link in block.exits:
+                if self.is_backedge(block, link.target):
+                    self.loop_headers[link.target] = True
+                    if not self.dominates(link.target, block):
+                        self.reducible = False
+
+    def _find_merge_nodes(self):
+        # a block needs a label to be jumped to if it has more than one
+        # forward incoming link, or if it is reached from an exception
+        # handling block (its code must not end up inside the 'try')
+        self.merge_nodes = {}
+        for block in self.order:
+            if self.is_terminal(block):
+                continue
+            forward = 0
+            for pred in self.preds[block]:
+                if self.is_backedge(pred, block):
+                    continue
+                forward += 1
+                if pred.exitswitch == c_last_exception:
+                    forward += 1
+            if forward > 1:
+                self.merge_nodes[block] = True
+
+    def is_terminal(self, block):
+        return not block.exits
+
+    def is_backedge(self, source, target):
+        return self.rpo[target] <= self.rpo[source]
+
+    def dominates(self, dominator, block):
+        start = self.order[0]
+        while block is not dominator:
+            if block is start:
+                return False
+            block = self.idom[block]
+        return True
+
+    def is_loop_header(self, block):
+        return block in self.loop_headers
+
+    def is_merge_node(self, block):
+        return block in self.merge_nodes
+
+    def merge_children(self, block):
+        """ The merge nodes immediately dominated by block, the one
+        with the highest reverse postorder number first
+        """
+        result = [child for child in self.children[block]
+                  if child in self.merge_nodes]
+        result.reverse()
+        return result
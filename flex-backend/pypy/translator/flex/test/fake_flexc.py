@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+""" Stand-in for compc and mxmlc, used by test_build.py
+Usage: fake_flexc.py compc|mxmlc [options of the real compiler]
+
+Writes the file given with -output, listing the sources it was asked to
+compile, and appends the command line to the file named by the
+FAKE_FLEXC_LOG environment variable.  Fails if one of the sources
+contains the word 'syntax error'.
+"""
+
+import sys, os
+
+def main(args):
+    tool = args[0]
+    output = args[args.index('-output') + 1]
+    sources = [arg for arg in args if arg.endswith('.as') or
+                                      arg.endswith('.mxml')]
+    for source in sources:
+        if 'syntax error' in open(source).read():
+            print "%s: Error: syntax error" % source
+            return 1
+    logname = os.environ.get('FAKE_FLEXC_LOG')
+    if logname:
+        f = open(logname, 'a')
+        f.write(' '.join([tool] + args[1:]) + '\n')
+        f.close()
+    f = open(output, 'w')
+    f.write('%s\n%s\n' % (tool, '\n'.join(sources)))
+    f.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
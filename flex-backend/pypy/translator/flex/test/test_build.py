@@ -0,0 +1,98 @@
+""" tests of the incremental SWF build, with a stand-in compiler
+"""
+
+import os, sys
+import py
+from pypy.translator.flex.build import FlexBuild, FlexBuildError, shard_of
+from pypy.tool.udir import udir
+
+fake = py.path.local(__file__).dirpath().join('fake_flexc.py')
+
+def setup_module(mod):
+    mod.logfile = udir.join('fake_flexc.log')
+    os.environ['FAKE_FLEXC_LOG'] = str(mod.logfile)
+
+def teardown_module(mod):
+    del os.environ['FAKE_FLEXC_LOG']
+
+def make_app(name, n=20):
+    d = udir.ensure(name, dir=1)
+    pkg = d.ensure('py', dir=1)
+    for i in range(n):
+        pkg.join('f%d.as' % i).write('package py { function f%d() {} }' % i)
+    return d
+
+def builder(d):
+    return FlexBuild(str(d), compc='%s %s compc' % (sys.executable, fake),
+                     mxmlc='%s %s mxmlc' % (sys.executable, fake), jobs=3)
+
+def calls(tool):
+    if not logfile.check():
+        return []
+    return [line for line in logfile.readlines() if line.startswith(tool)]
+
+def test_build_and_reuse():
+    d = make_app('flexbuild_reuse')
+    logfile.write('')
+    swf = builder(d).build('app', '<mx:Application/>')
+    assert py.path.local(swf) == d.join('app.swf')
+    assert d.join('app.swf').check()
+    b = builder(d)
+    nlibs = len(b.split(['py/f%d.as' % i for i in range(20)]))
+    assert len(calls('compc')) == nlibs
+    assert len(calls('mxmlc')) == 1
+
+    logfile.write('')
+    b.build('app', '<mx:Application/>')
+    assert not b.compiled
+    assert len(b.reused) == nlibs
+    assert not calls('compc') and not calls('mxmlc')
+
+    d.join('py', 'f3.as').write('package py { function f3() { f4() } }')
+    b = builder(d)
+    b.build('app', '<mx:Application/>')
+    assert len(b.compiled) == 1
+    assert b.compiled[0].endswith(os.sep + 'lib%d.swc' % shard_of('py/f3.as'))
+    assert len(calls('mxmlc')) == 1
+
+def test_dependency_rebuilds():
+    d = make_app('flexbuild_deps')
+    sources = ['py/f%d.as' % i for i in range(20)]
+    for caller in sources:
+        for callee in sources:
+            if shard_of(caller) != shard_of(callee):
+                break
+        if shard_of(caller) != shard_of(callee):
+            break
+    name = callee[len('py/'):-len('.as')]
+    d.join(caller).write('package py { import py.%s; function g() { %s() } }'
+                         % (name, name))
+    builder(d).build('app', '<mx:Application/>')
+
+    d.join(callee).write('package py { function %s(x) {} }' % name)
+    b = builder(d)
+    b.build('app', '<mx:Application/>')
+    compiled = [os.path.basename(swc) for swc in b.compiled]
+    compiled.sort()
+    expected = ['lib%d.swc' % shard_of(caller), 'lib%d.swc' % shard_of(callee)]
+    expected.sort()
+    assert compiled == expected
+
+def test_externs():
+    d = make_app('flexbuild_externs', 5)
+    b = builder(d)
+    sources = ['py/f%d.as' % i for i in range(5)]
+    swc, shard = b.split(sources)[0]
+    command = b.compc_command(swc, shard, sources)
+    externs = command[command.index('-externs') + 1:command.index('-output')]
+    for filename in sources:
+        if filename in shard:
+            assert filename[:-3].replace('/', '.') not in externs
+        else:
+            assert filename[:-3].replace('/', '.') in externs
+
+def test_failure():
+    d = make_app('flexbuild_failure', 3)
+    d.join('py', 'f1.as').write('syntax error')
+    py.test.raises(FlexBuildError, "builder(d).build('app', '<mx:Application/>')")
+    assert not d.join('app.swf').check()
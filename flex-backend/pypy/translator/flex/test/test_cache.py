@@ -0,0 +1,48 @@
+""" tests of the on-disk graph cache
+"""
+
+import os
+from pypy.translator.flex.cache import GraphCache
+from pypy.tool.udir import udir
+
+def test_write_unchanged():
+    d = udir.ensure('flex_graphcache', dir=1)
+    filename = str(d.join('f.as'))
+    cache = GraphCache(str(d))
+    assert cache.write(filename, 'function f() {}')
+    cache.save()
+    mtime = os.stat(filename).st_mtime
+
+    cache = GraphCache(str(d))
+    assert not cache.write(filename, 'function f() {}')
+    assert os.stat(filename).st_mtime == mtime
+    assert cache.kept == 1 and cache.written == 0
+    assert cache.write(filename, 'function f() { g() }')
+    assert open(filename).read() == 'function f() { g() }'
+
+def test_write_file_removed():
+    d = udir.ensure('flex_graphcache_removed', dir=1)
+    filename = str(d.join('f.as'))
+    cache = GraphCache(str(d))
+    cache.write(filename, 'data')
+    cache.save()
+    os.unlink(filename)
+    cache = GraphCache(str(d))
+    assert cache.write(filename, 'data')
+    assert open(filename).read() == 'data'
+
+def test_write_same_size_rewritten():
+    d = udir.ensure('flex_graphcache_rewritten', dir=1)
+    filename = str(d.join('f.as'))
+    cache = GraphCache(str(d))
+    cache.write(filename, 'aaaa')
+    cache.save()
+    st = os.stat(filename)
+    f = open(filename, 'w')
+    f.write('bbbb')
+    f.close()
+    # same size, mtime in the same second but not the same
+    os.utime(filename, (st.st_atime, st.st_mtime + 0.25))
+    cache = GraphCache(str(d))
+    assert cache.write(filename, 'aaaa')
+    assert open(filename).read() == 'aaaa'
@@ -0,0 +1,54 @@
+""" tests of the typed constant pool rendered by the database
+"""
+
+from pypy.rpython.lltypesystem.lltype import Signed
+from pypy.rpython.ootypesystem import ootype
+from pypy.translator.flex.database import LowLevelDatabase, AbstractConst
+from pypy.translator.flex.asmgen import AsmGen
+from pypy.translator.flex.jts import JTS
+
+class FakeGenOO(object):
+    TypeSystem = JTS
+
+class FakeCache(object):
+    def __init__(self):
+        self.files = {}
+
+    def write(self, filename, data):
+        self.files[filename] = data
+
+def render_const_pool(consts):
+    """ The py/Consts.as rendered for the {name: constant value} consts """
+    db = LowLevelDatabase(FakeGenOO())
+    for name, value in consts.items():
+        db.consts[AbstractConst.make(db, value)] = name
+    cache = FakeCache()
+    db.gen_const_pool(AsmGen(None, "test", cache))
+    return cache.files["py/%s.as" % (db.const_var.name,)]
+
+def test_const_pool_types():
+    A = ootype.Instance("mod.A", ootype.ROOT, {'x': Signed})
+    data = render_const_pool({
+        'const_str_0': ootype.make_string("abc"),
+        'const_list_0': ootype.new(ootype.List(Signed)),
+        'const_tuple_0': ootype.new(ootype.Record({'a': Signed})),
+        'mod_A_0': ootype.new(A),
+        })
+    assert "public class Consts" in data
+    assert "public static var const_str_0:String;" in data
+    assert "public static var const_list_0:Array;" in data
+    assert "public static var const_tuple_0:Object;" in data
+    assert "public static var mod_A_0:py.mod_A;" in data
+
+def test_const_pool_root_instances():
+    EXT = ootype.Instance("Sprite", ootype.ROOT, {},
+                          _hints={'_suggested_external': True})
+    data = render_const_pool({
+        'Root_0': ootype.new(ootype.ROOT),
+        'Sprite_0': ootype.new(EXT),
+        'Null_0': ootype.null(ootype.ROOT),
+        })
+    assert "public static var Root_0:Object;" in data
+    assert "public static var Sprite_0:Object;" in data
+    assert "public static var Null_0:Object;" in data
+    assert "Root;" not in data
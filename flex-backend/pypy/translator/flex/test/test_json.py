@@ -0,0 +1,51 @@
+""" tests of the JSON reader and writer
+"""
+
+import py
+from StringIO import StringIO
+from pypy.translator.flex import json
+from pypy.translator.flex.json import ReadException, WriteException
+
+def test_read():
+    assert json.read('{"a": [1, 2.5, -3, true, false, null]}') == {
+        'a': [1, 2.5, -3, True, False, None]}
+    assert json.read('[ ]') == []
+    assert json.read(' {} ') == {}
+    assert json.read('-0.5e3') == -500.0
+    assert json.read('"a\\"b\\\\c\\/d\\n"') == 'a"b\\c/d\n'
+    assert json.read('"\\u00e9"') == u'\xe9'
+    assert json.read('// comment\n [1, /* two */ 2]') == [1, 2]
+
+def test_read_errors():
+    for bad in ['[1,]', '{"a" 1}', '"abc', 'tru', '/* /* */ 1', '{1:2}',
+                '[1 2]', '', '[1', '"\\x"']:
+        py.test.raises(ReadException, json.read, bad)
+
+def test_write():
+    assert json.write({'a': [1, None, True, False]}) == '{"a":[1,null,true,false]}'
+    assert json.write('a"b\\c\n\t') == '"a\\"b\\\\c\\n\\t"'
+    assert json.write('a/b') == '"a/b"'
+    assert json.write('a/b', escaped_forward_slash=True) == '"a\\/b"'
+    assert json.write((1, 2)) == '[1,2]'
+    py.test.raises(WriteException, json.write, object())
+
+def test_roundtrip():
+    data = [{'k%d' % i: ['s\t%d' % i, i, None, True]} for i in range(50)]
+    assert json.read(json.write(data)) == data
+
+def test_iterparse():
+    stream = '1 [2] {"a": "x"} "y" -2.5e-1 null'
+    for bufsize in [1, 2, 3, 7, 1000]:
+        result = list(json.iterparse(StringIO(stream), bufsize=bufsize))
+        assert result == [1, [2], {'a': 'x'}, 'y', -0.25, None]
+
+def test_iterparse_items():
+    data = [{'name': 'item %d' % i, 'escaped': '"\\\n', 'values': range(i)}
+            for i in range(30)]
+    source = json.write(data)
+    for bufsize in [1, 5, 64]:
+        items = json.iterparse(StringIO(source), items=True, bufsize=bufsize)
+        assert list(items) == data
+    assert list(json.iterparse(StringIO(' [ ] '), items=True)) == []
+    py.test.raises(ReadException, list,
+                   json.iterparse(StringIO('[1, 2'), items=True))
@@ -0,0 +1,51 @@
+""" tests of the ActionScript 3 types chosen by JTS
+"""
+
+from pypy.rpython.lltypesystem.lltype import Signed, Unsigned, Float, Bool
+from pypy.rpython.lltypesystem.lltype import Char, Void
+from pypy.rpython.ootypesystem import ootype
+from pypy.translator.flex.jts import JTS
+
+class FakeDb(object):
+    def __init__(self):
+        self.classes = []
+
+    def pending_class(self, classdef):
+        self.classes.append(classdef)
+
+def test_as3_type_primitives():
+    jts = JTS(FakeDb())
+    assert jts.as3_type(Signed) == "int"
+    assert jts.as3_type(Unsigned) == "uint"
+    assert jts.as3_type(Float) == "Number"
+    assert jts.as3_type(Bool) == "Boolean"
+    assert jts.as3_type(Char) == "String"
+    assert jts.as3_type(ootype.String) == "String"
+    assert jts.as3_type(Void) is None
+
+def test_as3_type_containers():
+    jts = JTS(FakeDb())
+    assert jts.as3_type(ootype.List(Signed)) == "Array"
+    assert jts.as3_type(ootype.Dict(Signed, Signed)) == "Object"
+    assert jts.as3_type(ootype.Record({'a': Signed})) == "Object"
+
+def test_as3_type_instance():
+    db = FakeDb()
+    jts = JTS(db)
+    A = ootype.Instance("mod.A", ootype.ROOT, {'x': Signed})
+    assert jts.as3_type(A) == "mod_A"
+    assert db.classes == [A]
+
+def test_as3_type_root():
+    db = FakeDb()
+    jts = JTS(db)
+    assert jts.as3_type(ootype.ROOT) == "Object"
+    EXT = ootype.Instance("Sprite", ootype.ROOT, {},
+                          _hints={'_suggested_external': True})
+    assert jts.as3_type(EXT) == "Object"
+    assert db.classes == []
+
+def test_declaration():
+    jts = JTS(FakeDb())
+    assert jts.declaration("int", "v1") == "v1:int"
+    assert jts.declaration(None, "v1") == "v1"
@@ -0,0 +1,122 @@
+""" tests of the reachability pruning of the flex backend
+"""
+
+from pypy.translator.translator import TranslationContext, graphof
+from pypy.translator.flex.prune import prune
+from pypy.objspace.flow.model import Constant, Variable, SpaceOperation
+from pypy.rpython.ootypesystem import ootype
+
+class A(object):
+    def __init__(self, x):
+        self.x = x
+        self.written = x * 2
+    def used(self):
+        return self.x
+    def unused(self):
+        self.unread = self.x
+        return self.unread
+
+class B(A):
+    def used(self):
+        return 42
+
+def helper(n):
+    return n + 1
+
+def dead(n):
+    return A(n).unused()
+
+def ootyped(func, argtypes, *others):
+    t = TranslationContext()
+    ann = t.buildannotator()
+    for other in others:
+        ann.build_types(other, [int], complete_now=False)
+    ann.build_types(func, argtypes)
+    t.buildrtyper(type_system="ootype").specialize()
+    return t
+
+def test_unused_methods_and_fields():
+    def f(n):
+        if n:
+            a = A(n)
+        else:
+            a = B(n)
+        return a.used() + helper(n)
+    t = ootyped(f, [int], dead)
+    dead_graph = graphof(t, dead)
+    pruning = prune(t, graphof(t, f))
+    assert graphof(t, helper) in pruning.reachable
+    assert dead_graph not in t.graphs
+    assert pruning.is_field_used('ox')
+    # only written, but still set by the code that is kept
+    assert pruning.is_field_used('owritten')
+    assert not pruning.is_field_used('ounread')
+    used = [graph for graph in pruning.reachable
+            if graph.name.endswith('used') and
+               not graph.name.endswith('unused')]
+    assert len(used) == 2
+    assert not [graph for graph in pruning.reachable
+                if graph.name.endswith('unused')]
+    assert pruning.removed_operations > 0
+
+def test_entry_wrapper():
+    def wrapper():
+        helper(3)
+    wrapper.flex_entry_wrapper = True
+    t = ootyped(wrapper, [], dead)
+    entry_graph = graphof(t, wrapper)
+    pruning = prune(t, entry_graph)
+    assert pruning.roots == [graphof(t, helper)]
+    assert entry_graph not in pruning.reachable
+    # kept for the name of the output
+    assert entry_graph in t.graphs
+
+def test_instance_seen_by_external_code():
+    def f(n):
+        a = A(n)
+        return a.used()
+    t = ootyped(f, [int], dead)
+    graph = graphof(t, f)
+    # pass the instance to a function without a graph, as the calls to
+    # external functions are
+    for block in graph.iterblocks():
+        for i, op in enumerate(block.operations):
+            if op.opname == 'new':
+                v_a = op.result
+                FUNC = ootype.StaticMethod([v_a.concretetype], ootype.Void)
+                c_ext = Constant(ootype.static_meth(FUNC, 'ext'), FUNC)
+                v_result = Variable()
+                v_result.concretetype = ootype.Void
+                block.operations.insert(i + 1, SpaceOperation(
+                    'direct_call', [c_ext, v_a], v_result))
+                break
+    pruning = prune(t, graph)
+    assert pruning.is_field_used('ox')
+    assert pruning.is_field_used('ounread')
+    assert not [graph for graph in pruning.reachable
+                if graph.name.endswith('unused')]
+
+def test_measured_savings():
+    from pypy.translator.flex.js import JS, measure_source, DiscardingCache
+    def f(n):
+        a = A(n)
+        return a.used() + helper(n)
+    t = ootyped(f, [int], dead)
+    unpruned_bytes = measure_source(t, f, None)
+    gen = JS(t, functions=[f])
+    gen.cache = DiscardingCache()
+    gen.generate_source()
+    # measuring writes nothing and does not change what is rendered
+    assert gen.written_bytes == unpruned_bytes
+    pruning = prune(t, graphof(t, f))
+    pruning.unpruned_bytes = unpruned_bytes
+    gen = JS(t, functions=[f], pruning=pruning)
+    gen.cache = DiscardingCache()
+    gen.generate_source()
+    assert 0 < gen.written_bytes < unpruned_bytes
+    report = pruning.report(gen.written_bytes)
+    assert report.endswith("%d of %d bytes of py/*.as saved" %
+                           (unpruned_bytes - gen.written_bytes,
+                            unpruned_bytes))
+    pruning.unpruned_bytes = None
+    assert "estimated" in pruning.report(gen.written_bytes)
@@ -0,0 +1,146 @@
+""" tests of the control flow recovery used by the flex backend
+"""
+
+from StringIO import StringIO
+from pypy.objspace.flow.model import Block, Link, FunctionGraph
+from pypy.objspace.flow.model import Variable, Constant, c_last_exception
+from pypy.translator.translator import TranslationContext, graphof
+from pypy.translator.flex.structure import Structure
+from pypy.translator.flex.asmgen import AsmGen
+from pypy.translator.flex.js import JS
+
+def flowgraph(func):
+    t = TranslationContext()
+    return t.buildflowgraph(func)
+
+class FakeCache(object):
+    def __init__(self):
+        self.files = {}
+
+    def write(self, filename, data):
+        self.files[filename] = data
+
+def render(func, argtypes, structured=True):
+    """ The ActionScript of the function rendered for func """
+    t = TranslationContext()
+    t.buildannotator().build_types(func, argtypes)
+    t.buildrtyper(type_system="ootype").specialize()
+    js = JS(t, func)
+    js.config.translation.flex.structured = structured
+    cache = FakeCache()
+    ilasm = AsmGen(StringIO(), "test", cache)
+    function = js.Function(js.db, graphof(t, func))
+    function.render(ilasm)
+    return cache.files["py/%s.as" % (function.name,)]
+
+def test_straight_line():
+    def f(x):
+        return x + 1
+    structure = Structure(flowgraph(f))
+    assert structure.reducible
+    assert not structure.loop_headers
+    assert not structure.merge_nodes
+
+def test_while():
+    def f(x):
+        total = 0
+        while x > 0:
+            total += x
+            x -= 1
+        return total
+    graph = flowgraph(f)
+    structure = Structure(graph)
+    assert structure.reducible
+    assert len(structure.loop_headers) == 1
+    header = structure.loop_headers.keys()[0]
+    for block in structure.order:
+        assert structure.dominates(graph.startblock, block)
+    assert structure.dominates(header, graph.returnblock)
+
+def test_if_merge():
+    def f(x):
+        if x:
+            y = 1
+        else:
+            y = 2
+        return y + x
+    graph = flowgraph(f)
+    structure = Structure(graph)
+    assert structure.reducible
+    assert not structure.loop_headers
+    assert len(structure.merge_nodes) == 1
+    merge = structure.merge_nodes.keys()[0]
+    assert structure.merge_children(graph.startblock) == [merge]
+
+def test_terminal_blocks():
+    def f(x):
+        if x:
+            return 1
+        return 2
+    graph = flowgraph(f)
+    structure = Structure(graph)
+    assert structure.is_terminal(graph.returnblock)
+    assert not structure.is_merge_node(graph.returnblock)
+
+def test_exception_targets_are_merge_nodes():
+    x = Variable()
+    start = Block([x])
+    graph = FunctionGraph('exc', start)
+    target = Block([])
+    start.exitswitch = c_last_exception
+    start.closeblock(Link([], target))
+    target.closeblock(Link([Constant(None)], graph.returnblock))
+    structure = Structure(graph)
+    assert structure.is_merge_node(target)
+
+def test_irreducible():
+    x = Variable()
+    xa = Variable()
+    xb = Variable()
+    start = Block([x])
+    a = Block([xa])
+    b = Block([xb])
+    graph = FunctionGraph('irreducible', start)
+    start.exitswitch = x
+    start.closeblock(Link([x], a, False), Link([x], b, True))
+    a.exitswitch = xa
+    a.closeblock(Link([xa], b, False),
+                 Link([Constant(None)], graph.returnblock, True))
+    b.closeblock(Link([xb], a))
+    assert not Structure(graph).reducible
+
+def test_render_while():
+    def f(x):
+        total = 0
+        while x > 0:
+            total += x
+            x -= 1
+        return total
+    source = render(f, [int])
+    assert "while (true)" in source
+    assert "continue " in source
+    assert "switch(block)" not in source
+
+def test_render_if_merge():
+    def f(x):
+        if x:
+            y = 1
+        else:
+            y = 2
+        return y + x
+    source = render(f, [int])
+    assert "break " in source
+    assert "while (true)" not in source
+    assert "switch(block)" not in source
+    # the labeled block around the branches ends before the merge node
+    label = source.split("break ")[1].split(";")[0]
+    assert "%s: {" % (label,) in source
+
+def test_render_dispatch_loop():
+    def f(x):
+        while x > 0:
+            x -= 1
+        return x
+    source = render(f, [int], structured=False)
+    assert "switch(block)" in source
+    assert "while (true)" not in source
@@ -0,0 +1,64 @@
+#! /usr/bin/env python
+"""
+Time richards.py on py.py with and without the attribute caches (see
+objspace.std.withattrcache), and on translated pypy-c executables.
+
+Usage: bench-attrcache.py [-n iterations] [executable...]
+
+The executables are e.g. a pypy-c translated with
+--objspace-std-withattrcache and one translated with only
+--objspace-std-withsharingdict.  The iterations default to 1 on py.py and to 10 on the executables.
+"""
+
+import autopath
+import sys, os
+
+GOALDIR = os.path.dirname(os.path.abspath(__file__))
+PYPYDIR = os.path.dirname(os.path.dirname(GOALDIR))
+PY_PY = os.path.join(PYPYDIR, 'bin', 'py.py')
+
+RICHARDS_CMD = 'from richards import *;main(iterations=%d)'
+RICHARDS_PATTERN = 'Average time per iteration:'
+
+PY_PY_OPTIONS = [
+    ('py.py', ['--objspace-std-withsharingdict']),
+    ('py.py attrcache', ['--objspace-std-withattrcache']),
+    ]
+
+def run_richards(args, iterations):
+    """ Run richards with the command line args, returning the average
+    time per iteration in milliseconds """
+    args = args + ['-c', RICHARDS_CMD % (iterations,)]
+    cmd = ' '.join(['"%s"' % (arg,) for arg in args])
+    old = os.getcwd()
+    os.chdir(GOALDIR)
+    try:
+        pipe = os.popen(cmd + ' 2>&1')
+        output = pipe.read()
+        status = pipe.close()
+    finally:
+        os.chdir(old)
+    for line in output.split('\n'):
+        if line.startswith(RICHARDS_PATTERN):
+            return float(line.split()[len(RICHARDS_PATTERN.split())])
+    raise Exception("no result from %s (status %r):\n%s" % (cmd, status,
+                                                             output))
+
+def main(args):
+    iterations = None
+    if args[:1] == ['-n']:
+        iterations = int(args[1])
+        args = args[2:]
+    if args and args[0] in ('-h', '--help'):
+        print __doc__
+        sys.exit(2)
+    runs = [(name, [sys.executable, PY_PY] + options, iterations or 1)
+            for name, options in PY_PY_OPTIONS]
+    runs += [(executable, [os.path.abspath(executable)], iterations or 10)
+             for executable in args]
+    print '%-40s %12s' % ('richards', 'ms/iteration')
+    for name, cmdargs, n in runs:
+        print '%-40s %12.1f' % (name, run_richards(cmdargs, n))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,88 @@
+#! /usr/bin/env python
+"""
+Time the backend optimizations of an rtyped translation with various
+numbers of processes (see translation.backendopt.processes).
+
+Usage: bench-backendopt.py [-r repeat] rtype.checkpoint [processes...]
+
+The checkpoint is the one saved by e.g.
+
+    translate.py --checkpoint-dir=DIR --rtype targetpypystandalone.py
+
+Every run starts from the checkpoint as loaded, in a process of its own.
+The operations of the optimized graphs are compared with the ones of
+the first run, they must not depend on the number of processes.
+"""
+
+import autopath
+import sys, os, time, md5, marshal
+from pypy.translator.translator import TranslationContext
+from pypy.translator.tool.checkpoint import load_checkpoint
+from pypy.translator.backendopt.all import backend_optimizations
+
+def operations_digest(translator):
+    m = md5.new()
+    for graph in translator.graphs:
+        for block in graph.iterblocks():
+            m.update(' '.join([op.opname for op in block.operations]))
+            m.update('|%d\n' % len(block.exits))
+    return m.hexdigest()
+
+def run(translator, processes):
+    """ Optimize in a child process, returning (seconds, digest) """
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        try:
+            start = time.time()
+            backend_optimizations(translator, processes=processes)
+            result = time.time() - start, operations_digest(translator)
+            os.write(write, marshal.dumps(result))
+        finally:
+            os._exit(0)
+    os.close(write)
+    data = ''
+    while 1:
+        chunk = os.read(read, 4096)
+        if not chunk:
+            break
+        data += chunk
+    os.close(read)
+    os.waitpid(pid, 0)
+    if not data:
+        raise Exception("the run with %d processes failed" % processes)
+    return marshal.loads(data)
+
+def main(args):
+    repeat = 1
+    if args[:1] == ['-r']:
+        repeat = int(args[1])
+        args = args[2:]
+    if not args:
+        print __doc__
+        sys.exit(2)
+    filename = args[0]
+    counts = [int(arg) for arg in args[1:]] or [1, 2, 4, 8]
+    translator = TranslationContext()
+    load_checkpoint(filename, translator)
+    print '%d graphs' % len(translator.graphs)
+    print '%9s %9s %8s' % ('processes', 'seconds', 'speedup')
+    base = digest = None
+    for processes in counts:
+        best = None
+        for i in range(repeat):
+            seconds, result = run(translator, processes)
+            if digest is None:
+                digest = result
+            elif result != digest:
+                print 'the graphs optimized with %d processes differ!' % (
+                    processes,)
+            if best is None or seconds < best:
+                best = seconds
+        if base is None:
+            base = best
+        print '%9d %9.1f %7.2fx' % (processes, best, base / best)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,69 @@
+#! /usr/bin/env python
+"""
+Time the llinterpreter on the rtyped graphs of richards.py, evaluating
+the operations one by one as before and with the precompiled blocks
+(see LLInterpreter.precompile).
+
+Usage: bench-llinterp.py [-r repeat] [--trace] [iterations]
+
+The tracing of the llinterpreter (to a file in the udir) is off unless
+--trace is given.  Both ways must give the same result.
+"""
+
+import autopath
+import sys, time
+from pypy.translator.translator import TranslationContext, graphof
+from pypy.rpython.llinterp import LLInterpreter
+from pypy.translator.goal import richards
+
+def richards_run(iterations):
+    return richards.Richards().run(iterations)
+
+def build():
+    t = TranslationContext()
+    t.buildannotator().build_types(richards_run, [int])
+    t.buildrtyper().specialize()
+    return t, graphof(t, richards_run)
+
+def run(translator, graph, iterations, precompile, tracing):
+    """ Evaluate the graph, returning (seconds, result) """
+    interp = LLInterpreter(translator.rtyper, tracing=tracing)
+    interp.precompile = precompile
+    start = time.time()
+    result = interp.eval_graph(graph, [iterations])
+    return time.time() - start, result
+
+def main(args):
+    repeat = 1
+    tracing = False
+    if args[:1] == ['-r']:
+        repeat = int(args[1])
+        args = args[2:]
+    if args[:1] == ['--trace']:
+        tracing = True
+        args = args[1:]
+    if args and args[0] in ('-h', '--help'):
+        print __doc__
+        sys.exit(2)
+    iterations = int((args + ['1'])[0])
+    translator, graph = build()
+    print '%-12s %9s %8s' % ('operations', 'seconds', 'speedup')
+    base = expected = None
+    for precompile in [False, True]:
+        best = None
+        for i in range(repeat):
+            seconds, result = run(translator, graph, iterations,
+                                  precompile, tracing)
+            if expected is None:
+                expected = result
+            elif result != expected:
+                print 'the results differ: %r != %r' % (result, expected)
+            if best is None or seconds < best:
+                best = seconds
+        if base is None:
+            base = best
+        name = {False: 'one by one', True: 'precompiled'}[precompile]
+        print '%-12s %9.2f %7.2fx' % (name, best, base / best)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,95 @@
+#! /usr/bin/env python
+"""
+Measure the peak memory of a translation up to rtyping, with this pypy
+and optionally with another checkout, e.g. one from before a change of
+the flow model.
+
+Usage: bench-memory.py [--baseline=PYPYDIR] [target [translate.py options]]
+
+The target defaults to targetpypystandalone.py.  Every translation runs
+in a process of its own, with --task-profile: the peak resident set size
+of the process after each task is read from the profile.
+"""
+
+import autopath
+import sys, os, tempfile
+
+GOALS = ['annotate', 'rtype']
+PYPYDIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+def read_profile(filename):
+    # the JSON written by taskprofile.py is also a Python expression
+    f = open(filename)
+    try:
+        data = f.read()
+    finally:
+        f.close()
+    return eval(data, {'null': None, 'true': True, 'false': False})
+
+def translate(pypydir, target, options):
+    """ Translate target up to rtyping with the pypy in pypydir, returning
+    {goal: peak RSS in kilobytes} """
+    fd, profile = tempfile.mkstemp(prefix='bench-memory-', suffix='.json')
+    os.close(fd)
+    goaldir = os.path.join(pypydir, 'translator', 'goal')
+    args = [sys.executable, 'translate.py', '--batch', '--text', '--rtype',
+            '--task-profile=%s' % (profile,)] + options + [target]
+    print >> sys.stderr, 'in %s: %s' % (goaldir, ' '.join(args))
+    old = os.getcwd()
+    os.chdir(goaldir)
+    try:
+        status = os.spawnv(os.P_WAIT, sys.executable, args)
+    finally:
+        os.chdir(old)
+    try:
+        if status != 0:
+            raise Exception("the translation with %s failed" % (pypydir,))
+        result = {}
+        for record in read_profile(profile)['tasks']:
+            if record['goal'] in GOALS and record['peak_rss_kb'] is not None:
+                result[record['goal']] = record['peak_rss_kb']
+        return result
+    finally:
+        os.unlink(profile)
+
+def megabytes(kb):
+    if kb is None:
+        return '-'
+    return '%.0f' % (kb / 1024.0)
+
+def main(args):
+    baseline = None
+    if args and args[0].startswith('--baseline='):
+        baseline = os.path.abspath(args[0][len('--baseline='):])
+        args = args[1:]
+    if args and args[0] in ('-h', '--help'):
+        print __doc__
+        sys.exit(2)
+    target = 'targetpypystandalone.py'
+    if args and not args[0].startswith('-'):
+        target = args[0]
+        args = args[1:]
+    runs = []
+    if baseline is not None:
+        runs.append(('baseline', translate(baseline, target, args)))
+    runs.append(('this pypy', translate(PYPYDIR, target, args)))
+    print
+    print 'peak RSS in MB after each task of %s' % (target,)
+    print '%-10s' % ('task',) + ''.join(['%12s' % (name,)
+                                        for name, peaks in runs]),
+    if baseline is not None:
+        print '%9s' % ('change',)
+    else:
+        print
+    for goal in GOALS:
+        values = [peaks.get(goal) for name, peaks in runs]
+        print '%-10s' % (goal,) + ''.join(['%12s' % (megabytes(value),)
+                                          for value in values]),
+        if baseline is not None and None not in values and values[0]:
+            print '%+8.1f%%' % (100.0 * (values[1] - values[0]) / values[0],)
+        else:
+            print
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
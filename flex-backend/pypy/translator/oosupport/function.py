@@ -98,9 +98,14 @@ class Function(object):
 
         self.ilasm = ilasm
         self.generator = self._create_generator(self.ilasm)
-        graph = self.graph
         self.begin_render()
+        self.render_blocks()
+        self.end_render()
+        if not self.is_method:
+            self.db.record_function(self.graph, self.name)
 
+    def render_blocks(self):
+        graph = self.graph
         self.return_block = None
         self.raise_block = None
         for block in graph.iterblocks():
@@ -128,10 +133,6 @@ class Function(object):
             self.set_label(self._get_block_name(self.return_block))
             self.render_return_block(self.return_block)
 
-        self.end_render()
-        if not self.is_method:
-            self.db.record_function(self.graph, self.name)
-
     def before_last_blocks(self):
         pass
 
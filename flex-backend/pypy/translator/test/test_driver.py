@@ -63,3 +63,19 @@ def test_ctr():
                 'run_c', 'prehannotatebackendopt', 'hintannotate', 'timeshift']
 
     assert cmpl(td.exposed, expected)
+
+def test_unwritable_task_profile():
+    from pypy.tool.udir import udir
+    filename = str(udir.join('no_such_dir', 'profile.json'))
+    td = TranslationDriver(overrides={'translation.task_profile': filename})
+    messages = []
+    class Log:
+        def info(self, msg):
+            pass
+        def ERROR(self, msg):
+            messages.append(msg)
+    td.log = Log()
+    # the failure to write the profile is logged, not raised
+    td._execute([])
+    assert len(messages) == 1
+    assert 'could not write the task profile' in messages[0]
@@ -291,7 +291,7 @@ class CCompiler:
 
     def __init__(self, cfilenames, outputfilename=None, include_dirs=[],
                  libraries=[], library_dirs=[], compiler_exe=None,
-                 profbased=None):
+                 profbased=None, object_cache=None):
         self.cfilenames = cfilenames
         ext = ''
         self.compile_extra = []
@@ -301,6 +301,9 @@ class CCompiler:
         self.library_dirs = list(library_dirs)
         self.compiler_exe = compiler_exe
         self.profbased = profbased
+        if sys.platform == 'win32':
+            object_cache = None     # needs a preprocessor like gcc -E
+        self.object_cache = object_cache
         if not sys.platform in ('win32', 'darwin'): # xxx
             if 'm' not in self.libraries:
                 self.libraries.append('m')
@@ -355,6 +358,31 @@ class CCompiler:
                 print >>sys.stderr, data
             raise
  
+    def _compile(self, compiler, cfile):
+        res = compiler.compile([cfile.basename], 
+                               include_dirs=self.include_dirs,
+                               extra_preargs=self.compile_extra)
+        assert len(res) == 1
+        return py.path.local(res[0])
+
+    def _compile_cached(self, compiler, cfile):
+        """ Take the object of cfile from the object cache if it is there,
+        or compile it and put it there """
+        cobjfile = py.path.local(compiler.object_filenames([cfile.basename])[0])
+        preprocessed = cfile.new(ext='.i')
+        command = compiler.compiler_so + self.compile_extra
+        compiler.spawn(command + ['-E'] +
+                       ['-I%s' % dir for dir in self.include_dirs] +
+                       [cfile.basename, '-o', str(preprocessed)])
+        try:
+            key = self.object_cache.key(preprocessed.read(), command)
+        finally:
+            preprocessed.remove()
+        if not self.object_cache.get(key, cobjfile):
+            cobjfile = self._compile(compiler, cfile)
+            self.object_cache.put(key, cobjfile)
+        return cobjfile
+
     def _build(self):
         from distutils.ccompiler import new_compiler 
         compiler = new_compiler(force=1)
@@ -363,20 +391,27 @@ class CCompiler:
                         linker_exe linker_so'''.split():
                 compiler.executables[c][0] = self.compiler_exe
         compiler.spawn = log_spawned_cmd(compiler.spawn)
+        # the objects of a profile-based build depend on the .gcda files
+        # and on the directory they are written to, which are not part
+        # of the key of the cache
+        object_cache = self.object_cache
+        if self.profbased is not None:
+            object_cache = None
         objects = []
         for cfile in self.cfilenames: 
             cfile = py.path.local(cfile)
             old = cfile.dirpath().chdir() 
             try: 
-                res = compiler.compile([cfile.basename], 
-                                       include_dirs=self.include_dirs,
-                                       extra_preargs=self.compile_extra)
-                assert len(res) == 1
-                cobjfile = py.path.local(res[0]) 
+                if object_cache is None:
+                    cobjfile = self._compile(compiler, cfile)
+                else:
+                    cobjfile = self._compile_cached(compiler, cfile)
                 assert cobjfile.check()
                 objects.append(str(cobjfile))
             finally: 
                 old.chdir() 
+        if object_cache is not None:
+            object_cache.finish()
         compiler.link_executable(objects, str(self.outputfilename),
                                  libraries=self.libraries,
                                  extra_preargs=self.link_extra,
@@ -0,0 +1,688 @@
+""" Saving the state of a translation to disk
+
+A checkpoint holds a TranslationContext after annotation or rtyping --
+flow graphs, annotator bindings, bookkeeper descs, the rtyper and the
+low-level types -- so that a later process can go on from there instead
+of annotating again.  It is a pickle, with the following twists:
+
+ * the objects that are globals of a module (or attributes of a class
+   defined in a module) are saved as references, so that after loading
+   they are the very objects of the new process again.  This means that
+   the program being translated and the toolchain must not change between
+   saving and loading, and that what the translation stores in module
+   level objects is not saved;
+
+ * the configs of the translator are not saved either: the loaded state
+   uses the config of the new process;
+
+ * functions, code objects and classes that are not globals are saved by
+   value, instances of classes with __getattr__ or __slots__ are saved
+   without calling anything on them;
+
+ * dicts and sets with keys that are hashed by content are only filled
+   when everything else is loaded, because the hash of e.g. low-level
+   types depends on state that is not there yet while loading;
+
+ * the blocks and links of the graphs are created before anything else,
+   to keep the recursion of the pickler flat.
+"""
+
+import sys, os, time, marshal, weakref, copy_reg, pickle
+from types import ClassType, TypeType, FunctionType, BuiltinFunctionType, \
+     MethodType, ModuleType, CodeType, InstanceType, DictionaryType, \
+     NoneType, TupleType
+
+import py
+from pypy.tool.ansi_print import ansi_log
+log = py.log.Producer("checkpoint")
+py.log.setconsumer("checkpoint", ansi_log)
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_GOALS = ['annotate', 'rtype_lltype', 'rtype_ootype']
+RECURSION_LIMIT = 5000
+
+ATOMIC_TYPES = (NoneType, bool, int, long, float, complex, str, unicode)
+IDENTITY_HASHED_TYPES = (TypeType, ClassType, FunctionType,
+                         BuiltinFunctionType, ModuleType, CodeType)
+HEAPTYPE = 1 << 9    # Py_TPFLAGS_HEAPTYPE
+
+class _Slotted(object):
+    __slots__ = ['slot']
+MemberDescriptorType = type(_Slotted.slot)
+
+class CheckpointError(Exception):
+    pass
+
+def _stable_hash(key):
+    """ Can key be put into a dict before everything is loaded? """
+    t = type(key)
+    if t in ATOMIC_TYPES or t in IDENTITY_HASHED_TYPES:
+        return True
+    if t is TupleType:
+        for item in key:
+            if not _stable_hash(item):
+                return False
+        return True
+    if t is InstanceType:
+        return getattr(key.__class__, '__hash__', None) is None
+    return t.__hash__ is object.__hash__
+
+# ____________________________________________________________
+# helpers called when loading
+
+class _Empty(object):
+    pass
+
+EMPTY_CELL = _Empty()
+
+def _make_cell(value):
+    return (lambda: value).func_closure[0]
+
+def _rebuild_function(code, globals, name, defaults, closure):
+    if closure is not None:
+        closure = tuple([_make_cell(value) for value in closure])
+    return FunctionType(code, globals, name, defaults, closure)
+
+def _rebuild_code(data):
+    return marshal.loads(data)
+
+def _new_instance(cls):
+    import new
+    return new.instance(cls)
+
+def _new_classic_class(name, bases, dict):
+    import new
+    return new.classobj(name, bases, dict)
+
+def _new_class(metaclass, name, bases, dict):
+    return metaclass(name, bases, dict)
+
+def _dead_weakref():
+    return weakref.ref(_Empty())
+
+def _resolve_global(modname, path, unwrap):
+    try:
+        obj = _import_module(modname)
+        if path is None:
+            return obj.__dict__
+        parent = None
+        for name in path:
+            parent = obj
+            obj = obj.__dict__[name]
+    except (ImportError, KeyError):
+        raise CheckpointError("%s.%s does not exist any more, the checkpoint"
+                              " is out of date" % (modname,
+                                                   '.'.join(path or ())))
+    if unwrap:
+        obj = obj.__get__(None, parent)
+        obj = getattr(obj, 'im_func', obj)
+    return obj
+
+def _import_module(modname):
+    try:
+        return sys.modules[modname]
+    except KeyError:
+        __import__(modname)
+        return sys.modules[modname]
+
+# ____________________________________________________________
+
+class GlobalNames(object):
+    """ The objects reachable from the modules loaded so far, with the
+    path under which they can be found again
+    """
+    def __init__(self):
+        self.ids = {}    # id(obj) -> (obj, persistent id)
+        self.modnames = {}
+        self.update()
+
+    def update(self):
+        """ Add the objects of the modules loaded since the last call """
+        modnames = [modname for modname, module in sys.modules.items()
+                    if module is not None and modname != '__main__' and
+                       modname not in self.modnames]
+        modnames.sort()
+        # translate.py also registers itself under another name, which
+        # is the one to use
+        if '__main__' in sys.modules and '__main__' not in self.modnames:
+            modnames.append('__main__')
+        for modname in modnames:
+            self.modnames[modname] = True
+        # functions and classes are registered under their own module
+        # first, then come the names that other modules import
+        for own in (True, False):
+            for modname in modnames:
+                module = sys.modules[modname]
+                if own:
+                    self.add(module.__dict__, ('g', modname, None, False))
+                names = module.__dict__.keys()
+                names.sort()
+                for name in names:
+                    value = module.__dict__[name]
+                    if own and not (isinstance(value, (FunctionType, TypeType,
+                                                       ClassType)) and
+                                    value.__module__ == modname):
+                        continue
+                    self.walk(value, modname, (name,))
+
+    def add(self, obj, pid):
+        if id(obj) in self.ids:
+            return False
+        self.ids[id(obj)] = obj, pid
+        return True
+
+    def walk(self, value, modname, path):
+        if type(value) in ATOMIC_TYPES or type(value) in (TupleType,
+                                                          ModuleType):
+            return
+        if not self.add(value, ('g', modname, path, False)):
+            return
+        if (isinstance(value, (TypeType, ClassType)) and
+                getattr(value, '__module__', None) == modname):
+            names = value.__dict__.keys()
+            names.sort()
+            for name in names:
+                attr = value.__dict__[name]
+                if isinstance(attr, (staticmethod, classmethod)):
+                    func = attr.__get__(None, value)
+                    func = getattr(func, 'im_func', func)
+                    self.add(func, ('g', modname, path + (name,), True))
+                self.walk(attr, modname, path + (name,))
+
+    def lookup(self, obj):
+        entry = self.ids.get(id(obj))
+        if entry is not None and entry[0] is obj:
+            return entry[1]
+        return None
+
+class CheckpointPickler(pickle.Pickler):
+    dispatch = pickle.Pickler.dispatch.copy()
+
+    def __init__(self, file, globalnames, substitutes):
+        pickle.Pickler.__init__(self, file, 2)
+        self.globalnames = globalnames
+        self.substitutes = {}    # id(obj) -> (obj, persistent id)
+        for path, obj in substitutes.items():
+            self.substitutes[id(obj)] = obj, ('s', path)
+        self.delayed = []        # (container, items to add when loading)
+        self.keepalive = []      # objects only held by weakrefs
+        self.closures = {}       # functions whose closure is being saved
+
+    def persistent_id(self, obj):
+        entry = self.substitutes.get(id(obj))
+        if entry is not None and entry[0] is obj:
+            return entry[1]
+        if type(obj) is ModuleType:
+            return ('m', obj.__name__)
+        return self.globalnames.lookup(obj)
+
+    def save(self, obj):
+        pid = self.persistent_id(obj)
+        if pid is not None:
+            self.save_pers(pid)
+            return
+        x = self.memo.get(id(obj))
+        if x is not None:
+            self.write(self.get(x[0]))
+            return
+        t = type(obj)
+        f = self.dispatch.get(t)
+        if f is not None:
+            f(self, obj)
+        elif issubclass(t, (TypeType, ClassType)):
+            self.save_class(obj)
+        else:
+            self.save_reduced(obj, self.reduce_object(obj))
+
+    def save_reduced(self, obj, rv):
+        rv = tuple(rv) + (None,) * (5 - len(rv))
+        func, args, state, listitems, dictitems = rv
+        self.save_reduce(func, args, state, listitems, dictitems, obj)
+
+    def save_reduce(self, func, args, state=None, listitems=None,
+                    dictitems=None, obj=None):
+        write = self.write
+        if getattr(func, '__name__', '') == '__newobj__':
+            self.save(args[0])
+            self.save(tuple(args[1:]))
+            opcode = pickle.NEWOBJ
+        else:
+            self.save(func)
+            self.save(args)
+            opcode = pickle.REDUCE
+        if obj is not None and id(obj) in self.memo:
+            # obj was reached again, and built, while saving its
+            # arguments: drop them and use what is already there
+            write(pickle.POP + pickle.POP + self.get(self.memo[id(obj)][0]))
+            return
+        write(opcode)
+        if obj is not None:
+            self.memoize(obj)
+        if listitems is not None:
+            self._batch_appends(listitems)
+        if dictitems is not None:
+            self.save_items(obj, list(dictitems))
+        if state is not None:
+            self.save(state)
+            write(pickle.BUILD)
+
+    def save_items(self, obj, items):
+        for key, value in items:
+            if not _stable_hash(key):
+                self.delayed.append((obj, items))
+                return
+        self._batch_setitems(iter(items))
+
+    def reduce_object(self, obj):
+        cls = type(obj)
+        if cls is InstanceType:
+            klass = obj.__class__
+            getstate = getattr(klass, '__getstate__', None)
+            if getstate is not None:
+                state = getstate(obj)
+            else:
+                state = obj.__dict__
+            return _new_instance, (klass,), state
+        # everything is looked up on the class, not on the instance: some
+        # classes have a __getattr__ that doesn't expect to be asked for
+        # __reduce_ex__ or __getstate__
+        if cls.__reduce_ex__ is not object.__reduce_ex__:
+            return self.checked_reduce(cls.__reduce_ex__, obj, 2)
+        if cls.__reduce__ is not object.__reduce__:
+            return self.checked_reduce(cls.__reduce__, obj)
+        if cls is object:
+            return object, ()
+        if not cls.__flags__ & HEAPTYPE:
+            raise CheckpointError("cannot save %r objects" % (cls.__name__,))
+
+        getnewargs = getattr(cls, '__getnewargs__', None)
+        if getnewargs is not None:
+            args = tuple(getnewargs(obj))
+        else:
+            args = ()
+        getstate = getattr(cls, '__getstate__', None)
+        if getstate is not None:
+            state = getstate(obj)
+        else:
+            try:
+                state = object.__getattribute__(obj, '__dict__') or None
+            except AttributeError:
+                state = None
+            slots = {}
+            # the hash of low-level types is computed from their content,
+            # it will be different in the next process
+            skip_hash = getattr(cls, '__hash_is_not_constant__', False)
+            for name in copy_reg._slotnames(cls):
+                if skip_hash and name.endswith('__cached_hash'):
+                    continue
+                try:
+                    slots[name] = object.__getattribute__(obj, name)
+                except AttributeError:
+                    pass
+            if slots:
+                state = (state, slots)
+        listitems = dictitems = None
+        if isinstance(obj, list):
+            listitems = iter(obj)
+        if isinstance(obj, dict):
+            dictitems = obj.iteritems()
+        return (copy_reg.__newobj__, (cls,) + args, state, listitems,
+                dictitems)
+
+    def checked_reduce(self, reduce, *args):
+        try:
+            rv = reduce(*args)
+        except TypeError, e:
+            raise CheckpointError("cannot save %r: %s" % (args[0], e))
+        if isinstance(rv, str):
+            raise CheckpointError("cannot save %r: not a global" % (args[0],))
+        return rv
+
+    def save_dict(self, obj):
+        self.write(pickle.EMPTY_DICT)
+        self.memoize(obj)
+        self.save_items(obj, obj.items())
+    dispatch[DictionaryType] = save_dict
+
+    def save_set(self, obj):
+        items = list(obj)
+        for item in items:
+            if not _stable_hash(item):
+                self.save_reduce(set, (), obj=obj)
+                self.delayed.append((obj, items))
+                return
+        self.save_reduce(set, (items,), obj=obj)
+    dispatch[set] = save_set
+
+    def save_weakdict(self, obj):
+        items = obj.items()
+        for item in items:
+            self.keepalive.append(item)
+        self.save_reduce(type(obj), (), obj=obj)
+        self.delayed.append((obj, items))
+    dispatch[weakref.WeakKeyDictionary] = save_weakdict
+    dispatch[weakref.WeakValueDictionary] = save_weakdict
+
+    def save_weakref(self, obj):
+        referent = obj()
+        if referent is None:
+            self.save_reduce(_dead_weakref, (), obj=obj)
+        else:
+            self.keepalive.append(referent)
+            self.save_reduce(weakref.ref, (referent,), obj=obj)
+    dispatch[weakref.ReferenceType] = save_weakref
+
+    def save_function(self, obj):
+        closure = None
+        if obj.func_closure is not None:
+            if id(obj) in self.closures:
+                raise CheckpointError("cannot save %r, its closure refers "
+                                      "back to it" % (obj,))
+            values = []
+            for cell in obj.func_closure:
+                try:
+                    values.append(cell.cell_contents)
+                except ValueError:
+                    values.append(EMPTY_CELL)
+            closure = tuple(values)
+            self.closures[id(obj)] = True
+            try:
+                self.save(closure)
+            finally:
+                del self.closures[id(obj)]
+            self.write(pickle.POP)
+            if id(obj) in self.memo:
+                self.write(self.get(self.memo[id(obj)][0]))
+                return
+        self.save_reduce(_rebuild_function,
+                         (obj.func_code, obj.func_globals, obj.func_name,
+                          obj.func_defaults, closure),
+                         obj.__dict__ or None, obj=obj)
+    dispatch[FunctionType] = save_function
+
+    def save_code(self, obj):
+        self.save_reduce(_rebuild_code, (marshal.dumps(obj),), obj=obj)
+    dispatch[CodeType] = save_code
+
+    def save_method(self, obj):
+        self.save_reduce(MethodType, (obj.im_func, obj.im_self, obj.im_class),
+                         obj=obj)
+    dispatch[MethodType] = save_method
+
+    def save_builtin(self, obj):
+        receiver = getattr(obj, '__self__', None)
+        if receiver is None or type(receiver) is ModuleType:
+            raise CheckpointError("cannot save %r, not a global" % (obj,))
+        self.save_reduce(getattr, (receiver, obj.__name__), obj=obj)
+    dispatch[BuiltinFunctionType] = save_builtin
+    dispatch[type(EMPTY_CELL.__str__)] = save_builtin   # method-wrapper
+
+    def save_instance(self, obj):
+        self.save_reduced(obj, self.reduce_object(obj))
+    dispatch[InstanceType] = save_instance
+
+    def save_staticmethod(self, obj):
+        self.save_reduce(staticmethod, (obj.__get__(0),), obj=obj)
+    dispatch[staticmethod] = save_staticmethod
+
+    def save_classmethod(self, obj):
+        self.save_reduce(classmethod, (obj.__get__(0).im_func,), obj=obj)
+    dispatch[classmethod] = save_classmethod
+
+    def save_property(self, obj):
+        self.save_reduce(property, (obj.fget, obj.fset, obj.fdel, obj.__doc__),
+                         obj=obj)
+    dispatch[property] = save_property
+
+    def save_class(self, obj):
+        # a class that is not a global, e.g. made by a function: the
+        # class is created first, and its attributes set afterwards,
+        # because they often refer back to it
+        minimal = {'__module__': obj.__module__,
+                   '__doc__': obj.__dict__.get('__doc__')}
+        state = {}
+        for name, value in obj.__dict__.items():
+            if name in minimal or name in ('__dict__', '__weakref__',
+                                           '__slotnames__'):
+                continue
+            if type(value) is MemberDescriptorType:
+                continue     # a slot
+            if name == '__slots__':
+                minimal[name] = value
+            else:
+                state[name] = value
+        if isinstance(obj, ClassType):
+            self.save_reduce(_new_classic_class,
+                             (obj.__name__, obj.__bases__, minimal),
+                             state, obj=obj)
+        else:
+            if not obj.__flags__ & HEAPTYPE:
+                raise CheckpointError("cannot save %r, not a global" % (obj,))
+            self.save_reduce(_new_class, (type(obj), obj.__name__,
+                                          obj.__bases__, minimal),
+                             state, obj=obj)
+    dispatch[ClassType] = save_class
+    dispatch[TypeType] = save_class
+
+    def dump_shallow(self, objects):
+        """ Create the objects, without their content """
+        self.write(pickle.PROTO + chr(self.proto) + pickle.MARK)
+        for obj in objects:
+            self.save_reduce(copy_reg.__newobj__, (type(obj),), obj=obj)
+        self.write(pickle.LIST + pickle.STOP)
+
+    def dump_contents(self, objects):
+        """ Fill the objects created by dump_shallow() """
+        self.write(pickle.PROTO + chr(self.proto) + pickle.MARK)
+        for obj in objects:
+            func, args, state = self.reduce_object(obj)[:3]
+            assert args == (type(obj),)
+            self.save(obj)
+            if state is not None:
+                self.save(state)
+                self.write(pickle.BUILD)
+        self.write(pickle.LIST + pickle.STOP)
+
+    def dump_delayed(self):
+        while self.delayed:
+            delayed = self.delayed
+            self.delayed = []
+            self.dump(delayed)
+        self.dump(None)
+        self.dump(self.keepalive)
+        assert not self.delayed
+
+class CheckpointUnpickler(pickle.Unpickler):
+    dispatch = pickle.Unpickler.dispatch.copy()
+
+    def __init__(self, file, substitutes):
+        pickle.Unpickler.__init__(self, file)
+        self.substitutes = substitutes
+        self.globals = {}
+
+    def persistent_load(self, pid):
+        try:
+            return self.globals[pid]
+        except KeyError:
+            pass
+        kind = pid[0]
+        if kind == 's':
+            result = self.substitutes[pid[1]]
+        elif kind == 'm':
+            result = _import_module(pid[1])
+        elif kind == 'g':
+            result = _resolve_global(*pid[1:])
+        else:
+            raise CheckpointError("unknown reference %r" % (pid,))
+        self.globals[pid] = result
+        return result
+
+    def load_build(self):
+        state = self.stack.pop()
+        inst = self.stack[-1]
+        setstate = getattr(inst.__class__, '__setstate__', None)
+        if setstate is not None:
+            setstate(inst, state)
+            return
+        slotstate = None
+        if isinstance(state, tuple) and len(state) == 2:
+            state, slotstate = state
+        if isinstance(inst, (TypeType, ClassType)):
+            for name, value in state.items():
+                setattr(inst, name, value)
+            return
+        if state:
+            inst.__dict__.update(state)
+        if slotstate:
+            for name, value in slotstate.items():
+                object.__setattr__(inst, name, value)
+    dispatch[pickle.BUILD] = load_build
+
+# ____________________________________________________________
+
+def _substitutes(translator):
+    """ The objects that are taken from the translator of the process
+    loading the checkpoint: the translator itself and its configs
+    """
+    from pypy.config.config import Config
+    result = {('translator',): translator}
+    def add(config, path):
+        result[path] = config
+        for name, value in config._cfgimpl_values.items():
+            if isinstance(value, Config):
+                add(value, path + (name,))
+    for name in ('config', 'flowconfig'):
+        config = getattr(translator, name, None)
+        if config is not None:
+            add(config, (name,))
+    return result
+
+def _objspace_options(config):
+    result = {}
+    for path in config.getpaths():
+        if path.startswith('objspace.'):
+            result[path] = getattr(config, path)
+    return result
+
+def _graph_objects(translator):
+    objects = []
+    seen = {}
+    for graph in translator.graphs:
+        for obj in [graph] + list(graph.iterblocks()) + list(graph.iterlinks()):
+            if id(obj) not in seen:
+                seen[id(obj)] = True
+                objects.append(obj)
+    return objects
+
+def _raised_recursion_limit(func, *args):
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+    try:
+        return func(*args)
+    finally:
+        sys.setrecursionlimit(limit)
+
+def save_checkpoint(filename, translator, goals):
+    """ Write the state of translator, once goals are done, to filename """
+    header = {
+        'version': CHECKPOINT_VERSION,
+        'python': sys.version_info[:2],
+        'goals': list(goals),
+        'time': time.time(),
+        'objspace': _objspace_options(translator.config),
+        }
+    state = translator.__dict__.copy()
+    # bound to the driver, which sets it again
+    state.pop('driver_instrument_result', None)
+    # shared by the translators of the process, see flowcache.py
+    state.pop('flowcache', None)
+    objects = _graph_objects(translator)
+    start = time.time()
+    tmpname = filename + '.tmp'
+    f = open(tmpname, 'wb')
+    try:
+        pickle.dump(header, f, 2)
+        pickler = CheckpointPickler(f, GlobalNames(),
+                                    _substitutes(translator))
+        def dump():
+            pickler.dump_shallow(objects)
+            pickler.dump_contents(objects)
+            pickler.dump(state)
+            pickler.dump_delayed()
+        _raised_recursion_limit(dump)
+    finally:
+        f.close()
+    os.rename(tmpname, filename)
+    log.info("saved %s (%d graphs, %d KB) in %.1f seconds" % (
+        filename, len(translator.graphs), os.path.getsize(filename) // 1024,
+        time.time() - start))
+
+def read_header(filename):
+    f = open(filename, 'rb')
+    try:
+        try:
+            header = pickle.load(f)
+        except (EOFError, pickle.UnpicklingError):
+            raise CheckpointError("%s is not a checkpoint" % (filename,))
+        return header, f.tell()
+    finally:
+        f.close()
+
+def load_checkpoint(filename, translator):
+    """ Put the state saved in filename into translator, which should be
+    fresh.  Returns the goals that were done.
+    """
+    header, offset = read_header(filename)
+    if header.get('version') != CHECKPOINT_VERSION:
+        raise CheckpointError("%s was written by another version of the "
+                              "toolchain" % (filename,))
+    if header['python'] != sys.version_info[:2]:
+        raise CheckpointError("%s was written by Python %d.%d" % (
+            (filename,) + tuple(header['python'])))
+    options = _objspace_options(translator.config)
+    for path, value in header['objspace'].items():
+        if options.get(path, value) != value:
+            log.WARNING("%s was %r when the checkpoint was saved, it is %r "
+                        "now" % (path, value, options[path]))
+    start = time.time()
+    f = open(filename, 'rb')
+    try:
+        f.seek(offset)
+        unpickler = CheckpointUnpickler(f, _substitutes(translator))
+        def load():
+            unpickler.load()    # the graph objects, empty...
+            unpickler.load()    # ...and filled
+            state = unpickler.load()
+            delayed = []
+            while 1:
+                batch = unpickler.load()
+                if batch is None:
+                    break
+                delayed.extend(batch)
+            keepalive = unpickler.load()
+            return state, delayed, keepalive
+        state, delayed, keepalive = _raised_recursion_limit(load)
+    finally:
+        f.close()
+    for container, items in delayed:
+        container.update(items)
+    driver_instrument_result = getattr(translator, 'driver_instrument_result',
+                                       None)
+    translator.__dict__.update(state)
+    if driver_instrument_result is not None:
+        translator.driver_instrument_result = driver_instrument_result
+    translator._checkpoint_keepalive = keepalive
+    log.info("loaded %s (%d graphs) in %.1f seconds" % (
+        filename, len(translator.graphs), time.time() - start))
+    return header['goals']
+
+def latest_checkpoint(dirname):
+    found = []
+    for name in os.listdir(dirname):
+        if name.endswith('.checkpoint'):
+            filename = os.path.join(dirname, name)
+            found.append((os.path.getmtime(filename), filename))
+    if not found:
+        raise CheckpointError("no checkpoint in %s" % (dirname,))
+    found.sort()
+    return found[-1][1]
@@ -0,0 +1,407 @@
+""" A cache of flow graphs on disk, shared by translations and test runs
+
+The graph of a function is stored once it is built and simplified, under
+a key made of its bytecode, the name of its globals, the atomic values
+of its closure, the flowing flags and the version of the flow object
+space -- the source of the modules that build and simplify graphs.
+
+The flow space constant-folds the operations on the constants that the
+function reads: its globals, the attributes of modules and classes...
+These operations and their results are stored with the graph, and they
+are done again before the graph is taken from the cache; if any result
+differs, the graph is out of date and is built again.
+
+The graphs are pickled with the CheckpointPickler: the objects that they
+refer to are saved as references to the globals of a module, or to the
+function itself and the content of its closure.  A graph that refers to
+any other object that cannot be saved by value is not cached.
+"""
+
+import sys, os, md5, pickle, types, __builtin__
+from cStringIO import StringIO
+import py
+import pypy
+from pypy.objspace.flow.model import Constant
+from pypy.objspace.flow.operation import FunctionByName
+from pypy.objspace.flow.objspace import extract_cell_content
+from pypy.translator.tool.checkpoint import GlobalNames, CheckpointPickler
+from pypy.translator.tool.checkpoint import CheckpointUnpickler
+from pypy.translator.tool.checkpoint import CheckpointError, ATOMIC_TYPES
+from pypy.translator.tool.checkpoint import _resolve_global
+from pypy.translator.tool.checkpoint import _raised_recursion_limit
+from pypy.tool.ansi_print import ansi_log
+log = py.log.Producer("flowcache")
+py.log.setconsumer("flowcache", ansi_log)
+
+FLOWCACHE_VERSION = 1
+
+# the source of the flow object space, relative to the pypy directory
+SOURCE_DIRS = ['objspace/flow', 'interpreter']
+SOURCE_FILES = ['translator/simplify.py', 'translator/tool/flowcache.py',
+                'translator/tool/checkpoint.py']
+
+# the modules whose instances can be saved by value
+BYVALUE_MODULES = ['pypy.objspace.flow.', 'pypy.interpreter.pyopcode',
+                   'pypy.rlib.unroll']
+BYVALUE_TYPES = ATOMIC_TYPES + (tuple, list, dict, types.CodeType,
+                                types.MethodType)
+
+class Uncacheable(Exception):
+    pass
+
+_flowspace_version = []
+
+def flowspace_version():
+    """ The md5 of the source of the modules that build the graphs """
+    if not _flowspace_version:
+        pypydir = py.path.local(pypy.__file__).dirpath()
+        paths = []
+        for dirname in SOURCE_DIRS:
+            paths.extend(pypydir.join(dirname).listdir('*.py'))
+        paths.extend([pypydir.join(name) for name in SOURCE_FILES])
+        paths.sort()
+        m = md5.new()
+        for path in paths:
+            m.update('%s\0%s\0' % (path.relto(pypydir), path.read()))
+        _flowspace_version.append(m.hexdigest())
+    return _flowspace_version[0]
+
+def code_digest(code, m):
+    m.update(repr((code.co_name, code.co_argcount, code.co_nlocals,
+                   code.co_flags, code.co_code, code.co_names,
+                   code.co_varnames, code.co_freevars, code.co_cellvars)))
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            code_digest(const, m)
+        else:
+            m.update('%s %r\0' % (type(const).__name__, const))
+
+def closure_values(func):
+    if func.func_closure is None:
+        return []
+    return [extract_cell_content(cell) for cell in func.func_closure]
+
+def substitutes(func):
+    """ The objects that are taken from the function when loading """
+    result = {('func',): func}
+    if func.func_defaults:
+        result[('defaults',)] = func.func_defaults
+    values = closure_values(func)
+    for i in range(len(values)):
+        if type(values[i]) not in ATOMIC_TYPES:
+            result[('closure', i)] = values[i]
+    return result
+
+def is_value(fp):
+    return fp[0] == 'v' or (fp[0] == 't' and
+                            [x for x in fp[1:] if not is_value(x)] == [])
+
+def operation(name):
+    if name in ('repr', 'str'):
+        return getattr(__builtin__, name)
+    return FunctionByName[name]
+
+# ____________________________________________________________
+# fingerprints of the arguments and results of the folded operations:
+# ('v', atomic value), ('t', fingerprints of the items of a tuple),
+# ('im', fingerprints of im_func, im_self, im_class) or a persistent id
+
+def resolve(fp, unpickler):
+    kind = fp[0]
+    if kind == 'v':
+        return fp[1]
+    if kind == 't':
+        return tuple([resolve(x, unpickler) for x in fp[1:]])
+    if kind == 'im':
+        return types.MethodType(resolve(fp[1], unpickler),
+                                resolve(fp[2], unpickler),
+                                resolve(fp[3], unpickler))
+    return unpickler.persistent_load(fp)
+
+def matches(fp, obj, unpickler):
+    kind = fp[0]
+    if kind == 'v':
+        return type(obj) is type(fp[1]) and obj == fp[1]
+    if kind == 't':
+        if type(obj) is not tuple or len(obj) != len(fp) - 1:
+            return False
+        for i in range(len(obj)):
+            if not matches(fp[i + 1], obj[i], unpickler):
+                return False
+        return True
+    if kind == 'im':
+        return (type(obj) is types.MethodType and
+                matches(fp[1], obj.im_func, unpickler) and
+                matches(fp[2], obj.im_self, unpickler) and
+                matches(fp[3], obj.im_class, unpickler))
+    return obj is unpickler.persistent_load(fp)
+
+def still_valid(dependencies, unpickler):
+    """ Do the folded operations again, checking their results """
+    for name, argfps, (kind, fp) in dependencies:
+        args = [resolve(argfp, unpickler) for argfp in argfps]
+        try:
+            result = operation(name)(*args)
+        except:
+            if kind != 'e' or not matches(fp, sys.exc_info()[0], unpickler):
+                return False
+        else:
+            if kind != 'r' or not matches(fp, result, unpickler):
+                return False
+    return True
+
+# ____________________________________________________________
+
+class FlowGraphPickler(CheckpointPickler):
+
+    def __init__(self, file, cache, substitutes):
+        CheckpointPickler.__init__(self, file, cache.globalnames, substitutes)
+        self.cache = cache
+
+    def persistent_id(self, obj):
+        return self.cache.name(obj, self.substitutes)
+
+    def save(self, obj):
+        if id(obj) not in self.memo:
+            if type(obj) is Constant:
+                # prebuilt lists, dicts and instances must stay the
+                # same objects, only the internal containers of the
+                # graph are saved by value
+                self.check_value(obj.value)
+            elif not by_value(obj) and self.persistent_id(obj) is None:
+                raise Uncacheable("%r is not a global" % (obj,))
+        CheckpointPickler.save(self, obj)
+
+    def fingerprint(self, obj):
+        t = type(obj)
+        if t in ATOMIC_TYPES:
+            return ('v', obj)
+        if t is tuple:
+            return ('t',) + tuple([self.fingerprint(x) for x in obj])
+        pid = self.persistent_id(obj)
+        if pid is not None:
+            return pid
+        if t is types.MethodType:
+            return ('im', self.fingerprint(obj.im_func),
+                    self.fingerprint(obj.im_self),
+                    self.fingerprint(obj.im_class))
+        raise Uncacheable("%r is not a global" % (obj,))
+
+    def check_value(self, value):
+        """ Raise Uncacheable if value cannot be the value of a Constant
+        of a cached graph """
+        t = type(value)
+        if t in ATOMIC_TYPES or t is types.CodeType:
+            pass
+        elif t is tuple:
+            for item in value:
+                self.check_value(item)
+        elif self.persistent_id(value) is not None:
+            pass
+        elif t is types.MethodType:
+            self.check_value(value.im_func)
+            self.check_value(value.im_self)
+            self.check_value(value.im_class)
+        elif not (isinstance(value, Exception) and
+                  self.persistent_id(value.__class__) is not None):
+            raise Uncacheable("%r is not a global" % (value,))
+
+    def dependencies(self, foldings):
+        result = []
+        seen = {}
+        for name, args, value, exc_class in foldings:
+            argfps = tuple([self.fingerprint(arg) for arg in args])
+            if is_value(('t',) + argfps) or (name, argfps) in seen:
+                continue    # does not depend on the program being flowed
+            seen[name, argfps] = True
+            if exc_class is None:
+                result.append((name, argfps, ('r', self.fingerprint(value))))
+            else:
+                result.append((name, argfps, ('e', self.fingerprint(exc_class))))
+        return result
+
+    def dump_graph(self, graph):
+        objects = [graph]
+        objects.extend(graph.iterblocks())
+        objects.extend(graph.iterlinks())
+        self.dump_shallow(objects)
+        self.dump_contents(objects)
+        self.dump(graph)
+        self.dump_delayed()
+
+def by_value(obj):
+    if isinstance(obj, BYVALUE_TYPES) or isinstance(obj, Exception):
+        return True
+    modname = getattr(type(obj), '__module__', '')
+    for prefix in BYVALUE_MODULES:
+        if modname.startswith(prefix):
+            return True
+    return False
+
+def load_graph(unpickler):
+    unpickler.load()    # the flow objects, empty...
+    unpickler.load()    # ...and filled
+    graph = unpickler.load()
+    delayed = []
+    while 1:
+        batch = unpickler.load()
+        if batch is None:
+            break
+        delayed.extend(batch)
+    keepalive = unpickler.load()
+    for container, items in delayed:
+        container.update(items)
+    return graph, keepalive
+
+# ____________________________________________________________
+
+class FlowGraphCache(object):
+
+    def __init__(self, dirname):
+        self.dirname = py.path.local(dirname)
+        self.dirname.ensure(dir=1)
+        self.globalnames = None    # built by the first store()
+        self.nmodules = 0
+        self.resolved = {}         # id(obj) -> (obj, resolves to obj?)
+        self.keepalive = []
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.uncacheable = 0
+
+    def key(self, func, flags):
+        """ The key of the graph of func, or None if it cannot be cached """
+        globals = func.func_globals
+        modname = globals.get('__name__')
+        module = sys.modules.get(modname)
+        if module is None or module.__dict__ is not globals:
+            return None
+        try:
+            values = closure_values(func)
+        except ValueError:
+            return None
+        m = md5.new('%d %s %s\0' % (FLOWCACHE_VERSION, flowspace_version(),
+                                    sys.version))
+        items = flags.items()
+        items.sort()
+        # see FlowObjSpace.build_flow()
+        class_ = getattr(func, 'class_', None)
+        m.update('%r %s %s %s\0' % (items, modname, func.func_name,
+                                     getattr(class_, '__name__', None)))
+        code_digest(func.func_code, m)
+        for value in values:
+            if type(value) in ATOMIC_TYPES:
+                m.update('%s %r\0' % (type(value).__name__, value))
+            else:
+                m.update('%s\0' % (type(value).__name__,))
+        return m.hexdigest()
+
+    def path(self, key):
+        return self.dirname.join(key[:2], key[2:] + '.graph')
+
+    def name(self, obj, substitutes):
+        """ The persistent id of obj, or None """
+        entry = substitutes.get(id(obj))
+        if entry is not None and entry[0] is obj:
+            return entry[1]
+        if type(obj) is types.ModuleType:
+            return ('m', obj.__name__)
+        pid = self.globalnames.lookup(obj)
+        if pid is not None:
+            # the global may have been replaced since it was registered
+            entry = self.resolved.get(id(obj))
+            if entry is None or entry[0] is not obj:
+                try:
+                    current = _resolve_global(*pid[1:])
+                except CheckpointError:
+                    current = None
+                entry = obj, current is obj
+                self.resolved[id(obj)] = entry
+            if not entry[1]:
+                return None
+        return pid
+
+    def load(self, func, key):
+        """ The graph of func stored under key, or None """
+        path = self.path(key)
+        if not path.check():
+            self.misses += 1
+            return None
+        try:
+            f = path.open('rb')
+        except py.error.Error:
+            self.misses += 1
+            return None
+        try:
+            try:
+                dependencies = pickle.load(f)
+                unpickler = CheckpointUnpickler(f, substitutes(func))
+                if not still_valid(dependencies, unpickler):
+                    self.stale += 1
+                    return None
+                graph, keepalive = _raised_recursion_limit(load_graph,
+                                                           unpickler)
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except Exception, e:
+                log.WARNING("cannot load %s: %s: %s" % (
+                    path, e.__class__.__name__, e))
+                self.stale += 1
+                return None
+        finally:
+            f.close()
+        self.keepalive.append(keepalive)
+        graph.defaults = func.func_defaults or ()
+        self.hits += 1
+        return graph
+
+    def store(self, func, key, graph, foldings):
+        if self.globalnames is None:
+            self.globalnames = GlobalNames()
+        elif len(sys.modules) != self.nmodules:
+            self.globalnames.update()
+            self.resolved.clear()
+        self.nmodules = len(sys.modules)
+        subst = substitutes(func)
+        subst.pop(('defaults',), None)
+        data = StringIO()
+        pickler = FlowGraphPickler(data, self, subst)
+        # graph.defaults is set from the function when loading
+        defaults = graph.__dict__.pop('defaults', None)
+        try:
+            try:
+                pickle.dump(pickler.dependencies(foldings), data, 2)
+                _raised_recursion_limit(pickler.dump_graph, graph)
+            except (Uncacheable, CheckpointError, pickle.PicklingError), e:
+                self.uncacheable += 1
+                return False
+        finally:
+            if defaults is not None:
+                graph.defaults = defaults
+        path = self.path(key)
+        path.dirpath().ensure(dir=1)
+        # several processes can use the cache at the same time
+        tmp = path.new(basename='%s.%d.tmp' % (path.basename, os.getpid()))
+        tmp.write(data.getvalue(), 'wb')
+        tmp.rename(path)
+        return True
+
+    def report(self):
+        total = self.hits + self.misses + self.stale
+        if total:
+            log.info("%d of %d graphs taken from the cache (%d%%), %d out "
+                     "of date, %d could not be stored" % (
+                self.hits, total, 100 * self.hits // total, self.stale,
+                self.uncacheable))
+
+_caches = {}
+
+def get_flowcache(dirname):
+    """ The cache of the graphs in dirname, shared by the translators of
+    the process """
+    dirname = os.path.abspath(dirname)
+    try:
+        return _caches[dirname]
+    except KeyError:
+        cache = _caches[dirname] = FlowGraphCache(dirname)
+        return cache
@@ -9,6 +9,12 @@ from pypy.tool.uid import uid
 
 from dotviewer.graphpage import GraphPage
 
+# blocks flown in and graphs reflown at least that many times by the
+# annotator are highlighted, as well as the calls that made it generalize
+# the annotations of a graph that many times
+HOT_REFLOWS = 5
+HOT_COLOR = '#ffcc66'
+
 
 class VariableHistoryGraphPage(GraphPage):
     """ A GraphPage showing the history of variable bindings. """
@@ -95,6 +101,10 @@ class FlowGraphPage(GraphPage):
                 graphs += graphsof(translator, translator.entrypoint)
         gs = [(graph.name, graph) for graph in graphs]
         gs.sort(lambda (_, g), (__ ,h): cmp(g.tag, h.tag))
+        if self.annotator:
+            for block, count in self.annotator.reflowcounter.items():
+                if count >= HOT_REFLOWS:
+                    block.blockcolor = HOT_COLOR
         if self.annotator and self.annotator.blocked_graphs:
             for block, was_annotated in self.annotator.annotated.items():
                 if not was_annotated:
@@ -255,6 +265,7 @@ class BaseTranslatorPage(GraphPage):
                     data += ':%d' % graph.func.func_code.co_firstlineno
                 if hasattr(graph, 'source'):
                     data += '\n%s' % graph.source.split('\n', 1)[0]
+                data += self.reflow_info(graph)
             else:
                 continue
             self.links.setdefault(name, data)
@@ -272,6 +283,37 @@ class BaseTranslatorPage(GraphPage):
                         blocked_graphs[graph] = True
         return blocked_graphs
 
+    def get_hot_graphs(self, graphs):
+        annotator = self.translator.annotator
+        hot_graphs = {}
+        if annotator:
+            for graph in graphs:
+                if annotator.graph_reflowcounter.get(graph, 0) >= HOT_REFLOWS:
+                    hot_graphs[graph] = True
+        return hot_graphs
+
+    def reflow_info(self, graph):
+        annotator = self.translator.annotator
+        if not annotator or graph not in annotator.graph_reflowcounter:
+            return ''
+        counts = [annotator.reflowcounter.get(block, 0)
+                  for block in graph.iterblocks()]
+        return '\nblocks reflown %d times, the hottest one %d times' % (
+            annotator.graph_reflowcounter[graph], max(counts) - 1)
+
+    def emit_call_edge(self, dotgen, g1, g2):
+        # label the calls along which annotations were generalized
+        annotator = self.translator.annotator
+        count = 0
+        if annotator:
+            count = (annotator.generalizations.get((g1, g2), 0) +
+                     annotator.generalizations.get((g2, g1), 0))
+        if count >= HOT_REFLOWS:
+            dotgen.emit_edge(nameof(g1), nameof(g2), label=str(count),
+                             color="red")
+        else:
+            dotgen.emit_edge(nameof(g1), nameof(g2))
+
     def compute_class_hieararchy(self, dotgen):
         # show the class hierarchy
         if self.translator.annotator:
@@ -322,6 +364,7 @@ class TranslatorPage(BaseTranslatorPage):
             return
 
         blocked_graphs = self.get_blocked_graphs(graphs)
+        hot_graphs = self.get_hot_graphs(graphs)
 
         highlight_graphs = getattr(translator, 'highlight_graphs', {}) # XXX
         dotgen.emit_node('entry', fillcolor="green", shape="octagon",
@@ -332,13 +375,15 @@ class TranslatorPage(BaseTranslatorPage):
                 kw = {'fillcolor': 'red'}
             elif graph in highlight_graphs:
                 kw = {'fillcolor': '#ffcccc'}
+            elif graph in hot_graphs:
+                kw = {'fillcolor': HOT_COLOR}
             else:
                 kw = {}
             dotgen.emit_node(nameof(graph), label=data, shape="box", **kw)
         if graphs:
             dotgen.emit_edge('entry', nameof(graphs[0]), color="green")
         for g1, g2 in callgraph:  # captured above (multithreading fun)
-            dotgen.emit_edge(nameof(g1), nameof(g2))
+            self.emit_call_edge(dotgen, g1, g2)
 
         # show the class hierarchy
         self.compute_class_hieararchy(dotgen)
@@ -369,12 +414,13 @@ class LocalizedCallGraphPage(BaseTranslatorPage):
         # show all edges that exist between these graphs
         for g1, g2 in translator.callgraph.values():
             if g1 in graphs and g2 in graphs:
-                dotgen.emit_edge(nameof(g1), nameof(g2))
+                self.emit_call_edge(dotgen, g1, g2)
 
         graphs = graphs.keys()
 
         # show the call graph
         blocked_graphs = self.get_blocked_graphs(graphs)
+        hot_graphs = self.get_hot_graphs(graphs)
 
         highlight_graphs = getattr(translator, 'highlight_graphs', {}) # XXX
         for graph in graphs:
@@ -383,6 +429,8 @@ class LocalizedCallGraphPage(BaseTranslatorPage):
                 kw = {'fillcolor': 'red'}
             elif graph in highlight_graphs:
                 kw = {'fillcolor': '#ffcccc'}
+            elif graph in hot_graphs:
+                kw = {'fillcolor': HOT_COLOR}
             else:
                 kw = {}
             dotgen.emit_node(nameof(graph), label=data, shape="box", **kw)
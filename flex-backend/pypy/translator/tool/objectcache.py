@@ -0,0 +1,143 @@
+""" A cache of compiled object files, shared by all translations
+
+Like ccache, the object file of a .c file is found by the hash of its
+preprocessed source, of the compiler command and flags and of the
+version of the compiler.  The line markers of the preprocessor are left
+out of the hash, so that the same source in the directory of another
+translation gives the same key.  The cache is bounded: when it grows
+above its size, the objects used the longest time ago are removed.
+"""
+
+import os, md5, marshal
+import py
+from pypy.tool.ansi_print import ansi_log
+log = py.log.Producer("objectcache")
+py.log.setconsumer("objectcache", ansi_log)
+
+DEFAULT_MAXSIZE = 1024 * 1024 * 1024
+STATS_NAME = 'stats'
+
+_versions = {}
+
+def compiler_version(executable):
+    try:
+        return _versions[executable]
+    except KeyError:
+        f = os.popen('"%s" --version 2>&1' % (executable,))
+        try:
+            version = f.read()
+        finally:
+            f.close()
+        _versions[executable] = version
+        return version
+
+def is_line_marker(line):
+    return line.startswith('#line') or (line.startswith('# ') and
+                                        line[2:3].isdigit())
+
+def strip_line_markers(source):
+    lines = [line for line in source.split('\n') if not is_line_marker(line)]
+    return '\n'.join(lines)
+
+class ObjectCache(object):
+    def __init__(self, dirname, maxsize=DEFAULT_MAXSIZE):
+        self.dirname = py.path.local(dirname)
+        self.dirname.ensure(dir=1)
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0, 0
+
+    def key(self, preprocessed, command):
+        """ The key of a preprocessed source compiled with command, a
+        list starting with the compiler """
+        m = md5.new(compiler_version(command[0]))
+        m.update('\0' + ' '.join(command) + '\0')
+        m.update(strip_line_markers(preprocessed))
+        return m.hexdigest()
+
+    def path(self, key):
+        return self.dirname.join(key[:2], key[2:] + '.o')
+
+    def get(self, key, objfile):
+        """ Copy the object cached under key to objfile; returns False if
+        there is none """
+        cached = self.path(key)
+        if not cached.check():
+            self.misses += 1
+            return False
+        cached.copy(py.path.local(objfile))
+        os.utime(str(cached), None)    # the time of the last use
+        self.hits += 1
+        return True
+
+    def put(self, key, objfile):
+        cached = self.path(key)
+        cached.dirpath().ensure(dir=1)
+        # several translations can use the cache at the same time
+        tmp = cached.new(basename='%s.%d.tmp' % (cached.basename,
+                                                 os.getpid()))
+        py.path.local(objfile).copy(tmp)
+        tmp.rename(cached)
+
+    def cleanup(self):
+        """ Remove the objects used the longest time ago until the cache
+        is back to 90% of its size; returns the size of the cache """
+        files = []
+        total = 0
+        for path in self.dirname.visit('*.o'):
+            stat = path.stat()
+            files.append((stat.mtime, stat.size, path))
+            total += stat.size
+        if total <= self.maxsize:
+            return total
+        files.sort()
+        for mtime, size, path in files:
+            if total <= self.maxsize * 0.9:
+                break
+            try:
+                path.remove()
+            except py.error.Error:
+                continue
+            total -= size
+        return total
+
+    def load_stats(self):
+        try:
+            f = self.dirname.join(STATS_NAME).open('rb')
+        except py.error.Error:
+            return {'hits': 0, 'misses': 0}
+        try:
+            try:
+                return marshal.load(f)
+            except (EOFError, ValueError, TypeError):
+                return {'hits': 0, 'misses': 0}
+        finally:
+            f.close()
+
+    def finish(self):
+        """ Evict old objects, record and report the hit rate of this
+        build and of all the builds using the cache """
+        size = self.cleanup()
+        stats = self.load_stats()
+        hits, misses = self.recorded
+        stats['hits'] += self.hits - hits
+        stats['misses'] += self.misses - misses
+        self.recorded = self.hits, self.misses
+        f = self.dirname.join(STATS_NAME).open('wb')
+        try:
+            marshal.dump(stats, f)
+        finally:
+            f.close()
+        log.info("%d hits, %d misses (%s), %d MB cached; "
+                 "%d hits, %d misses (%s) since the cache was created" % (
+            self.hits, self.misses, hit_rate(self.hits, self.misses),
+            size // (1024 * 1024),
+            stats['hits'], stats['misses'],
+            hit_rate(stats['hits'], stats['misses'])))
+        return stats
+
+def hit_rate(hits, misses):
+    if hits + misses == 0:
+        return '-'
+    return '%d%%' % (100 * hits // (hits + misses))
@@ -0,0 +1,195 @@
+""" Profile of the translation tasks
+
+TaskProfile records, for every task run by the TranslationDriver, the
+wall and CPU time it took, the peak and current resident set size of the
+process after it, how much the task raised each of them, and the number
+of graphs, blocks and operations of the translator.  The peak is the
+high-water mark of the whole process since it started, not of the task:
+only its growth during a task ('peak_rss_growth_kb') belongs to that
+task.  The records are written as JSON, as 'folded stacks' that
+flamegraph.pl and similar tools understand, and as a text summary.
+"""
+
+import os, re, time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PROFILE_VERSION = 1
+
+def peak_rss():
+    """ Peak resident set size of the process since it started, in
+    kilobytes, or None """
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if os.uname()[0] == 'Darwin':
+        maxrss //= 1024    # bytes there
+    return maxrss
+
+def current_rss():
+    """ Current resident set size in kilobytes, or None """
+    try:
+        f = open('/proc/self/statm')
+    except IOError:
+        return None
+    try:
+        pages = int(f.read().split()[1])
+    finally:
+        f.close()
+    return pages * (os.sysconf('SC_PAGE_SIZE') // 1024)
+
+def cpu_time():
+    t = os.times()
+    return t[0] + t[1]
+
+def count_graphs(translator):
+    """ Return (graphs, blocks, operations) of the translator """
+    if translator is None:
+        return 0, 0, 0
+    blocks = ops = 0
+    for graph in translator.graphs:
+        for block in graph.iterblocks():
+            blocks += 1
+            ops += len(block.operations)
+    return len(translator.graphs), blocks, ops
+
+_escape = re.compile(r'[\\"\x00-\x1f]')
+_escapes = {'\\': r'\\', '"': r'\"', '\b': r'\b', '\f': r'\f',
+            '\n': r'\n', '\r': r'\r', '\t': r'\t'}
+for _i in range(0x20):
+    _escapes.setdefault(chr(_i), '\\u%04x' % _i)
+del _i
+
+def _escape_char(match):
+    return _escapes[match.group()]
+
+def _json(value):
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, (int, long)):
+        return str(value)
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, str):
+        return '"%s"' % _escape.sub(_escape_char, value)
+    if isinstance(value, (list, tuple)):
+        return '[%s]' % ', '.join([_json(item) for item in value])
+    if isinstance(value, dict):
+        keys = value.keys()
+        keys.sort()
+        return '{%s}' % ', '.join(['%s: %s' % (_json(key), _json(value[key]))
+                                   for key in keys])
+    raise TypeError("cannot write %r as JSON" % (value,))
+
+class TaskProfile(object):
+    def __init__(self):
+        self.records = []
+        self.stack = []
+
+    def measure(self, goal, title, func, translator=None):
+        """ Call func, recording what it costs under the name goal """
+        self.stack.append(goal)
+        # appended now so that the records stay in the order the tasks
+        # were started in, parents before the tasks they run
+        record = {'goal': goal, 'title': title, 'stack': ';'.join(self.stack)}
+        self.records.append(record)
+        start_wall = time.time()
+        start_cpu = cpu_time()
+        start_rss = current_rss()
+        start_peak = peak_rss()
+        failed = True
+        try:
+            result = func()
+            failed = False
+            return result
+        finally:
+            self.stack.pop()
+            graphs, blocks, ops = count_graphs(translator)
+            end_rss = current_rss()
+            end_peak = peak_rss()
+            record.update({
+                'wall': time.time() - start_wall,
+                'cpu': cpu_time() - start_cpu,
+                # of the process, see the module docstring
+                'peak_rss_kb': end_peak,
+                'peak_rss_growth_kb': _growth(start_peak, end_peak),
+                'rss_kb': end_rss,
+                'rss_growth_kb': _growth(start_rss, end_rss),
+                'graphs': graphs,
+                'blocks': blocks,
+                'operations': ops,
+                'failed': failed,
+            })
+
+    def self_times(self):
+        """ Wall time of every record minus the time of the tasks run
+        from inside it
+        """
+        result = []
+        for record in self.records:
+            prefix = record['stack'] + ';'
+            depth = record['stack'].count(';') + 1
+            children = 0.0
+            for other in self.records:
+                if (other['stack'].startswith(prefix) and
+                        other['stack'].count(';') == depth):
+                    children += other['wall']
+            result.append((record, max(record['wall'] - children, 0.0)))
+        return result
+
+    def write_json(self, filename):
+        f = open(filename, 'w')
+        try:
+            f.write(_json({'version': PROFILE_VERSION,
+                           'time': time.time(),
+                           'tasks': self.records}))
+            f.write('\n')
+        finally:
+            f.close()
+
+    def write_folded(self, filename):
+        """ One 'task;subtask milliseconds' line per task """
+        f = open(filename, 'w')
+        try:
+            for record, self_time in self.self_times():
+                f.write('%s %d\n' % (record['stack'], int(self_time * 1000)))
+        finally:
+            f.close()
+
+    def summary(self, width=30):
+        total = 0.0
+        for record, self_time in self.self_times():
+            total += self_time
+        lines = ['%-28s %9s %9s %12s %9s %9s %10s  %s' % (
+            'task', 'wall (s)', 'cpu (s)', 'proc peak MB', '+peak MB',
+            '+rss MB', 'ops', 'share of the time')]
+        for record, self_time in self.self_times():
+            if total:
+                bar = '#' * int(round(width * self_time / total))
+            else:
+                bar = ''
+            lines.append('%-28s %9.1f %9.1f %12s %9s %9s %10d  %s' % (
+                '  ' * record['stack'].count(';') + record['goal'],
+                record['wall'], record['cpu'],
+                _megabytes(record['peak_rss_kb']),
+                _megabytes(record['peak_rss_growth_kb']),
+                _megabytes(record['rss_growth_kb']),
+                record['operations'], bar))
+        return '\n'.join(lines)
+
+def _growth(start, end):
+    if start is None or end is None:
+        return None
+    return end - start
+
+def _megabytes(kb):
+    if kb is None:
+        return '-'
+    return '%.0f' % (kb / 1024.0)
@@ -0,0 +1,92 @@
+import py
+from pypy.translator.translator import TranslationContext, graphof
+from pypy.translator.driver import TranslationDriver
+from pypy.translator.tool.checkpoint import save_checkpoint, load_checkpoint
+from pypy.translator.tool.checkpoint import read_header, latest_checkpoint
+from pypy.translator.tool.checkpoint import CheckpointError
+from pypy.rpython.llinterp import LLInterpreter
+from pypy.tool.udir import udir
+
+class Shape(object):
+    def __init__(self, size):
+        self.size = size
+    def area(self):
+        return self.size * self.size
+
+class Circle(Shape):
+    def area(self):
+        return self.size * 3
+
+def make_adder(n):
+    def adder(x):
+        return x + n
+    return adder
+
+add5 = make_adder(5)
+
+def entry(x):
+    if x > 10:
+        shape = Circle(x)
+    else:
+        shape = Shape(x)
+    return add5(shape.area())
+
+def annotated():
+    t = TranslationContext()
+    t.buildannotator().build_types(entry, [int])
+    return t
+
+def roundtrip(t, name, goals):
+    filename = str(udir.join(name))
+    save_checkpoint(filename, t, goals)
+    t2 = TranslationContext()
+    assert load_checkpoint(filename, t2) == goals
+    return t2
+
+def test_annotated():
+    t = annotated()
+    t2 = roundtrip(t, 'annotated.checkpoint', ['annotate'])
+    assert len(t2.graphs) == len(t.graphs)
+    graph = graphof(t2, entry)
+    assert graph is not graphof(t, entry)
+    assert t2.annotator.translator is t2
+    assert t2.annotator.binding(graph.getreturnvar()).knowntype is int
+    # the state can be used further
+    t2.buildrtyper().specialize()
+    interp = LLInterpreter(t2.rtyper)
+    assert interp.eval_graph(graph, [3]) == 14
+    assert interp.eval_graph(graph, [20]) == 65
+
+def test_rtyped():
+    t = annotated()
+    t.buildrtyper().specialize()
+    t2 = roundtrip(t, 'rtyped.checkpoint', ['annotate', 'rtype_lltype'])
+    assert t2.rtyper.annotator is t2.annotator
+    interp = LLInterpreter(t2.rtyper)
+    assert interp.eval_graph(graphof(t2, entry), [20]) == 65
+
+def test_header():
+    filename = str(udir.join('header.checkpoint'))
+    save_checkpoint(filename, annotated(), ['annotate'])
+    header, offset = read_header(filename)
+    assert header['goals'] == ['annotate']
+    assert latest_checkpoint(str(udir)).endswith('.checkpoint')
+    bad = udir.join('bad.checkpoint')
+    bad.write('')
+    py.test.raises(CheckpointError, read_header, str(bad))
+    bad.remove()
+
+def test_driver():
+    dirname = udir.join('checkpoints')
+    td = TranslationDriver(overrides={'translation.checkpoint_dir':
+                                      str(dirname)})
+    td.setup(entry, [int])
+    td.proceed(['annotate'])
+    assert dirname.join('annotate.checkpoint').check()
+
+    td = TranslationDriver(overrides={'translation.resume': str(dirname)})
+    td.setup(entry, [int])
+    assert 'annotate' in td.done
+    td.proceed(['rtype'])
+    interp = LLInterpreter(td.translator.rtyper)
+    assert interp.eval_graph(graphof(td.translator, entry), [3]) == 14
@@ -0,0 +1,102 @@
+from pypy.tool.udir import udir
+from pypy.translator.translator import TranslationContext
+from pypy.translator.tool.flowcache import FlowGraphCache
+from pypy.objspace.flow.model import summary, checkgraph
+
+LIMIT = 10
+
+class A(object):
+    factor = 3
+    def __init__(self, x):
+        self.x = x
+    def method(self):
+        return self.x * self.factor
+
+def f(n):
+    result = 0
+    for i in range(n):
+        if i < LIMIT:
+            result += A(i).method()
+    return result
+
+def make_closure(cls):
+    def g(x):
+        return cls(x).x
+    return g
+
+def build(cache, func):
+    t = TranslationContext()
+    t.flowcache = cache
+    graph = t.buildflowgraph(func)
+    checkgraph(graph)
+    return graph
+
+def test_hit():
+    cache = FlowGraphCache(udir.join('flowcache_hit'))
+    graph1 = build(cache, f)
+    assert (cache.hits, cache.misses) == (0, 1)
+    graph2 = build(cache, f)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert graph2 is not graph1
+    assert graph2.func is f
+    assert summary(graph2) == summary(graph1)
+    consts = [op.args[0].value for op in graph2.startblock.operations
+              if op.opname == 'simple_call']
+    assert consts == [range]
+
+def test_global_changed():
+    global LIMIT
+    cache = FlowGraphCache(udir.join('flowcache_global'))
+    build(cache, f)
+    LIMIT = 20
+    try:
+        graph = build(cache, f)
+    finally:
+        LIMIT = 10
+    assert (cache.hits, cache.misses, cache.stale) == (0, 1, 1)
+    found = []
+    for block in graph.iterblocks():
+        for op in block.operations:
+            if op.opname == 'lt':
+                found.append(op.args[1].value)
+    assert found == [20]
+    build(cache, f)
+    assert cache.stale == 2
+
+def test_class_attribute_changed():
+    cache = FlowGraphCache(udir.join('flowcache_attr'))
+    def h(x):
+        return x * A.factor
+    build(cache, h)
+    build(cache, h)
+    assert (cache.hits, cache.stale) == (1, 0)
+    A.factor = 4
+    try:
+        build(cache, h)
+    finally:
+        A.factor = 3
+    assert (cache.hits, cache.stale) == (1, 1)
+
+def test_closure():
+    cache = FlowGraphCache(udir.join('flowcache_closure'))
+    class B(A):
+        pass
+    class C(A):
+        pass
+    graph1 = build(cache, make_closure(B))
+    graph2 = build(cache, make_closure(C))
+    assert cache.hits == 1
+    consts = [op.args[0].value for op in graph2.startblock.operations
+              if op.opname == 'simple_call']
+    assert consts == [C]
+
+PREBUILT = ([1, 2, 3],)
+
+def test_uncacheable():
+    # the list is not a global, it cannot be saved as a reference
+    cache = FlowGraphCache(udir.join('flowcache_uncacheable'))
+    def k(i):
+        return PREBUILT[0][i]
+    build(cache, k)
+    build(cache, k)
+    assert (cache.hits, cache.uncacheable) == (0, 2)
@@ -0,0 +1,69 @@
+import py, os
+
+from pypy.tool.udir import udir
+from pypy.translator.tool.cbuild import CCompiler, ProfOpt
+from pypy.translator.tool.objectcache import ObjectCache
+
+def build(dirname, cache, body, profbased=None):
+    dirname = udir.ensure(dirname, dir=1)
+    cfile = dirname.join('test.c')
+    cfile.write(r"""
+        #include <stdio.h>
+        int main() {
+            %s
+            return 0;
+        }
+""" % body)
+    compiler = CCompiler([cfile], object_cache=cache, profbased=profbased)
+    compiler.build()
+    return py.process.cmdexec(str(compiler.outputfilename))
+
+def test_hits_across_directories():
+    if os.name == 'nt':
+        py.test.skip("no object cache on Windows")
+    cache = ObjectCache(udir.join('objectcache1'))
+    out = build('objectcache_a', cache, r'printf("hello\n");')
+    assert out == 'hello\n'
+    assert (cache.hits, cache.misses) == (0, 1)
+    out = build('objectcache_b', cache, r'printf("hello\n");')
+    assert out == 'hello\n'
+    assert (cache.hits, cache.misses) == (1, 1)
+    out = build('objectcache_c', cache, r'printf("world\n");')
+    assert out == 'world\n'
+    assert (cache.hits, cache.misses) == (1, 2)
+    stats = cache.load_stats()
+    assert stats == {'hits': 1, 'misses': 2}
+
+def test_bypassed_by_profile_based_builds():
+    if os.name == 'nt':
+        py.test.skip("no object cache on Windows")
+    cache = ObjectCache(udir.join('objectcache4'))
+    out = build('objectcache_d', cache, r'printf("hello\n");')
+    assert (cache.hits, cache.misses) == (0, 1)
+    # both builds of ProfOpt compile the file again, even though it is
+    # in the cache
+    out = build('objectcache_e', cache, r'printf("hello\n");',
+                profbased=(ProfOpt, ''))
+    assert out == 'hello\n'
+    assert (cache.hits, cache.misses) == (0, 1)
+
+def test_key():
+    cache = ObjectCache(udir.join('objectcache2'))
+    key = cache.key('# 1 "/tmp/a/x.c"\nint x;\n', ['cc', '-O2'])
+    assert cache.key('# 1 "/tmp/b/x.c"\nint x;\n', ['cc', '-O2']) == key
+    assert cache.key('# 1 "/tmp/a/x.c"\nint y;\n', ['cc', '-O2']) != key
+    assert cache.key('# 1 "/tmp/a/x.c"\nint x;\n', ['cc', '-O3']) != key
+
+def test_eviction():
+    cache = ObjectCache(udir.join('objectcache3'), maxsize=2500)
+    obj = udir.join('objectcache3.o')
+    obj.write('x' * 1000)
+    for i, key in enumerate(['aa1', 'bb2', 'cc3']):
+        cache.put(key, obj)
+        os.utime(str(cache.path(key)), (1000 + i, 1000 + i))
+    # using the oldest one makes it the most recent
+    assert cache.get('aa1', udir.join('objectcache3.out'))
+    assert cache.cleanup() == 2000
+    assert not cache.path('bb2').check()
+    assert cache.path('aa1').check()
+    assert cache.path('cc3').check()
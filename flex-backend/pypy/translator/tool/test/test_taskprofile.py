@@ -0,0 +1,75 @@
+from pypy.translator.tool.taskprofile import TaskProfile, _json
+from pypy.tool.udir import udir
+
+def test_measure_nested():
+    profile = TaskProfile()
+    def inner():
+        return 42
+    def outer():
+        return profile.measure('inner', 'Inner', inner)
+    assert profile.measure('outer', 'Outer', outer) == 42
+    assert [record['stack'] for record in profile.records] == [
+        'outer', 'outer;inner']
+    for record in profile.records:
+        assert record['wall'] >= 0
+        assert record['cpu'] >= 0
+        assert not record['failed']
+    selftimes = dict([(record['goal'], self_time)
+                      for record, self_time in profile.self_times()])
+    outer_record = profile.records[0]
+    assert selftimes['outer'] <= outer_record['wall']
+
+def test_measure_failure():
+    profile = TaskProfile()
+    def fails():
+        raise ValueError
+    try:
+        profile.measure('task', 'Task', fails)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("should have raised")
+    assert profile.records[0]['failed']
+    assert profile.stack == []
+
+def test_counts():
+    from pypy.translator.translator import TranslationContext
+    def f(x):
+        return x + 1
+    t = TranslationContext()
+    t.buildflowgraph(f)
+    profile = TaskProfile()
+    profile.measure('flow', 'Flow', lambda: None, t)
+    record = profile.records[0]
+    assert record['graphs'] == 1
+    assert record['blocks'] >= 1
+    assert record['operations'] >= 1
+
+def test_json():
+    assert _json({'a': [1, 2.5, None], 'b': 'x"y', 'c': True}) == (
+        '{"a": [1, 2.5, null], "b": "x\\"y", "c": true}')
+    assert _json('a\nb\tc\x01\\') == '"a\\nb\\tc\\u0001\\\\"'
+    from pypy.translator.flex import json
+    assert json.read(_json(['\x00\x1f\r', 'x'])) == ['\x00\x1f\r', 'x']
+
+def test_peak_growth():
+    profile = TaskProfile()
+    profile.measure('task', 'Task', lambda: None)
+    record = profile.records[0]
+    if record['peak_rss_kb'] is not None:
+        assert record['peak_rss_growth_kb'] >= 0
+        assert 'proc peak MB' in profile.summary()
+
+def test_write():
+    profile = TaskProfile()
+    profile.measure('annotate', 'Annotating', lambda: None)
+    profile.measure('rtype', 'RTyping', lambda: None)
+    filename = str(udir.join('taskprofile.json'))
+    profile.write_json(filename)
+    data = open(filename).read()
+    assert data.startswith('{') and '"goal": "rtype"' in data
+    profile.write_folded(filename + '.folded')
+    lines = open(filename + '.folded').read().splitlines()
+    assert [line.split()[0] for line in lines] == ['annotate', 'rtype']
+    summary = profile.summary()
+    assert 'annotate' in summary and 'rtype' in summary
@@ -46,6 +46,13 @@ class TranslationContext(object):
 
         self._implicitly_called_by_externals = []
 
+        self.flowcache = None
+        dirname = (config.translation.flowgraph_cache or
+                   os.environ.get('PYPY_FLOWGRAPH_CACHE'))
+        if dirname:
+            from pypy.translator.tool.flowcache import get_flowcache
+            self.flowcache = get_flowcache(dirname)
+
     def create_flowspace_config(self):
         # XXX this is a hack: we create a new config, which is only used
         # for the flow object space. The problem is that the flow obj space
@@ -74,11 +81,26 @@ class TranslationContext(object):
             elif hasattr(self, 'no_annotator_but_do_imports_immediately'):
                 space.do_imports_immediately = (
                     self.no_annotator_but_do_imports_immediately)
-            graph = space.build_flow(func)
-            if self.config.translation.simplifying:
-                simplify.simplify_graph(graph)
-            if self.config.translation.list_comprehension_operations:
-                simplify.detect_list_comprehension(graph)
+            key = graph = None
+            if self.flowcache is not None:
+                key = self.flowcache.key(func, {
+                    'simplifying': self.config.translation.simplifying,
+                    'list_comprehension_operations':
+                        self.config.translation.list_comprehension_operations,
+                    'builtins_can_raise_exceptions':
+                        space.config.translation.builtins_can_raise_exceptions,
+                    'do_imports_immediately': space.do_imports_immediately})
+            if key is not None:
+                graph = self.flowcache.load(func, key)
+                space.foldings = []
+            if graph is None:
+                graph = space.build_flow(func)
+                if self.config.translation.simplifying:
+                    simplify.simplify_graph(graph)
+                if self.config.translation.list_comprehension_operations:
+                    simplify.detect_list_comprehension(graph)
+                if key is not None:
+                    self.flowcache.store(func, key, graph, space.foldings)
             if self.config.translation.verbose:
                 log.done(func.__name__)
             elif not mute_dot: